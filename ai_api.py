@@ -1,14 +1,35 @@
 import re
 import json
 import os
-import openai
+import asyncio
 import yaml
 import logging
 from typing import List
 
+from rate_governor import chat_completion, count_tokens
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+BATCH_PROMPT_TOKENS = 6000  # Items packed into one rating call, by prompt size
+MAX_BATCH_ITEMS = 60  # Keeps the JSON answer well inside max_tokens
+RETRY_BATCH_SIZE = 5  # Entries per follow-up call for hashes a batch missed
+MAX_RETRY_ROUNDS = 2
+TOKENS_PER_RATING = 25  # '  "<16-char hash>": 7,' is ~14 tokens pretty-printed; the rest is headroom
+ANSWER_MARGIN_TOKENS = 100  # Braces, whitespace and a possible {"ratings": ...} wrapper
+
+JSON_INSTRUCTION = (
+    "Answer with a JSON object that maps every hash listed below to an integer rating "
+    "from 1 to 10, and nothing else."
+)
+
+RATING_PAIR_RE = re.compile(r'"([^"\\]+)"\s*:\s*"?(\d+(?:\.\d+)?)')
+
+RATING_REPORT = {}
+
+def get_rating_report() -> dict:
+    return dict(RATING_REPORT)
+
 def load_config(path="config.yaml"):
     with open(path, "r") as f:
         return yaml.safe_load(f)
@@ -23,53 +44,134 @@ def clean_json_response(text: str) -> str:
     text = re.sub(r"\s*```$", "", text, flags=re.IGNORECASE)
     return text.strip()
 
-def format_prompt(entries: List[dict]) -> str:
-    config = load_config()
-    base_prompt = config.get("prompt0", "")
-    prompt = base_prompt + "\n\nItems:\n"
+def format_item(entry) -> str:
+    return (
+        f"\nHash: {entry['hash']}\n"
+        f"Title: {entry.get('name', '')}\n"
+        f"Description: {entry.get('description', '')}\n"
+        f"URL: {entry.get('url', '')}\n"
+    )
+
+def format_prompt(entries: List[dict], base_prompt: str = None) -> str:
+    if base_prompt is None:
+        base_prompt = load_config().get("prompt0", "")
+    return base_prompt + "\n\n" + JSON_INSTRUCTION + "\n\nItems:\n" + "".join(format_item(e) for e in entries)
+
+def pack_batches(entries: List[dict], model: str, max_prompt_tokens=BATCH_PROMPT_TOKENS,
+                 max_items=MAX_BATCH_ITEMS) -> List[List[dict]]:
+    """Fill each batch up to the token budget instead of a fixed item count."""
+    batches, current, current_tokens = [], [], 0
     for entry in entries:
-        prompt += (
-            f"\nHash: {entry['hash']}\n"
-            f"Title: {entry['name']}\n"
-            f"Description: {entry['description']}\n"
-            f"URL: {entry['url']}\n"
-        )
-    return prompt
-
-async def rate_entries_with_gpt(entries: List[dict], batch_size=10, model="gpt-4o", temperature=0.2):
+        tokens = count_tokens(format_item(entry), model)
+        if current and (current_tokens + tokens > max_prompt_tokens or len(current) >= max_items):
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(entry)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def parse_ratings(content: str, batch: List[dict]) -> dict:
+    """
+    Keep only ratings for hashes that were asked about and that read as 1-10.
+    A reply cut off mid-object keeps the ratings before the cut; the follow-up
+    batches then only ask for the hashes it is missing.
+    """
+    text = clean_json_response(content)
+    try:
+        parsed = json.loads(text)
+    except json.JSONDecodeError:
+        parsed = dict(RATING_PAIR_RE.findall(text))
+        if not parsed:
+            raise
+    if isinstance(parsed, dict) and isinstance(parsed.get("ratings"), dict):
+        parsed = parsed["ratings"]  # Tolerate {"ratings": {...}} wrappers
+    if not isinstance(parsed, dict):
+        raise ValueError("response is not a JSON object")
+
+    asked = {entry["hash"] for entry in batch}
+    ratings = {}
+    for hash_name, value in parsed.items():
+        if hash_name not in asked:
+            continue
+        try:
+            rating = round(float(value))
+        except (TypeError, ValueError):
+            continue
+        if 1 <= rating <= 10:
+            ratings[hash_name] = rating
+    return ratings
+
+async def rate_entries_with_gpt(entries: List[dict], model="gpt-4o", temperature=0.2, on_batch=None,
+                                max_prompt_tokens=BATCH_PROMPT_TOKENS):
+    """
+    Rate entries in token-packed batches and return {hash: rating}.
+    Hashes a batch leaves out or rates unreadably (or a whole failed batch) are
+    asked again in small follow-up batches. `on_batch`, if given, is called with
+    each batch's ratings as soon as they arrive; see get_rating_report() for coverage.
+    """
     config = load_config()
     api_key = config.get("openai", {}).get("api_key")
     if not api_key:
         raise ValueError("Missing OpenAI API key in config.yaml")
 
-    openai.api_key = api_key
+    base_prompt = config.get("prompt0", "")
     results = {}
+    report = {"entries": len(entries), "calls": 0, "retry_calls": 0, "failed_calls": 0, "retried_entries": 0}
 
-    for i in range(0, len(entries), batch_size):
-        batch = entries[i:i + batch_size]
-        prompt = format_prompt(batch)
-
+    async def rate_batch(label: str, batch: List[dict]) -> dict:
         try:
-            logger.info(f"⏳ Sending batch {i // batch_size + 1} to OpenAI...")
-            response = openai.chat.completions.create(
+            logger.info(f"⏳ Sending {label} ({len(batch)} item(s)) to OpenAI...")
+            response = await chat_completion(
+                "rating",
                 model=model,
                 messages=[
                     {"role": "system", "content": "You are a helpful financial analyst."},
-                    {"role": "user", "content": prompt}
+                    {"role": "user", "content": format_prompt(batch, base_prompt)}
                 ],
                 temperature=temperature,
-                max_tokens=1000
+                max_tokens=TOKENS_PER_RATING * len(batch) + ANSWER_MARGIN_TOKENS,
+                response_format={"type": "json_object"},
             )
-            raw_content = response.choices[0].message.content
-            cleaned_content = clean_json_response(raw_content)
-            parsed = json.loads(cleaned_content)
-            results.update(parsed)
-            logger.info(f"✅ Got results for batch {i // batch_size + 1}")
-
-        except json.JSONDecodeError as jde:
-            logger.error(f"❌ JSON decode error on batch {i // batch_size + 1}: {jde}")
-            logger.error(f"Raw response was:\n{raw_content}")
+            choice = response.choices[0]
+            if choice.finish_reason == "length":
+                logger.warning(f"⚠️ Answer for {label} hit max_tokens; keeping the ratings before the cut")
+            parsed = parse_ratings(choice.message.content, batch)
         except Exception as e:
-            logger.error(f"❌ Error processing batch {i // batch_size + 1}: {e}")
+            report["failed_calls"] += 1
+            logger.error(f"❌ Error processing {label}: {e}")
+            return {}
+
+        results.update(parsed)
+        if on_batch and parsed:
+            on_batch(parsed)
+        missing = len(batch) - len(parsed)
+        logger.info(f"✅ Got {len(parsed)} rating(s) for {label}" + (f", {missing} missing" if missing else ""))
+        return parsed
+
+    batches = pack_batches(entries, model, max_prompt_tokens=max_prompt_tokens)
+    report["calls"] = len(batches)
+    await asyncio.gather(*(rate_batch(f"batch {i}/{len(batches)}", b) for i, b in enumerate(batches, 1)))
+
+    for round_no in range(1, MAX_RETRY_ROUNDS + 1):
+        missing = [e for e in entries if e["hash"] not in results]
+        if not missing:
+            break
+        logger.info(f"🔁 Re-requesting {len(missing)} missing rating(s) (round {round_no}/{MAX_RETRY_ROUNDS})")
+        retry_batches = [missing[i:i + RETRY_BATCH_SIZE] for i in range(0, len(missing), RETRY_BATCH_SIZE)]
+        report["retry_calls"] += len(retry_batches)
+        report["retried_entries"] += len(missing)
+        await asyncio.gather(*(rate_batch(f"retry {round_no}.{i}", b) for i, b in enumerate(retry_batches, 1)))
 
+    unrated = [e["hash"] for e in entries if e["hash"] not in results]
+    report.update({
+        "rated": len(results),
+        "unrated": unrated,
+        "coverage": round(len(results) / len(entries), 4) if entries else 1.0,
+    })
+    RATING_REPORT.clear()
+    RATING_REPORT.update(report)
+    if unrated:
+        logger.warning(f"⚠️ No rating for {len(unrated)} of {len(entries)} result(s) after retries")
     return results
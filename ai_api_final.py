@@ -1,12 +1,17 @@
 import os
 import re
+import json
+import time
+import asyncio
 import yaml
 import logging
 import tiktoken
-import openai
 from datetime import datetime
 from bs4 import BeautifulSoup
 
+from compact_storage import read_artifact_text
+from rate_governor import chat_completion
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -14,6 +19,50 @@ MAX_INPUT_TOKENS = 25000
 CHUNK_TOKENS = 10000
 MAX_CHUNKS = 5
 
+FINAL_MODEL = "gpt-4.1"
+
+# Cheap screening tiers run before the final model. A tier stops the cascade with "X"
+# when it says there is no opportunity with at least `threshold` confidence.
+DEFAULT_CASCADE_TIERS = [
+    {"model": "gpt-4o-mini", "threshold": 0.85, "max_input_tokens": MAX_INPUT_TOKENS},
+]
+
+SCREEN_PROMPT = """You are screening documents for a financial analyst.
+
+Decide whether the document below could describe a private investment opportunity
+(private equity raise, debt need, startup funding round, PIPE, pre-IPO round,
+convertible note, bridge round or M&A) of $1M+ that may still be open as of {current_date}.
+
+Respond ONLY in strict JSON format like:
+{{"possible_opportunity": true, "confidence": 0.7}}
+
+where "confidence" (0 to 1) is how sure you are of your answer.
+"""
+
+CASCADE_STATS = {}
+
+def get_cascade_stats() -> dict:
+    return {name: dict(stats) for name, stats in CASCADE_STATS.items()}
+
+def reset_cascade_stats():
+    CASCADE_STATS.clear()
+
+def _record_tier(name: str, outcome: str, latency: float):
+    # Screening tiers end in "stopped" or "escalated"; the final model in "completed"
+    stats = CASCADE_STATS.setdefault(name, {"documents": 0, "stopped": 0, "escalated": 0, "completed": 0,
+                                            "errors": 0, "seconds": 0.0})
+    stats["documents"] += 1
+    stats[outcome] += 1
+    stats["seconds"] += latency
+
+def get_cascade_config(config: dict) -> dict:
+    cascade = (config.get("analysis", {}) or {}).get("cascade", {}) or {}
+    return {
+        "enabled": cascade.get("enabled", True),
+        "tiers": cascade.get("tiers") or DEFAULT_CASCADE_TIERS,
+        "final_model": cascade.get("final_model", FINAL_MODEL),
+    }
+
 def load_config(path="config.yaml"):
     with open(path, "r") as f:
         return yaml.safe_load(f)
@@ -33,6 +82,50 @@ def chunk_text(text, max_chunk_tokens=CHUNK_TOKENS, model="gpt-4o-mini"):
         chunks.append(chunk_text)
     return chunks[:MAX_CHUNKS]
 
+def truncate_tokens(text, max_tokens, model="gpt-4o-mini"):
+    encoding = tiktoken.encoding_for_model(model)
+    tokens = encoding.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+async def screen_with_tier(tier: dict, text: str, current_date: str) -> bool:
+    """
+    Ask a cheap model whether the text could hold an opportunity.
+    Returns True to stop the cascade (clearly nothing), False to escalate.
+    Errors always escalate so no document is dropped by a failed screen.
+    """
+    model = tier["model"]
+    name = tier.get("name", model)
+    threshold = tier.get("threshold", 0.85)
+    max_input_tokens = tier.get("max_input_tokens", MAX_INPUT_TOKENS)
+
+    started = time.perf_counter()
+    try:
+        response = await chat_completion(
+            "screen",
+            model=model,
+            messages=[
+                {"role": "system", "content": SCREEN_PROMPT.format(current_date=current_date)},
+                {"role": "user", "content": truncate_tokens(text, max_input_tokens)}
+            ],
+            max_tokens=50,
+            temperature=0,
+            response_format={"type": "json_object"},
+        )
+        verdict = json.loads(clean_response_text(response.choices[0].message.content))
+        possible = bool(verdict.get("possible_opportunity", True))
+        confidence = float(verdict.get("confidence", 0))
+    except Exception as e:
+        logger.error(f"Screening error ({name}): {e}")
+        _record_tier(name, "errors", time.perf_counter() - started)
+        return False
+
+    stop = not possible and confidence >= threshold
+    _record_tier(name, "stopped" if stop else "escalated", time.perf_counter() - started)
+    logger.info(f"🔎 {name}: possible={possible} confidence={confidence:.2f} -> {'stop' if stop else 'escalate'}")
+    return stop
+
 async def analyze_txt_file(filepath: str) -> str:
     config = load_config()
     api_key = config.get("openai", {}).get("api_key")
@@ -45,12 +138,12 @@ async def analyze_txt_file(filepath: str) -> str:
         logger.error("Prompt not found in config.yaml.")
         return None
 
-    openai.api_key = api_key
+    cascade = get_cascade_config(config)
+    final_model = cascade["final_model"]
 
     try:
-        with open(filepath, "r", encoding="utf-8") as f:
-            soup = BeautifulSoup(f, "html.parser")
-            text = soup.get_text(separator="\n").strip()
+        soup = BeautifulSoup(read_artifact_text(filepath), "html.parser")
+        text = soup.get_text(separator="\n").strip()
     except Exception as e:
         logger.error(f"Error reading file {filepath}: {e}")
         return None
@@ -61,65 +154,66 @@ async def analyze_txt_file(filepath: str) -> str:
     current_date = datetime.now().strftime("%Y-%m-%d")
     prompt_filled = prompt_template.replace("{{current_date}}", current_date)
 
+    # Cheap tiers first, on the text itself (each tier reads its first max_input_tokens),
+    # so large documents are screened before their chunks are summarized
+    if cascade["enabled"]:
+        for tier in cascade["tiers"]:
+            if await screen_with_tier(tier, text, current_date):
+                logger.info(f"⏹️ Stopped at {tier.get('name', tier['model'])}: {filepath}")
+                return "X"
+
     if len(tokens) <= MAX_INPUT_TOKENS:
-        # Small enough to go directly to GPT-4.1
-        full_prompt = prompt_filled + "\n\nHere is the document:\n\n" + text
-        try:
-            logger.info(f"📤 Sending full document to GPT-4.1: {filepath}")
-            response = openai.chat.completions.create(
-                model="gpt-4.1",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant."},
-                    {"role": "user", "content": full_prompt}
-                ],
-                max_tokens=1000,
-                temperature=0.2,
+        # Small enough to go directly to the final model
+        label, analysis_text = "document", text
+    else:
+        # Too big — summarize chunks with mini model
+        chunks = chunk_text(text)
+
+        async def summarize(i, chunk):
+            summary_prompt = (
+                f"Summarize this document chunk (part {i}/{len(chunks)}) "
+                f"with a focus on private investment opportunities:\n\n{chunk}"
             )
-            return clean_response_text(response.choices[0].message.content)
-        except Exception as e:
-            logger.error(f"OpenAI API error (GPT-4.1): {e}")
-            return None
-
-    # Too big — summarize chunks with mini model
-    chunks = chunk_text(text)
-    summaries = []
-
-    for i, chunk in enumerate(chunks, 1):
-        summary_prompt = (
-            f"Summarize this document chunk (part {i}/{len(chunks)}) "
-            f"with a focus on private investment opportunities:\n\n{chunk}"
-        )
-        try:
-            logger.info(f"🧩 Summarizing chunk {i}/{len(chunks)} with gpt-4o-mini...")
-            response = openai.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant specialized in summarizing financial documents."},
-                    {"role": "user", "content": summary_prompt}
-                ],
-                max_tokens=500,
-                temperature=0.3,
-            )
-            summaries.append(clean_response_text(response.choices[0].message.content))
-        except Exception as e:
-            logger.error(f"Error summarizing chunk {i}: {e}")
-            summaries.append(f"❌ Error summarizing chunk {i}")
-
-    combined = "\n\n".join(summaries)
-    final_prompt = prompt_filled + "\n\nHere is the combined summary:\n\n" + combined
+            try:
+                logger.info(f"🧩 Summarizing chunk {i}/{len(chunks)} with gpt-4o-mini...")
+                response = await chat_completion(
+                    "summary",
+                    model="gpt-4o-mini",
+                    messages=[
+                        {"role": "system", "content": "You are a helpful assistant specialized in summarizing financial documents."},
+                        {"role": "user", "content": summary_prompt}
+                    ],
+                    max_tokens=500,
+                    temperature=0.3,
+                )
+                return clean_response_text(response.choices[0].message.content)
+            except Exception as e:
+                logger.error(f"Error summarizing chunk {i}: {e}")
+                return f"❌ Error summarizing chunk {i}"
+
+        # The governor spaces the calls; summaries keep chunk order
+        summaries = await asyncio.gather(*(summarize(i, chunk) for i, chunk in enumerate(chunks, 1)))
+
+        label, analysis_text = "combined summary", "\n\n".join(summaries)
+
+    final_prompt = prompt_filled + f"\n\nHere is the {label}:\n\n" + analysis_text
+    started = time.perf_counter()
 
     try:
-        logger.info(f"📤 Sending combined summary to GPT-4.1 for final analysis...")
-        final_response = openai.chat.completions.create(
-            model="gpt-4.1",
+        logger.info(f"📤 Sending {label} to {final_model} for final analysis: {filepath}")
+        final_response = await chat_completion(
+            "final",
+            model=final_model,
             messages=[
-                {"role": "system", "content": "You are a halpful assistant."},
+                {"role": "system", "content": "You are a helpful assistant."},
                 {"role": "user", "content": final_prompt}
             ],
             max_tokens=1000,
             temperature=0.2,
         )
+        _record_tier(f"final ({final_model})", "completed", time.perf_counter() - started)
         return clean_response_text(final_response.choices[0].message.content)
     except Exception as e:
-        logger.error(f"OpenAI API error (final summary): {e}")
+        _record_tier(f"final ({final_model})", "errors", time.perf_counter() - started)
+        logger.error(f"OpenAI API error ({final_model}): {e}")
         return None
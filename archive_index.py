@@ -0,0 +1,242 @@
+import re
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from compact_storage import artifact_stem, glob_artifacts, read_artifact_text
+from records import candidate_files, has_candidates, iter_candidates
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = "archive.db"
+MAX_BODY_CHARS = 500_000  # Cap on indexed text per document
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_hash TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    run_date TEXT,
+    indexed_at TEXT
+);
+CREATE TABLE IF NOT EXISTS indexed_files (
+    path TEXT PRIMARY KEY,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+    name, description, url, result, body,
+    run_hash UNINDEXED, doc_hash UNINDEXED, run_date UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+def connect(db_path: str = DEFAULT_DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def get_run_date(folder: Path) -> str:
+    """
+    Best-effort run date: run_info.json, then the timestamped per-query folder
+    sharing the run hash, then the folder's modification time.
+    """
+    info_path = folder / "run_info.json"
+    if info_path.exists():
+        try:
+            with open(info_path, "r", encoding="utf-8") as f:
+                started_at = json.load(f).get("started_at")
+            if started_at:
+                return started_at
+        except Exception as e:
+            logger.warning(f"Error reading {info_path}: {e}")
+
+    for sibling in sorted(folder.parent.glob(f"*-{folder.name}")):
+        match = re.match(r"(\d{4}-\d{2}-\d{2})T(\d{2})-(\d{2})-(\d{2})", sibling.name)
+        if match:
+            return f"{match.group(1)}T{match.group(2)}:{match.group(3)}:{match.group(4)}"
+
+    return datetime.fromtimestamp(folder.stat().st_mtime).isoformat(timespec="seconds")
+
+def _file_changed(conn: sqlite3.Connection, path: Path) -> bool:
+    stat = path.stat()
+    row = conn.execute("SELECT mtime, size FROM indexed_files WHERE path = ?", (str(path),)).fetchone()
+    return row is None or row[0] != stat.st_mtime or row[1] != stat.st_size
+
+def _mark_indexed(conn: sqlite3.Connection, path: Path):
+    stat = path.stat()
+    conn.execute(
+        "INSERT OR REPLACE INTO indexed_files (path, mtime, size) VALUES (?, ?, ?)",
+        (str(path), stat.st_mtime, stat.st_size),
+    )
+
+def _read_text(path: Path) -> str:
+    try:
+        return read_artifact_text(path)[:MAX_BODY_CHARS]
+    except Exception as e:
+        logger.warning(f"Error reading {path}: {e}")
+        return ""
+
+def index_run(folder, db_path: str = DEFAULT_DB_PATH, conn: Optional[sqlite3.Connection] = None) -> int:
+    """
+    Ingest one combined run folder (pages/<run_hash>) into the archive.
+    Only folders whose candidates or txt files changed since the last
+    ingest are re-indexed. Returns the number of documents written.
+    """
+    folder = Path(folder)
+    if not has_candidates(folder):
+        return 0
+
+    own_conn = conn is None
+    if own_conn:
+        conn = connect(db_path)
+
+    try:
+        txt_folder = folder / "txt"
+        txt_files = {artifact_stem(p): p for p in glob_artifacts(txt_folder, "*.txt")} if txt_folder.exists() else {}
+
+        tracked = candidate_files(folder) + list(txt_files.values())
+        if not any(_file_changed(conn, p) for p in tracked):
+            return 0
+
+        run_hash = folder.name
+        run_date = get_run_date(folder)
+        written = 0
+
+        with conn:
+            conn.execute("DELETE FROM documents WHERE run_hash = ?", (run_hash,))
+            for entry in iter_candidates(folder):
+                doc_hash = entry.hash
+                if not doc_hash:
+                    continue
+                txt_path = txt_files.get(doc_hash)
+                body = _read_text(txt_path) if txt_path else ""
+                conn.execute(
+                    "INSERT INTO documents (name, description, url, result, body, run_hash, doc_hash, run_date) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (entry.get("name", ""), entry.get("description", ""), entry.get("url", ""),
+                     entry.get("result") or "", body, run_hash, doc_hash, run_date),
+                )
+                written += 1
+
+            conn.execute(
+                "INSERT OR REPLACE INTO runs (run_hash, folder, run_date, indexed_at) VALUES (?, ?, ?, ?)",
+                (run_hash, str(folder), run_date, datetime.now().isoformat(timespec="seconds")),
+            )
+            for path in tracked:
+                _mark_indexed(conn, path)
+
+        logger.info(f"🗂️ Indexed {written} document(s) from {folder}")
+        return written
+    finally:
+        if own_conn:
+            conn.close()
+
+def backfill(base_folder="pages", db_path: str = DEFAULT_DB_PATH) -> int:
+    """
+    Index every existing run folder under `base_folder`. Unchanged folders are skipped.
+    """
+    base_path = Path(base_folder)
+    if not base_path.exists():
+        return 0
+
+    conn = connect(db_path)
+    total = 0
+    try:
+        for folder in sorted(base_path.iterdir()):
+            if folder.is_dir() and has_candidates(folder):
+                try:
+                    total += index_run(folder, conn=conn)
+                except Exception as e:
+                    logger.error(f"❌ Error indexing {folder}: {e}")
+        conn.execute("INSERT INTO documents (documents) VALUES ('optimize')")
+        conn.commit()
+    finally:
+        conn.close()
+    return total
+
+def _to_fts_query(text: str) -> str:
+    # Quote every term so punctuation in company names does not break FTS5 syntax
+    terms = re.findall(r"\w+", text, flags=re.UNICODE)
+    return " ".join(f'"{t}"' for t in terms)
+
+def search(query: str, db_path: str = DEFAULT_DB_PATH, limit: int = 20, only_positive: bool = False) -> List[dict]:
+    """
+    Ranked full-text search over names, snippets, URLs, results and document text.
+    """
+    conn = connect(db_path)
+    sql = (
+        "SELECT run_hash, doc_hash, run_date, url, name, result, "
+        "snippet(documents, -1, '[', ']', ' … ', 12), "
+        "bm25(documents, 10.0, 3.0, 5.0, 8.0, 1.0) AS rank "
+        "FROM documents WHERE documents MATCH ? "
+    )
+    if only_positive:
+        sql += "AND result != '' AND result != 'X' "
+    sql += "ORDER BY rank LIMIT ?"
+
+    try:
+        try:
+            rows = conn.execute(sql, (query, limit)).fetchall()
+        except sqlite3.OperationalError:
+            rows = conn.execute(sql, (_to_fts_query(query), limit)).fetchall()
+    finally:
+        conn.close()
+
+    return [
+        {
+            "run": run_hash, "hash": doc_hash, "date": run_date, "url": url,
+            "name": name, "result": result, "snippet": snippet, "score": -rank,
+        }
+        for run_hash, doc_hash, run_date, url, name, result, snippet, rank in rows
+    ]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Full-text archive of analyzed documents")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Path to the SQLite index")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_query = sub.add_parser("query", help="Search the archive")
+    p_query.add_argument("text", nargs="+")
+    p_query.add_argument("--limit", type=int, default=20)
+    p_query.add_argument("--positive", action="store_true", help="Only documents with a non-X result")
+    p_query.add_argument("--json", action="store_true", help="Print hits as JSON")
+
+    p_ingest = sub.add_parser("ingest", help="Index one run folder")
+    p_ingest.add_argument("folder")
+
+    p_backfill = sub.add_parser("backfill", help="Index all existing run folders")
+    p_backfill.add_argument("--pages", default="pages")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if args.command == "ingest":
+        print(f"Indexed {index_run(args.folder, db_path=args.db)} document(s)")
+    elif args.command == "backfill":
+        start = time.perf_counter()
+        total = backfill(args.pages, db_path=args.db)
+        print(f"Indexed {total} document(s) in {time.perf_counter() - start:.1f}s")
+    else:
+        start = time.perf_counter()
+        hits = search(" ".join(args.text), db_path=args.db, limit=args.limit, only_positive=args.positive)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        if args.json:
+            print(json.dumps(hits, indent=2, ensure_ascii=False))
+        else:
+            for i, hit in enumerate(hits, 1):
+                print(f"{i:>2}. [{hit['date']}] run={hit['run']} hash={hit['hash']}")
+                print(f"    {hit['name']}")
+                print(f"    {hit['url']}")
+                print(f"    {hit['snippet']}")
+        print(f"{len(hits)} hit(s) in {elapsed_ms:.1f} ms", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Token cost of page text before and after boilerplate removal.
+
+Compares the old conversion (soup.get_text over the whole page) with
+content_extract.extract_main_text on the HTML fixtures, or on any pages
+passed on the command line (e.g. a run's downloads/*.html):
+
+    python benchmarks/content_extract_benchmark.py
+    python benchmarks/content_extract_benchmark.py pages/<run>/downloads/*.html
+"""
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bs4 import BeautifulSoup
+
+from content_extract import extract_main_text
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+MODEL = "gpt-4.1"
+
+def get_token_counter(model: str):
+    try:
+        import tiktoken
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(encoding.encode(text)), "tiktoken"
+    except Exception:
+        # No tiktoken, or its encoding files can't be downloaded
+        return lambda text: len(text) // 4, "chars/4"
+
+def baseline_text(html: str) -> str:
+    return BeautifulSoup(html, "html.parser").get_text(separator="\n", strip=True)
+
+def timed(fn, html: str, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        text = fn(html)
+    return text, (time.perf_counter() - start) / repeat * 1000
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark token reduction of content extraction")
+    parser.add_argument("pages", nargs="*", help="HTML files (default: benchmarks/fixtures/*.html)")
+    parser.add_argument("--model", default=MODEL, help="Model whose tokenizer is used for counting")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repetitions per page")
+    parser.add_argument("--show", action="store_true", help="Print the extracted text of each page")
+    args = parser.parse_args(argv)
+
+    paths = [Path(p) for p in args.pages] or sorted(FIXTURES.glob("*.html"))
+    count_tokens, counter_name = get_token_counter(args.model)
+
+    print(f"Token counts: {counter_name} ({args.model})\n")
+    print(f"{'page':<28} {'baseline':>9} {'extracted':>10} {'saved':>7} {'base ms':>8} {'extract ms':>11}")
+    totals = [0, 0]
+    for path in paths:
+        html = path.read_text(encoding="utf-8", errors="replace")
+        before, before_ms = timed(baseline_text, html, args.repeat)
+        after, after_ms = timed(extract_main_text, html, args.repeat)
+        before_tokens, after_tokens = count_tokens(before), count_tokens(after)
+        totals[0] += before_tokens
+        totals[1] += after_tokens
+        saved = 1 - after_tokens / before_tokens if before_tokens else 0
+        print(f"{path.name[:28]:<28} {before_tokens:>9} {after_tokens:>10} {saved:>7.0%} {before_ms:>8.1f} {after_ms:>11.1f}")
+        if args.show:
+            print(f"\n{after}\n")
+
+    if totals[0]:
+        print(f"\n{'total':<28} {totals[0]:>9} {totals[1]:>10} {1 - totals[1] / totals[0]:>7.0%}")
+
+if __name__ == "__main__":
+    main()
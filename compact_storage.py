@@ -0,0 +1,307 @@
+import os
+import re
+import io
+import gzip
+import time
+import hashlib
+import logging
+import argparse
+from pathlib import Path
+from typing import Optional
+
+import yaml
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency, gzip is used instead
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+BLOB_DIR = "_blobs"
+COMPRESSED_SUFFIXES = (".zst", ".gz")
+QUERY_FOLDER_RE = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2}-\w+$")
+
+DEFAULT_STORAGE_CONFIG = {
+    "min_age_hours": 24,  # Runs newer than this are never touched
+    "compression": "zstd",  # 'zstd' (falls back to gzip if not installed), 'gzip' or null
+    "retention_days": {
+        "serp_html": 7,
+        "screenshots": 7,
+        "pdf": 30,
+        "downloads": 30,
+        "txt": None,  # None keeps forever
+    },
+}
+
+# Artifacts whose contents are compressed in place (PDFs are already compressed)
+COMPRESSIBLE = {"serp_html", "downloads_html", "txt"}
+
+def load_config(path="config.yaml"):
+    with open(path, "r") as f:
+        return yaml.safe_load(f)
+
+def get_storage_config(config: Optional[dict] = None) -> dict:
+    storage = dict(DEFAULT_STORAGE_CONFIG)
+    user = (config or {}).get("storage", {}) or {}
+    storage.update({k: v for k, v in user.items() if k != "retention_days"})
+    storage["retention_days"] = {**DEFAULT_STORAGE_CONFIG["retention_days"], **(user.get("retention_days") or {})}
+    return storage
+
+# ------------------- Compressed Artifact Access -------------------
+def read_artifact_bytes(path) -> bytes:
+    """
+    Read a file that may have been compressed by compaction. `path` may name
+    the original file; a .zst or .gz sibling is used if the original is gone.
+    """
+    path = Path(path)
+    if not path.exists():
+        for suffix in COMPRESSED_SUFFIXES:
+            candidate = path.with_name(path.name + suffix)
+            if candidate.exists():
+                path = candidate
+                break
+
+    data = path.read_bytes()
+    if path.suffix == ".zst":
+        if zstandard is None:
+            raise RuntimeError(f"zstandard is required to read {path}")
+        return zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data)).read()
+    if path.suffix == ".gz":
+        return gzip.decompress(data)
+    return data
+
+def read_artifact_text(path) -> str:
+    return read_artifact_bytes(path).decode("utf-8", errors="replace")
+
+def artifact_stem(path) -> str:
+    """Hash name of an artifact, ignoring compression suffixes (abc.txt.zst -> abc)."""
+    name = Path(path).name
+    for suffix in COMPRESSED_SUFFIXES:
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+    return Path(name).stem
+
+def glob_artifacts(folder, pattern: str):
+    """
+    Glob `pattern` (e.g. '*.txt') including compressed variants. A plain file
+    wins over a compressed copy of itself (e.g. a run converted again after compaction).
+    """
+    folder = Path(folder)
+    found = [p for p in folder.glob(pattern) if p.suffix not in COMPRESSED_SUFFIXES]
+    names = set(found)
+    for suffix in COMPRESSED_SUFFIXES:
+        for path in folder.glob(pattern + suffix):
+            original = path.with_name(path.name[: -len(suffix)])
+            if original not in names:
+                names.add(original)
+                found.append(path)
+    return found
+
+def write_artifact(path, data) -> None:
+    """
+    Write a run artifact through a temp file and os.replace. Compaction hard-links
+    files into the blob store, so writing in place would also rewrite every other
+    run's copy (and the blob) sharing the inode; a failed write would truncate them all.
+    """
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    try:
+        if isinstance(data, str):
+            tmp.write_text(data, encoding="utf-8")
+        else:
+            tmp.write_bytes(data)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+# ------------------- Compaction -------------------
+def classify(path: Path, pages_root: Path) -> Optional[str]:
+    rel = path.relative_to(pages_root).parts
+    if len(rel) < 2 or rel[0] == BLOB_DIR:
+        return None
+
+    run_folder, name = rel[0], path.name
+    base = name[: -len(path.suffix)] if path.suffix in COMPRESSED_SUFFIXES else name
+    ext = Path(base).suffix.lower()
+
+    if len(rel) == 2:
+        if ext == ".png":
+            return "screenshots"
+        if ext == ".html" and (QUERY_FOLDER_RE.match(run_folder) or base.startswith("google-results-page-")):
+            return "serp_html"
+        return None  # JSON summaries and run metadata are kept forever
+
+    subfolder = rel[1]
+    if subfolder == "pdf":
+        return "pdf"
+    if subfolder == "downloads":
+        return "downloads_html" if ext == ".html" else "downloads"
+    if subfolder == "txt":
+        return "txt"
+    return None
+
+def retention_days_for(kind: str, storage: dict) -> Optional[float]:
+    key = "downloads" if kind == "downloads_html" else kind
+    return storage["retention_days"].get(key)
+
+def compress_file(path: Path, codec: str) -> Path:
+    if codec == "zstd" and zstandard is None:
+        codec = "gzip"
+    suffix = ".zst" if codec == "zstd" else ".gz"
+    target = path.with_name(path.name + suffix)
+    stat = path.stat()
+
+    data = path.read_bytes()
+    if codec == "zstd":
+        compressed = zstandard.ZstdCompressor(level=10).compress(data)
+    else:
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)  # Deterministic so blobs dedupe
+
+    tmp = target.with_name(target.name + ".tmp")
+    tmp.write_bytes(compressed)
+    os.utime(tmp, (stat.st_atime, stat.st_mtime))
+    os.replace(tmp, target)
+    path.unlink()
+    return target
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def link_to_blob(path: Path, blob_root: Path) -> bool:
+    """
+    Replace `path` with a hard link into the content-addressed blob store.
+    Returns True if the file's content was already stored.
+    """
+    if path.stat().st_nlink > 1:
+        return False  # Already linked
+
+    sha = file_sha256(path)
+    blob = blob_root / sha[:2] / sha
+    existed = blob.exists()
+
+    if not existed:
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        os.link(path, blob)
+        return False
+
+    # Links share one inode, so keep the newest mtime to never expire a copy early
+    mtime = max(path.stat().st_mtime, blob.stat().st_mtime)
+    tmp = path.with_name(path.name + ".lnk")
+    os.link(blob, tmp)
+    os.replace(tmp, path)
+    os.utime(path, (mtime, mtime))
+    return True
+
+def collect_garbage(blob_root: Path) -> int:
+    removed = 0
+    if not blob_root.exists():
+        return 0
+    for blob in blob_root.glob("*/*"):
+        if blob.is_file() and blob.stat().st_nlink == 1:
+            blob.unlink()
+            removed += 1
+    return removed
+
+def compact_pages(base_folder="pages", config: Optional[dict] = None, dry_run=False) -> dict:
+    """
+    Compress, deduplicate and expire artifacts of runs older than `min_age_hours`.
+    Folder modification times are restored afterwards because history lookups
+    (get_recent_results) use them to find recent runs.
+    """
+    storage = get_storage_config(config)
+    pages_root = Path(base_folder)
+    blob_root = pages_root / BLOB_DIR
+    stats = {"deleted": 0, "compressed": 0, "deduplicated": 0, "bytes_before": 0, "bytes_after": 0, "blobs_removed": 0}
+
+    if not pages_root.exists():
+        return stats
+
+    now = time.time()
+    min_age = storage["min_age_hours"] * 3600
+    codec = storage.get("compression")
+
+    for run_folder in sorted(pages_root.iterdir()):
+        if not run_folder.is_dir() or run_folder.name == BLOB_DIR:
+            continue
+        if now - run_folder.stat().st_mtime < min_age:
+            continue
+
+        folder_times = {
+            d: (d.stat().st_atime, d.stat().st_mtime)
+            for d in [run_folder] + [p for p in run_folder.rglob("*") if p.is_dir()]
+        }
+
+        try:
+            for path in sorted(p for p in run_folder.rglob("*") if p.is_file()):
+                kind = classify(path, pages_root)
+                if kind is None:
+                    continue
+
+                stat = path.stat()
+                size = stat.st_size
+                stats["bytes_before"] += size
+                age_days = (now - stat.st_mtime) / 86400
+
+                keep_days = retention_days_for(kind, storage)
+                if keep_days is not None and age_days > keep_days:
+                    if not dry_run:
+                        path.unlink()
+                    stats["deleted"] += 1
+                    continue
+
+                if dry_run:
+                    stats["bytes_after"] += size
+                    continue
+
+                if codec and kind in COMPRESSIBLE and path.suffix not in COMPRESSED_SUFFIXES:
+                    path = compress_file(path, codec)
+                    stats["compressed"] += 1
+
+                try:
+                    if link_to_blob(path, blob_root):
+                        stats["deduplicated"] += 1
+                        continue  # Shared content is only counted once
+                except OSError as e:
+                    logger.warning(f"⚠️ Could not link {path} into blob store: {e}")
+
+                stats["bytes_after"] += path.stat().st_size
+        finally:
+            if not dry_run:
+                # Drop emptied subfolders, then restore times so runs keep their age
+                for d in sorted(folder_times, key=lambda p: len(p.parts), reverse=True):
+                    if d != run_folder and d.exists() and not any(d.iterdir()):
+                        d.rmdir()
+                        folder_times.pop(d)
+                for d, (atime, mtime) in folder_times.items():
+                    if d.exists():
+                        os.utime(d, (atime, mtime))
+
+    if not dry_run:
+        stats["blobs_removed"] = collect_garbage(blob_root)
+
+    logger.info(
+        f"🧹 Compaction: {stats['deleted']} expired, {stats['compressed']} compressed, "
+        f"{stats['deduplicated']} deduplicated, {stats['blobs_removed']} unused blob(s) removed, "
+        f"{stats['bytes_before'] / 1e6:.1f} MB -> {stats['bytes_after'] / 1e6:.1f} MB"
+    )
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compact and expire artifacts under pages/")
+    parser.add_argument("--pages", default="pages")
+    parser.add_argument("--config", default="config.yaml")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be expired")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    config = load_config(args.config) if os.path.exists(args.config) else {}
+    compact_pages(args.pages, config=config, dry_run=args.dry_run)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import os
+import json
+import logging
+from pathlib import Path
+
+from compact_storage import artifact_stem, file_sha256
+from records import has_candidates, load_candidates, record_updates
+
+logger = logging.getLogger(__name__)
+
+def dedupe_downloaded_files(base_folder, subfolder="pdf") -> dict:
+    """
+    Collapse identical downloads fetched from different URLs so each distinct
+    document is converted and analyzed once.
+
+    The first candidate (in ready candidates order) keeps its file; the
+    other files are removed and their entries get `duplicate_of`. The kept
+    entry's `source_urls` lists every URL the content was fetched from, and
+    the mapping is saved to content_duplicates.json.
+    """
+    base_folder = Path(base_folder)
+    download_folder = base_folder / subfolder
+    if not download_folder.exists() or not has_candidates(base_folder):
+        return {}
+
+    entries = load_candidates(base_folder)
+    order = {h: i for i, h in enumerate(entries)}
+
+    files_by_digest = {}
+    for file_path in download_folder.glob("*.*"):
+        try:
+            digest = file_sha256(file_path)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not hash {file_path}: {e}")
+            continue
+        files_by_digest.setdefault(digest, []).append(file_path)
+
+    duplicates = {}
+    updates = []
+    for digest, paths in files_by_digest.items():
+        if len(paths) < 2:
+            continue
+
+        paths.sort(key=lambda p: order.get(artifact_stem(p), len(order)))
+        keeper = artifact_stem(paths[0])
+        source_urls = []
+        for entry in [entries.get(artifact_stem(p)) for p in paths]:
+            if not entry:
+                continue
+            for url in [entry.url] + list(entry.source_urls or []):
+                if url not in source_urls:
+                    source_urls.append(url)
+
+        for path in paths[1:]:
+            if artifact_stem(path) in entries:
+                updates.append({"hash": artifact_stem(path), "duplicate_of": keeper})
+            os.remove(path)
+
+        if keeper in entries:
+            updates.append({"hash": keeper, "source_urls": source_urls})
+        duplicates[keeper] = {
+            "sha256": digest,
+            "duplicates": [artifact_stem(p) for p in paths[1:]],
+            "source_urls": source_urls,
+        }
+
+    if not duplicates:
+        return {}
+
+    record_updates(base_folder, updates)
+    with open(base_folder / "content_duplicates.json", "w", encoding="utf-8") as f:
+        json.dump(duplicates, f, indent=2, ensure_ascii=False)
+
+    removed = sum(len(d["duplicates"]) for d in duplicates.values())
+    logger.info(f"🧬 Collapsed {removed} duplicate download(s) into {len(duplicates)} document(s)")
+    return duplicates
@@ -0,0 +1,242 @@
+import re
+import logging
+from typing import Optional
+
+from bs4 import BeautifulSoup, Comment, NavigableString, Tag
+
+logger = logging.getLogger(__name__)
+
+# Never content: dropped before scoring
+STRIP_TAGS = [
+    "script", "style", "noscript", "template", "svg", "canvas", "iframe", "object", "embed",
+    "nav", "footer", "aside", "button", "input", "select", "textarea",
+    "link", "meta", "head",
+]
+FORM_FIELDS = ["input", "select", "textarea", "button"]
+STRIP_ROLES = {"navigation", "banner", "contentinfo", "complementary", "search", "dialog", "alertdialog", "menu"}
+
+# Readability's class/id heuristics
+UNLIKELY_RE = re.compile(
+    r"banner|breadcrumb|combx|comment|community|consent|cookie|disqus|extra|footer|gdpr|header|legends|menu|"
+    r"modal|nav|newsletter|pager|pagination|popup|promo|related|remark|replies|rss|share|shoutbox|sidebar|"
+    r"skyscraper|social|sponsor|subscribe|tags|toolbar|tweet|twitter|widget|^ad-|-ad$|advert",
+    re.I,
+)
+MAYBE_RE = re.compile(r"and|article|body|column|content|main|shadow", re.I)
+POSITIVE_RE = re.compile(r"article|body|content|entry|hentry|h-entry|main|page|pagination|post|text|blog|story|report", re.I)
+NEGATIVE_RE = re.compile(
+    r"-ad-|hidden|^hid$| hid$| hid |^hid |banner|combx|comment|com-|contact|foot|footer|footnote|gdpr|masthead|"
+    r"media|meta|outbrain|promo|related|scroll|share|shoutbox|sidebar|skyscraper|sponsor|shopping|tags|tool|widget",
+    re.I,
+)
+
+SCORED_TAGS = {"p", "pre", "td", "li", "blockquote", "section", "div", "article", "dd"}
+BLOCK_TAGS = {
+    "address", "article", "blockquote", "dd", "div", "dl", "dt", "figcaption", "h1", "h2", "h3", "h4", "h5", "h6",
+    "li", "main", "ol", "p", "pre", "section", "table", "tr", "ul", "br", "hr",
+}
+MIN_PARAGRAPH_CHARS = 25
+MIN_CONTENT_CHARS = 250  # Below this the main-content guess is not trusted
+
+def _attrs_text(tag: Tag) -> str:
+    classes = tag.get("class") or []
+    if isinstance(classes, str):
+        classes = [classes]
+    return " ".join(classes) + " " + (tag.get("id") or "")
+
+def _class_weight(tag: Tag) -> int:
+    attrs = _attrs_text(tag)
+    weight = 0
+    if NEGATIVE_RE.search(attrs):
+        weight -= 25
+    if POSITIVE_RE.search(attrs):
+        weight += 25
+    return weight
+
+def _is_hidden(tag: Tag) -> bool:
+    style = (tag.get("style") or "").replace(" ", "").lower()
+    return (
+        tag.has_attr("hidden")
+        or tag.get("aria-hidden") == "true"
+        or "display:none" in style
+        or "visibility:hidden" in style
+    )
+
+def _text_length(tag: Tag) -> int:
+    return len(" ".join(tag.get_text(" ", strip=True).split()))
+
+def _own_text(tag: Tag) -> str:
+    parts = []
+    for child in tag.children:
+        if isinstance(child, NavigableString):
+            parts.append(str(child))
+        elif isinstance(child, Tag) and child.name not in BLOCK_TAGS:
+            parts.append(child.get_text(" "))
+    return " ".join(parts)
+
+def _link_density(tag: Tag) -> float:
+    total = _text_length(tag)
+    if not total:
+        return 0.0
+    link_chars = sum(_text_length(a) for a in tag.find_all("a"))
+    return min(link_chars / total, 1.0)
+
+def _is_form_boilerplate(form: Tag) -> bool:
+    """
+    Search boxes, sign-ups and contact forms, but not pages (ASP.NET WebForms,
+    some CMSs) that wrap the whole body in one <form>: judged like readability's
+    conditional cleaning, by text length, link density and field count.
+    """
+    if _text_length(form) < MIN_CONTENT_CHARS or _link_density(form) > 0.5:
+        return True
+    fields = [f for f in form.find_all(FORM_FIELDS) if f.get("type", "").lower() != "hidden"]
+    return len(fields) > max(3, len(form.find_all("p")))
+
+def _is_site_header(tag: Tag) -> bool:
+    # <article><header> holds the title and byline; only page-level headers are chrome
+    return tag.find_parent(["article", "main"]) is None
+
+def strip_boilerplate(soup: BeautifulSoup):
+    """Remove scripts, styles, navigation, hidden elements and unlikely containers in place."""
+    for node in soup.find_all(string=lambda s: isinstance(s, Comment)):
+        node.extract()
+    # Forms are judged before their fields are stripped below
+    for form in soup.find_all("form"):
+        if not form.decomposed and _is_form_boilerplate(form):
+            form.decompose()
+    for header in soup.find_all("header"):
+        if not header.decomposed and _is_site_header(header):
+            header.decompose()
+    for tag in soup.find_all(STRIP_TAGS):
+        tag.decompose()
+
+    for tag in soup.find_all(True):
+        if tag.decomposed or tag.name in ("html", "body", "main", "article", "form"):
+            continue
+        if tag.name == "header":
+            continue  # Only article headers are left at this point
+        if tag.get("role") in STRIP_ROLES or _is_hidden(tag):
+            tag.decompose()
+            continue
+        attrs = _attrs_text(tag)
+        if UNLIKELY_RE.search(attrs) and not MAYBE_RE.search(attrs):
+            tag.decompose()
+
+def _initial_score(tag: Tag) -> float:
+    score = {
+        "div": 5, "article": 10, "section": 3, "pre": 3, "td": 3, "blockquote": 3,
+        "address": -3, "ol": -3, "ul": -3, "dl": -3, "dd": -3, "dt": -3, "li": -3,
+        "h1": -5, "h2": -5, "h3": -5, "h4": -5, "h5": -5, "h6": -5, "th": -5,
+    }.get(tag.name, 0)
+    return score + _class_weight(tag)
+
+def find_main_content(soup: BeautifulSoup) -> Optional[Tag]:
+    """
+    Score blocks by the amount of comma-rich prose they hold (readability's text
+    density heuristic) and return the best container, or None.
+    """
+    scores = {}
+
+    def add(tag, amount):
+        if not isinstance(tag, Tag) or tag.name in ("html", "[document]"):
+            return
+        if id(tag) not in scores:
+            scores[id(tag)] = [tag, _initial_score(tag)]
+        scores[id(tag)][1] += amount
+
+    for block in soup.find_all(SCORED_TAGS):
+        # Paragraph-like blocks count all their text; containers only their own,
+        # so a div wrapping other blocks is scored through its children
+        text = block.get_text(" ") if block.name in ("p", "pre", "blockquote") else _own_text(block)
+        text = " ".join(text.split())
+        if len(text) < MIN_PARAGRAPH_CHARS:
+            continue
+
+        score = 1 + text.count(",") + min(len(text) / 100, 3)
+        add(block.parent, score)
+        if block.parent is not None:
+            add(block.parent.parent, score / 2)
+            if block.parent.parent is not None:
+                add(block.parent.parent.parent, score / 3)
+
+    if not scores:
+        return None
+
+    best_tag, best_score = None, 0.0
+    for tag, score in scores.values():
+        score *= 1 - _link_density(tag)
+        if score > best_score:
+            best_tag, best_score = tag, score
+    if best_tag is None:
+        return None
+
+    # Fold in siblings that look like part of the same article
+    parent = best_tag.parent
+    if parent is None or best_tag.name == "body":
+        return best_tag
+    threshold = max(10, best_score * 0.2)
+    container = soup.new_tag("div")
+    for sibling in list(parent.children):
+        if not isinstance(sibling, Tag):
+            continue
+        keep = sibling is best_tag
+        if not keep:
+            entry = scores.get(id(sibling))
+            sibling_score = entry[1] * (1 - _link_density(sibling)) if entry else 0
+            keep = sibling_score >= threshold
+            if not keep and sibling.name == "p":
+                length = _text_length(sibling)
+                density = _link_density(sibling)
+                keep = (length > 80 and density < 0.25) or (0 < length <= 80 and density == 0 and "." in sibling.get_text())
+        if keep:
+            container.append(sibling.extract())
+    return container
+
+def _block_text(tag: Tag) -> str:
+    # Source line wrapping means nothing; only block boundaries become newlines
+    for node in tag.find_all(string=True):
+        if node.find_parent("pre") is None:
+            node.replace_with(re.sub(r"\s+", " ", str(node)))
+    for br in tag.find_all("br"):
+        br.replace_with("\n")
+    for row in tag.find_all("tr"):
+        cells = row.find_all(["td", "th"], recursive=False)
+        for cell in cells[:-1]:
+            cell.insert_after(" | ")
+    for block in tag.find_all(BLOCK_TAGS):
+        block.insert_before("\n")
+        block.insert_after("\n")
+    return tag.get_text()
+
+def collapse_whitespace(text: str) -> str:
+    lines = []
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        # Repeated lines (menus, "Share" buttons) add nothing
+        if line and (not lines or line != lines[-1]):
+            lines.append(line)
+    return "\n".join(lines)
+
+def extract_main_text(html) -> str:
+    """
+    Main readable text of an HTML page: boilerplate removed, the densest article
+    container kept (with the page title on top), whitespace collapsed. Falls back
+    to the whole cleaned page when no container holds enough text.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    title_tag = soup.find("title")
+    title = " ".join(title_tag.get_text().split()) if title_tag else ""
+
+    strip_boilerplate(soup)
+    main = find_main_content(soup.body or soup)
+    text = collapse_whitespace(_block_text(main)) if main is not None else ""
+
+    if len(text) < MIN_CONTENT_CHARS:
+        # find_main_content moved nodes out of the tree; start over from the page
+        soup = BeautifulSoup(html, "html.parser")
+        strip_boilerplate(soup)
+        text = collapse_whitespace(_block_text(soup.body or soup))
+
+    if title and not text.startswith(title):
+        text = f"{title}\n\n{text}" if text else title
+    return text
@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import aiohttp
+import yaml
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DOWNLOAD_CONFIG = {
+    "concurrency": 8,  # Downloads in flight across all hosts
+    "per_host_concurrency": 2,  # Downloads in flight per host
+    "per_host_interval": 1.0,  # Minimum seconds between request starts on one host
+    "skip_host_after_failures": 5,  # URLs in a row failing with host errors (after retries) before a host is skipped
+    "skip_host_hours": 72,  # How long a failing host is skipped before being retried
+    "host_stats_path": "host_stats.json",
+}
+
+LATENCY_SMOOTHING = 0.3  # Weight of the newest sample in the moving average
+MAX_HOST_INTERVAL = 30.0
+THROTTLE_STATUSES = {429, 503}
+GONE_STATUSES = {404, 410}
+# Errors that say the host is down or overloaded; 4xx answers and wrong content types only concern one URL
+HOST_ERRORS = (asyncio.TimeoutError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+
+def load_config(path="config.yaml"):
+    with open(path, "r") as f:
+        return yaml.safe_load(f)
+
+def get_host(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+class HostScheduler:
+    """
+    Hands out download slots with a global cap, a per-host cap and a minimum
+    spacing between requests to the same host. Keeps a per-host latency and
+    error history on disk so slow or failing hosts are tried last or skipped.
+    """
+
+    def __init__(self, concurrency=8, per_host_concurrency=2, per_host_interval=1.0,
+                 skip_host_after_failures=5, skip_host_hours=72, host_stats_path: Optional[str] = "host_stats.json"):
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_interval = per_host_interval
+        self.skip_host_after_failures = skip_host_after_failures
+        self.skip_host_hours = skip_host_hours
+        self.host_stats_path = host_stats_path
+
+        self._global = asyncio.Semaphore(concurrency)
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._host_locks: Dict[str, asyncio.Lock] = {}
+        self._host_next_start: Dict[str, float] = {}
+        self._host_interval: Dict[str, float] = {}
+        self.stats: Dict[str, dict] = self._load_stats()
+        self._touched = set()  # Hosts this scheduler has new history for
+
+    @classmethod
+    def from_config(cls, config: Optional[dict] = None) -> "HostScheduler":
+        if config is None:
+            try:
+                config = load_config()
+            except FileNotFoundError:
+                config = {}
+        settings = {**DEFAULT_DOWNLOAD_CONFIG, **((config or {}).get("downloads") or {})}
+        return cls(**{k: settings[k] for k in DEFAULT_DOWNLOAD_CONFIG})
+
+    # ------------------- Host History -------------------
+    def _load_stats(self) -> Dict[str, dict]:
+        if not self.host_stats_path:
+            return {}
+        try:
+            with open(self.host_stats_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"⚠️ Could not read host stats {self.host_stats_path}: {e}")
+            return {}
+
+    def save_stats(self):
+        """
+        Merge this scheduler's hosts into the stats file and replace it atomically.
+        Worker processes share the file: hosts they didn't touch keep the other
+        workers' history, and readers never see a half-written file.
+        """
+        if not self.host_stats_path:
+            return
+        tmp = f"{self.host_stats_path}.{os.getpid()}.tmp"
+        try:
+            merged = self._load_stats()
+            merged.update({host: self.stats[host] for host in self._touched})
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(merged, f, indent=2)
+            os.replace(tmp, self.host_stats_path)
+            self.stats = merged  # Pick up the other workers' history too
+        except Exception as e:
+            logger.warning(f"⚠️ Could not save host stats {self.host_stats_path}: {e}")
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _host_stats(self, host: str) -> dict:
+        self._touched.add(host)
+        return self.stats.setdefault(host, {
+            "attempts": 0, "failures": 0, "consecutive_failures": 0,
+            "avg_latency": None, "last_failure": None,
+        })
+
+    def record_attempt(self, url: str, latency: float, status: Optional[int] = None):
+        """Latency of one request, and backoff when the host pushes back. Failures are counted per URL."""
+        host = get_host(url)
+        stats = self._host_stats(host)
+        if status is None:
+            if stats["avg_latency"] is None:
+                stats["avg_latency"] = latency
+            else:
+                stats["avg_latency"] = (1 - LATENCY_SMOOTHING) * stats["avg_latency"] + LATENCY_SMOOTHING * latency
+        elif status in THROTTLE_STATUSES:
+            # Host is pushing back: double the spacing for the rest of this run
+            interval = self._host_interval.get(host, self.per_host_interval) or 1.0
+            self._host_interval[host] = min(interval * 2, MAX_HOST_INTERVAL)
+            logger.warning(f"🐢 {host} returned HTTP {status}, spacing requests {self._host_interval[host]:.1f}s apart")
+
+    def record_outcome(self, url: str, error: Optional[Exception] = None):
+        """
+        Final outcome of one URL after its retries. Only host errors (see
+        is_host_error) count towards skipping the host; any other answer shows
+        the host is up and resets its run of failures.
+        """
+        stats = self._host_stats(get_host(url))
+        stats["attempts"] += 1
+        if error is None or not self.is_host_error(error):
+            stats["consecutive_failures"] = 0
+            return
+
+        stats["failures"] += 1
+        stats["consecutive_failures"] += 1
+        stats["last_failure"] = datetime.now().isoformat(timespec="seconds")
+
+    @staticmethod
+    def is_host_error(error: Exception) -> bool:
+        status = getattr(error, "status", None)
+        if status is not None:
+            return status >= 500 or status == 429
+        return isinstance(error, HOST_ERRORS)
+
+    def is_skipped(self, host: str) -> bool:
+        stats = self.stats.get(host)
+        if not stats or stats["consecutive_failures"] < self.skip_host_after_failures:
+            return False
+        last_failure = stats.get("last_failure")
+        if not last_failure:
+            return False
+        return datetime.fromisoformat(last_failure) > datetime.now() - timedelta(hours=self.skip_host_hours)
+
+    def _host_score(self, host: str) -> tuple:
+        stats = self.stats.get(host)
+        if not stats or not stats["attempts"]:
+            return (0.0, 0.0)
+        failure_rate = stats["failures"] / stats["attempts"]
+        return (round(failure_rate, 1), stats["avg_latency"] or 0.0)
+
+    # ------------------- Ordering -------------------
+    def order(self, entries: List[dict], url_key="url") -> List[dict]:
+        """
+        Drop entries on skipped hosts and interleave the rest round-robin across
+        hosts, healthy and fast hosts first, so no host gets a burst of requests.
+        """
+        by_host: Dict[str, List[dict]] = {}
+        skipped = 0
+        for entry in entries:
+            host = get_host(entry[url_key])
+            if self.is_skipped(host):
+                skipped += 1
+                continue
+            by_host.setdefault(host, []).append(entry)
+
+        if skipped:
+            logger.info(f"⏭️ Skipping {skipped} candidate(s) on hosts with repeated recent failures")
+
+        queues = [by_host[h] for h in sorted(by_host, key=self._host_score)]
+        ordered = []
+        depth = 0
+        while any(depth < len(q) for q in queues):
+            ordered.extend(q[depth] for q in queues if depth < len(q))
+            depth += 1
+        return ordered
+
+    # ------------------- Slots -------------------
+    async def _wait_for_spacing(self, host: str):
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            start = max(now, self._host_next_start.get(host, now))
+            self._host_next_start[host] = start + self._host_interval.get(host, self.per_host_interval)
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        """
+        Hold a download slot for `url`. The per-host slot is taken before the
+        global one so a busy host never holds global capacity while waiting.
+        Latency and throttling are recorded on exit; callers report the URL's
+        outcome with record_outcome once its retries are over.
+        """
+        host = get_host(url)
+        host_semaphore = self._host_semaphores.setdefault(host, asyncio.Semaphore(self.per_host_concurrency))
+
+        async with host_semaphore:
+            await self._wait_for_spacing(host)
+            async with self._global:
+                started = time.monotonic()
+                try:
+                    yield
+                except Exception as e:
+                    self.record_attempt(url, time.monotonic() - started, status=getattr(e, "status", None))
+                    raise
+                else:
+                    self.record_attempt(url, time.monotonic() - started)
+
+    @staticmethod
+    def should_retry(error: Exception) -> bool:
+        # Wrong content type on a 200, or a missing document, will not change on retry
+        status = getattr(error, "status", None)
+        return status != 200 and status not in GONE_STATUSES
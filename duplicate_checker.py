@@ -5,10 +5,11 @@ import logging
 import asyncio
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Optional
-import openai
+from typing import Dict, List, Optional, Set, Tuple
+from rate_governor import chat_completion
 import yaml
 import re
+from records import has_candidates, iter_candidates
 
 logger = logging.getLogger(__name__)
 
@@ -21,13 +22,38 @@ def clean_response_text(text: str) -> str:
     text = re.sub(r'\s*```\s*$', '', text, flags=re.IGNORECASE)
     return text.strip()
 
-def get_recent_results(base_folder="pages", exclude_hash: Optional[str] = None, hours_back=48, limit=50) -> List[str]:
+
+# Summaries at or above this word overlap are treated as duplicates without asking GPT
+AUTO_DUPLICATE_SIMILARITY = 0.7
+# Pairs below this overlap (and without a shared company name) are never sent to GPT
+CANDIDATE_SIMILARITY = 0.25
+# Maximum number of pairs judged in a single GPT call
+PAIRS_PER_PROMPT = 15
+
+GENERIC_COMPANY_NAMES = {"", "unknown", "undisclosed", "not disclosed", "n/a", "none", "various", "multiple"}
+
+STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "for", "to", "in", "on", "with", "by", "at", "is", "are",
+    "company", "opportunity", "who", "contact", "directly", "listed", "no", "est", "raise", "raising",
+}
+
+def get_recent_results(base_folder="pages", exclude_hash: Optional[str] = None, hours_back=48, limit=50,
+                       exclude_hashes: Optional[Set[str]] = None, run_folder=None) -> List[str]:
     """
     Load up to `limit` results from the last 48 hours (or specified hours),
-    excluding the provided hash if specified.
+    excluding the provided hash (or set of hashes) if specified.
+
+    Hashes are derived from the URL alone, so a document found again keeps its
+    hash in every run. With `run_folder`, exclusions apply to that run only and
+    earlier runs' results for the same hash stay in the history.
     """
     cutoff_time = datetime.now() - timedelta(hours=hours_back)
     entries = []
+
+    excluded = set(exclude_hashes or ())
+    if exclude_hash:
+        excluded.add(exclude_hash)
+    run_path = Path(run_folder).resolve() if run_folder is not None else None
     
     base_path = Path(base_folder)
     if not base_path.exists():
@@ -36,6 +62,7 @@ def get_recent_results(base_folder="pages", exclude_hash: Optional[str] = None,
     for folder in base_path.iterdir():
         if not folder.is_dir():
             continue
+        folder_excluded = excluded if run_path is None or folder.resolve() == run_path else set()
             
         # Check if folder is recent enough
         try:
@@ -45,29 +72,25 @@ def get_recent_results(base_folder="pages", exclude_hash: Optional[str] = None,
         except:
             continue
         
-        # Look for ready_candidates.json in this folder
-        candidates_path = folder / "ready_candidates.json"
-        if not candidates_path.exists():
+        # Look for ready candidates (JSONL with results, or legacy JSON) in this folder
+        if not has_candidates(folder):
             continue
             
         try:
-            with open(candidates_path, "r", encoding="utf-8") as f:
-                candidates = json.load(f)
-                
-            for candidate in candidates:
-                # Skip excluded hash
-                if exclude_hash and candidate.get("hash") == exclude_hash:
+            folder_mtime = folder.stat().st_mtime
+            for candidate in iter_candidates(folder):
+                # Skip excluded hashes
+                if candidate.hash in folder_excluded:
                     continue
                     
                 # Get the result if available
-                result = candidate.get("result")
+                result = candidate.result
                 if result and result.strip() and result.strip() != "X":
                     # Use modification time of the folder for sorting
-                    folder_mtime = folder.stat().st_mtime
                     entries.append((folder_mtime, result))
                     
         except Exception as e:
-            logger.warning(f"Error reading {candidates_path}: {e}")
+            logger.warning(f"Error reading candidates in {folder}: {e}")
             continue
     
     # Sort by most recent (descending)
@@ -75,79 +98,178 @@ def get_recent_results(base_folder="pages", exclude_hash: Optional[str] = None,
     # Return only content of top `limit` entries
     return [content for _, content in entries[:limit]]
 
-async def is_duplicate(new_text: str, new_hash: Optional[str] = None) -> bool:
-    """
-    Returns True if the new_text is semantically duplicative of recent results.
-    """
-    if not new_text or new_text.strip() == "X":
-        return False  # Don't waste GPT calls on non-substantive filings
+def extract_company_name(text: str) -> str:
+    match = re.search(r"^\s*Company:\s*(.+)$", text, flags=re.IGNORECASE | re.MULTILINE)
+    if not match:
+        return ""
+    name = re.sub(r"[^\w\s&.-]", "", match.group(1)).strip().lower()
+    return "" if name in GENERIC_COMPANY_NAMES else name
 
-    old_texts = get_recent_results(exclude_hash=new_hash, hours_back=48, limit=50)
-    if not old_texts:
-        return False
+def summary_tokens(text: str) -> Set[str]:
+    words = re.findall(r"[a-z0-9$€£₹.]+", text.lower())
+    return {w.strip(".") for w in words if w.strip(".") and w not in STOPWORDS}
 
-    # If we have too many old texts, truncate to fit token limits
-    total_length = sum(len(text) for text in old_texts)
-    max_old_texts_length = 15000  # Rough token estimate
-    
-    if total_length > max_old_texts_length:
-        # Truncate oldest texts first (they're at the end since we sorted reverse)
-        truncated_texts = []
-        current_length = 0
-        for text in reversed(old_texts):
-            if current_length + len(text) > max_old_texts_length:
-                break
-            truncated_texts.append(text)
-            current_length += len(text)
-        old_texts = list(reversed(truncated_texts))
-
-    prompt = f"""
+def similarity(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # Keep the lower index as root so new summaries stay ahead of history
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+def build_pairs_prompt(texts: Dict[int, str], pairs: List[Tuple[int, int]]) -> str:
+    numbered = "\n\n".join(f"[{i}]\n{text}" for i, text in texts.items())
+    pair_lines = "\n".join(f"- {a} vs {b}" for a, b in pairs)
+    return f"""
 You are a financial analyst reviewing summaries of investment opportunities for potential duplication.
 
-You are given a **NEW investment summary** and a list of **OLD investment summaries** from the past 48 hours.
+Below are numbered investment summaries and a list of pairs to compare.
 
-Determine if the new summary is **semantically duplicative** of any previous ones — meaning it describes essentially the same investment opportunity, company, deal structure, terms, or parties.
+For each pair, decide if the two summaries are **semantically duplicative** — meaning they describe essentially the same investment opportunity, company, deal structure, terms, or parties.
 
 Summaries may differ in wording or formatting, but if they describe the same investment opportunity or closely related deals, they are considered duplicates.
 
-Reply ONLY with one word:
-- "YES" if it's a duplicate
-- "NO" if it's materially different or substantively unique
+Respond ONLY in strict JSON format like:
+{{"duplicates": [[1, 4], [2, 3]]}}
+
+listing only the pairs that ARE duplicates (use an empty list if none are).
 
-NEW SUMMARY:
-{new_text}
+SUMMARIES:
+{numbered}
 
-OLD SUMMARIES:
-{chr(10).join(old_texts)}
+PAIRS:
+{pair_lines}
 """
 
+async def judge_pairs_with_gpt(texts: List[str], pairs: List[Tuple[int, int]]) -> Set[Tuple[int, int]]:
     config = load_config()
     api_key = config.get("openai", {}).get("api_key")
     if not api_key:
         logger.error("Missing OpenAI API key in config.yaml")
-        return False
-
-    openai.api_key = api_key
-
-    try:
-        logger.info("🤖 Checking for semantic duplicates with GPT...")
-        response = openai.chat.completions.create(
-            model="gpt-4o-mini",  # Use cheaper model for this check
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that checks for semantic duplication in investment summaries."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=10,
-            temperature=0.1,
-        )
-        raw_output = response.choices[0].message.content
-        cleaned_output = clean_response_text(raw_output)
-        
-        is_dup = cleaned_output.strip().lower().startswith("yes")
-        logger.info(f"✅ Duplicate check result: {'DUPLICATE' if is_dup else 'UNIQUE'}")
-        return is_dup
-        
-    except Exception as e:
-        logger.error(f"❌ Error in duplicate check: {e}")
-        # On error, assume it's not a duplicate to avoid false positives
-        return False
\ No newline at end of file
+        return set()
+
+    confirmed = set()
+
+    for start in range(0, len(pairs), PAIRS_PER_PROMPT):
+        batch = pairs[start:start + PAIRS_PER_PROMPT]
+        involved = sorted({i for pair in batch for i in pair})
+        prompt = build_pairs_prompt({i: texts[i] for i in involved}, batch)
+
+        try:
+            logger.info(f"🤖 Checking {len(batch)} candidate duplicate pair(s) with GPT...")
+            response = await chat_completion(
+                "dedupe",
+                model="gpt-4o-mini",  # Use cheaper model for this check
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant that checks for semantic duplication in investment summaries."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=300,
+                temperature=0.1,
+            )
+            parsed = json.loads(clean_response_text(response.choices[0].message.content))
+            asked = set(batch)
+            for pair in parsed.get("duplicates", []):
+                if len(pair) != 2:
+                    continue
+                a, b = int(pair[0]), int(pair[1])
+                if (a, b) in asked or (b, a) in asked:
+                    confirmed.add((a, b))
+        except Exception as e:
+            # On error, assume the batch holds no duplicates to avoid false positives
+            logger.error(f"❌ Error in duplicate check: {e}")
+
+    return confirmed
+
+async def group_duplicates(new_results: Dict[str, str], exclude_hashes: Optional[Set[str]] = None,
+                           hours_back=48, limit=50, run_folder=None, base_folder="pages") -> List[dict]:
+    """
+    Cluster a run's new summaries against each other and the recent history in one pass.
+
+    Near-identical summaries are merged locally; only plausible pairs are sent to GPT,
+    several pairs per call. Returns one dict per group of new hashes:
+    {"hashes": [...], "representative": hash or None, "history": bool}.
+    `representative` is None when the group repeats an already reported result.
+    `exclude_hashes` (and the new hashes) are only left out of `run_folder`'s
+    own results, so a document re-found in a later run is compared with its
+    earlier result.
+    """
+    new_items = [(h, text) for h, text in new_results.items() if text and text.strip() != "X"]
+    if not new_items:
+        return []
+
+    excluded = set(exclude_hashes or ()) | {h for h, _ in new_items}
+    old_texts = get_recent_results(base_folder, exclude_hashes=excluded, hours_back=hours_back, limit=limit,
+                                   run_folder=run_folder)
+
+    texts = [text for _, text in new_items] + old_texts
+    n_new = len(new_items)
+    tokens = [summary_tokens(text) for text in texts]
+    companies = [extract_company_name(text) for text in texts]
+
+    uf = _UnionFind(len(texts))
+    candidate_pairs = []
+
+    # Only new-vs-new and new-vs-old pairs matter; history was deduplicated by earlier runs
+    for i in range(n_new):
+        for j in range(i + 1, len(texts)):
+            score = similarity(tokens[i], tokens[j])
+            same_company = bool(companies[i]) and companies[i] == companies[j]
+            if score >= AUTO_DUPLICATE_SIMILARITY:
+                uf.union(i, j)
+            elif same_company or score >= CANDIDATE_SIMILARITY:
+                candidate_pairs.append((score, i, j))
+
+    # Most similar pairs first, and skip pairs already joined by a stronger match
+    candidate_pairs.sort(reverse=True)
+    pending = [(i, j) for _, i, j in candidate_pairs if uf.find(i) != uf.find(j)]
+
+    if pending:
+        for a, b in await judge_pairs_with_gpt(texts, pending):
+            uf.union(a, b)
+
+    groups = {}
+    for i in range(len(texts)):
+        groups.setdefault(uf.find(i), []).append(i)
+
+    result = []
+    for members in groups.values():
+        new_members = [i for i in members if i < n_new]
+        if not new_members:
+            continue
+        in_history = any(i >= n_new for i in members)
+        hashes = [new_items[i][0] for i in new_members]
+        result.append({
+            "hashes": hashes,
+            "representative": None if in_history else hashes[0],
+            "history": in_history,
+        })
+
+    duplicates = sum(len(g["hashes"]) - (0 if g["history"] else 1) for g in result)
+    logger.info(f"✅ Duplicate check: {n_new} new result(s), {len(result)} group(s), "
+                f"{duplicates} duplicate(s), {len(pending)} pair(s) sent to GPT")
+    return result
+
+async def is_duplicate(new_text: str, new_hash: Optional[str] = None) -> bool:
+    """
+    Returns True if the new_text is semantically duplicative of recent results.
+    """
+    if not new_text or new_text.strip() == "X":
+        return False  # Don't waste GPT calls on non-substantive filings
+
+    key = new_hash or "new"
+    groups = await group_duplicates({key: new_text})
+    return any(g["history"] for g in groups)
@@ -0,0 +1,199 @@
+import sys
+import gzip
+import json
+import time
+import logging
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterator, Optional
+
+from archive_index import get_run_date
+from compact_storage import artifact_stem, glob_artifacts, read_artifact_text, zstandard
+from records import dumps, has_candidates, iter_candidates
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ("all", "positive", "negative", "unanalyzed", "sent")
+READ_WORKERS = 8
+MAX_IN_FLIGHT = 32  # Documents read ahead of the writer; bounds memory use
+
+# ------------------- Selection -------------------
+def _run_queries(folder: Path) -> list:
+    info_path = folder / "run_info.json"
+    if not info_path.exists():
+        return []
+    try:
+        with open(info_path, "r", encoding="utf-8") as f:
+            return json.load(f).get("queries") or []
+    except Exception as e:
+        logger.warning(f"⚠️ Error reading {info_path}: {e}")
+        return []
+
+def select_runs(base_folder="pages", since: Optional[str] = None, until: Optional[str] = None,
+                query: Optional[str] = None) -> Iterator[tuple]:
+    """
+    Yield (folder, run_date) for run folders whose date falls in [since, until]
+    (ISO dates or datetimes) and whose queries contain `query` (case-insensitive).
+    """
+    base_path = Path(base_folder)
+    if not base_path.exists():
+        return
+
+    for folder in sorted(base_path.iterdir()):
+        if not folder.is_dir() or not has_candidates(folder):
+            continue
+        run_date = get_run_date(folder)
+        # ISO strings compare correctly; a bare 'until' date includes that whole day
+        if since and run_date < since:
+            continue
+        if until and run_date[:len(until)] > until:
+            continue
+        if query and not any(query.lower() in q.lower() for q in _run_queries(folder)):
+            continue
+        yield folder, run_date
+
+def matches_status(entry, status: str) -> bool:
+    result = (entry.result or "").strip()
+    if status == "positive":
+        return bool(result) and result != "X"
+    if status == "negative":
+        return result == "X"
+    if status == "unanalyzed":
+        return not result
+    if status == "sent":
+        return bool(entry.get("sent_at"))
+    return True
+
+def iter_documents(runs, status: str = "all", include_duplicates: bool = False) -> Iterator[dict]:
+    """Yield document metadata (with the txt path to read) for every selected candidate."""
+    for folder, run_date in runs:
+        txt_folder = folder / "txt"
+        txt_files = {artifact_stem(p): p for p in glob_artifacts(txt_folder, "*.txt")} if txt_folder.exists() else {}
+        for entry in iter_candidates(folder):
+            if entry.duplicate_of and not include_duplicates:
+                continue
+            if not matches_status(entry, status) or entry.hash not in txt_files:
+                continue
+            yield {
+                "run": folder.name,
+                "run_date": run_date,
+                "hash": entry.hash,
+                "url": entry.url,
+                "name": entry.name,
+                "source_urls": entry.source_urls or [entry.url],
+                "result": entry.result,
+                "path": txt_files[entry.hash],
+            }
+
+# ------------------- Reading -------------------
+def _load(doc: dict) -> dict:
+    try:
+        doc["text"] = read_artifact_text(doc["path"])
+    except Exception as e:
+        logger.warning(f"⚠️ Could not read {doc['path']}: {e}")
+        doc["text"] = None
+    return doc
+
+def read_in_parallel(docs: Iterator[dict], workers: int = READ_WORKERS, max_in_flight: int = MAX_IN_FLIGHT) -> Iterator[dict]:
+    """
+    Read documents on a thread pool, yielding them in input order. At most
+    `max_in_flight` documents are held in memory at once.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for doc in docs:
+            pending.append(pool.submit(_load, doc))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+# ------------------- Writing -------------------
+def open_output(path: str, compression: Optional[str] = None):
+    """
+    Open the output as a binary stream. Compression is taken from the flag or
+    the file suffix (.gz, .zst); '-' writes to stdout.
+    """
+    if compression is None:
+        if path.endswith(".gz"):
+            compression = "gzip"
+        elif path.endswith(".zst"):
+            compression = "zstd"
+
+    raw = sys.stdout.buffer if path == "-" else open(path, "wb")
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="wb"), raw
+    if compression == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed; use --compress gzip")
+        return zstandard.ZstdCompressor(level=10).stream_writer(raw, closefd=False), raw
+    return raw, raw
+
+def format_document(doc: dict, output_format: str) -> bytes:
+    if output_format == "jsonl":
+        record = {k: v for k, v in doc.items() if k != "path"}
+        return dumps(record) + b"\n"
+    # Same layout as sum.py: "<file name>:\n<content>\n"
+    return f"{doc['hash']}.txt:\n{doc['text']}\n\n".encode("utf-8")
+
+def export_corpus(output: str, base_folder="pages", output_format: str = "txt", since: Optional[str] = None,
+                  until: Optional[str] = None, query: Optional[str] = None, status: str = "all",
+                  include_duplicates: bool = False, compression: Optional[str] = None,
+                  workers: int = READ_WORKERS) -> dict:
+    runs = list(select_runs(base_folder, since=since, until=until, query=query))
+    docs = iter_documents(runs, status=status, include_duplicates=include_duplicates)
+
+    stats = {"runs": len(runs), "documents": 0, "skipped": 0, "bytes": 0}
+    stream, raw = open_output(output, compression)
+    try:
+        for doc in read_in_parallel(docs, workers=workers):
+            if doc["text"] is None:
+                stats["skipped"] += 1
+                continue
+            data = format_document(doc, output_format)
+            stream.write(data)
+            stats["documents"] += 1
+            stats["bytes"] += len(data)
+    finally:
+        if stream is not raw:
+            stream.close()
+        if raw is not sys.stdout.buffer:
+            raw.close()
+        else:
+            raw.flush()
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge run folders' txt outputs and results into one corpus file")
+    parser.add_argument("output", help="Output file ('-' for stdout); .gz / .zst suffix compresses")
+    parser.add_argument("--pages", default="pages")
+    parser.add_argument("--format", choices=("txt", "jsonl"), default="txt",
+                        help="Plain text, or JSONL with run/hash/URL/result metadata")
+    parser.add_argument("--since", help="Earliest run date (YYYY-MM-DD or ISO datetime)")
+    parser.add_argument("--until", help="Latest run date (YYYY-MM-DD or ISO datetime, inclusive)")
+    parser.add_argument("--query", help="Only runs whose search queries contain this text")
+    parser.add_argument("--status", choices=STATUSES, default="all",
+                        help="positive: non-X result, negative: X, unanalyzed: no result, sent: sent to Telegram")
+    parser.add_argument("--include-duplicates", action="store_true", help="Also export documents marked as duplicates")
+    parser.add_argument("--compress", choices=("gzip", "zstd"), default=None)
+    parser.add_argument("--workers", type=int, default=READ_WORKERS, help="Parallel file readers")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+    start = time.perf_counter()
+    stats = export_corpus(
+        args.output, base_folder=args.pages, output_format=args.format, since=args.since, until=args.until,
+        query=args.query, status=args.status, include_duplicates=args.include_duplicates,
+        compression=args.compress, workers=args.workers,
+    )
+    print(
+        f"Exported {stats['documents']} document(s) from {stats['runs']} run(s) "
+        f"({stats['bytes'] / 1e6:.1f} MB uncompressed, {stats['skipped']} unreadable) "
+        f"in {time.perf_counter() - start:.1f}s",
+        file=sys.stderr,
+    )
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,15 @@
-import os
-import glob
 import json
 import yaml
 from bs4 import BeautifulSoup
 import hashlib
+from url_utils import canonicalize_url, url_key
+from records import Candidate, write_records
+from compact_storage import glob_artifacts, read_artifact_text
 
-def generate_hash(name, url, description):
-    # Combine fields into one string
-    combined = f"{name}|{url}|{description}"
-    # Create SHA-256 hash and return as hex string (shortened if you want)
-    return hashlib.sha256(combined.encode('utf-8')).hexdigest()[:16]  # 16 chars for brevity
+def generate_hash(url):
+    # Hash only the URL identity so the same document keeps its hash across runs,
+    # whatever title or snippet Google shows that day
+    return hashlib.sha256(url_key(url).encode('utf-8')).hexdigest()[:16]  # 16 chars for brevity
 
 def extract_results_from_html(html_content):
     soup = BeautifulSoup(html_content, 'html.parser')
@@ -26,7 +26,8 @@ def extract_results_from_html(html_content):
         link_tag = g.select_one('a')
         if not link_tag or not link_tag.has_attr('href'):
             continue
-        url = link_tag['href']
+        raw_url = link_tag['href']
+        url = canonicalize_url(raw_url)
 
         # Attempt snippet extraction using multiple fallback methods:
         description = ''
@@ -51,20 +52,21 @@ def extract_results_from_html(html_content):
                 description = description[:300] + '...'
 
         # Generate hash for this entry
-        entry_hash = generate_hash(title, url, description)
+        entry_hash = generate_hash(url)
 
-        results.append({
-            'hash': entry_hash,
-            'name': title,
-            'url': url,
-            'description': description
-        })
+        results.append(Candidate(
+            hash=entry_hash,
+            name=title,
+            url=url,
+            description=description,
+            source_urls=[raw_url]
+        ))
 
     return results
 
 def load_all_html_files(folder_path):
-    pattern = os.path.join(folder_path, '**', '*.html')
-    return glob.glob(pattern, recursive=True)
+    # SERP pages of older runs may have been compressed by compaction
+    return [str(p) for p in glob_artifacts(folder_path, '**/*.html')]
 
 def extract_all_results(
     html_folder='./pages',
@@ -76,19 +78,31 @@ def extract_all_results(
     html_files = load_all_html_files(html_folder)
 
     for html_file in html_files:
-        with open(html_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-            extracted = extract_results_from_html(content)
-            all_results.extend(extracted)
-
-    # Deduplicate by URL
-    unique_results = list({r['url']: r for r in all_results}.values())
-
-    if output_format.lower() == 'json':
+        extracted = extract_results_from_html(read_artifact_text(html_file))
+        all_results.extend(extracted)
+
+    # Deduplicate by canonical URL, remembering every raw URL that pointed to it
+    by_hash = {}
+    for r in all_results:
+        existing = by_hash.get(r.hash)
+        if existing is None:
+            by_hash[r.hash] = r
+            continue
+        for source in r.source_urls:
+            if source not in existing.source_urls:
+                existing.source_urls.append(source)
+        # Prefer the https variant when both were seen
+        if existing.url.startswith('http://') and r.url.startswith('https://'):
+            existing.url = r.url
+    unique_results = list(by_hash.values())
+
+    if output_format.lower() == 'jsonl':
+        write_records(output_file, unique_results)
+    elif output_format.lower() == 'json':
         with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(unique_results, f, indent=2, ensure_ascii=False)
+            json.dump([r.to_dict() for r in unique_results], f, indent=2, ensure_ascii=False)
     else:
         with open(output_file, 'w', encoding='utf-8') as f:
-            yaml.dump(unique_results, f, allow_unicode=True)
+            yaml.dump([r.to_dict() for r in unique_results], f, allow_unicode=True)
 
     return unique_results
@@ -1,5 +1,4 @@
 import os
-import json
 import logging
 import aiohttp
 import asyncio
@@ -8,7 +7,11 @@ import traceback
 import random
 from pathlib import Path
 from pdfminer.high_level import extract_text
-from bs4 import BeautifulSoup
+from download_scheduler import HostScheduler
+from prefetch import prefetch_candidates
+from records import iter_candidates
+from compact_storage import artifact_stem, glob_artifacts, read_artifact_text, write_artifact
+from content_extract import extract_main_text
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -19,7 +22,6 @@ USER_AGENTS = [
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.5735.198 Safari/537.36",
 ]
 
-SEMAPHORE_LIMIT = 5
 RETRY_ATTEMPTS = 3
 TIMEOUT_SECS = 20
 
@@ -52,8 +54,7 @@ async def download_file(session, url, save_path, only_pdf=False, timeout_secs=TI
                         else:
                             final_path = save_path if save_path.endswith(".html") else save_path + ".html"
 
-                    with open(final_path, "wb") as f:
-                        f.write(content)
+                    write_artifact(final_path, content)
 
                     logger.info(f"✅ Downloaded {final_path} ({content_type})")
                 else:
@@ -72,41 +73,60 @@ async def download_file(session, url, save_path, only_pdf=False, timeout_secs=TI
         logger.error(f"❌ Error downloading {url}: {repr(e)}\n{traceback.format_exc()}")
         raise
 
-async def download_with_retries(url, save_path, session, semaphore, only_pdf=False):
-    async with semaphore:
-        for attempt in range(RETRY_ATTEMPTS):
-            try:
-                await asyncio.sleep(random.uniform(1, 3))
-                await download_file(session, url, save_path, only_pdf=only_pdf)
-                return
-            except Exception:
-                logger.warning(f"🔁 Retry {attempt + 1} for {url}")
-        logger.error(f"❌ All retries failed for {url}")
-
-async def download_files_from_ready_candidates(ready_candidates_path, base_pages_folder="pages", only_pdf=False):
-    with open(ready_candidates_path, "r", encoding="utf-8") as f:
-        candidates = json.load(f)
+async def download_with_retries(url, save_path, session, scheduler, only_pdf=False, timeout_secs=TIMEOUT_SECS):
+    error = None
+    for attempt in range(RETRY_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(random.uniform(1, 3))  # random delay between attempts
+        try:
+            async with scheduler.slot(url):
+                await download_file(session, url, save_path, only_pdf=only_pdf, timeout_secs=timeout_secs)
+            scheduler.record_outcome(url)
+            return
+        except Exception as e:
+            error = e
+            if not scheduler.should_retry(e):
+                break
+            logger.warning(f"🔁 Retry {attempt + 1} for {url}")
+    # One outcome per URL, so a few dead links don't get their whole host skipped
+    scheduler.record_outcome(url, error)
+    logger.error(f"❌ All retries failed for {url}")
+
+async def download_files_from_ready_candidates(ready_candidates_path, base_pages_folder="pages", only_pdf=False, hashes=None,
+                                              prefetch=True, timeout_secs=TIMEOUT_SECS):
+    candidates = list(iter_candidates(os.path.dirname(ready_candidates_path)))
+
+    if hashes is not None:
+        # Only these hashes, in the given order (a worker shard, or deferred files)
+        by_hash = {c.hash: c for c in candidates}
+        candidates = [by_hash[h] for h in hashes if h in by_hash]
 
     file_candidates = [c for c in candidates if c.get("url", "").strip()]
 
     if not file_candidates:
-        logger.info("ℹ️ No file URLs found in ready_candidates.json")
+        logger.info("ℹ️ No file URLs found in ready candidates")
         return
 
     latest_folder = os.path.dirname(ready_candidates_path)
     download_folder = os.path.join(latest_folder, "downloads")
     os.makedirs(download_folder, exist_ok=True)
 
-    semaphore = asyncio.Semaphore(SEMAPHORE_LIMIT)
+    scheduler = HostScheduler.from_config()
 
     async with aiohttp.ClientSession() as session:
+        if prefetch:
+            # Host order first (drops skipped hosts), then the prefetch screens and sorts smallest-first
+            file_candidates = await prefetch_candidates(
+                scheduler.order(file_candidates), latest_folder, session, pdf_only=only_pdf
+            )
+        # Otherwise the hashes were already prefetched (coordinator) or deferred by a prefetch
         tasks = []
         for entry in file_candidates:
             url = entry["url"]
             ext = ".pdf" if url.lower().endswith(".pdf") else ".html"
             filename = f"{entry['hash']}{ext}"
             save_path = os.path.join(download_folder, filename)
-            tasks.append(download_with_retries(url, save_path, session, semaphore, only_pdf=only_pdf))
+            tasks.append(download_with_retries(url, save_path, session, scheduler, only_pdf=only_pdf, timeout_secs=timeout_secs))
 
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
@@ -114,17 +134,22 @@ async def download_files_from_ready_candidates(ready_candidates_path, base_pages
             if isinstance(result, Exception):
                 logger.warning(f"⚠️ Download task {i} raised an exception: {repr(result)}")
 
+    scheduler.save_stats()
+
     logger.info(f"📥 Attempted to download {len(file_candidates)} files into {download_folder}")
 
-def convert_files_to_text(base_folder, only_pdf=False):
+def convert_files_to_text(base_folder, only_pdf=False, files=None):
     download_folder = os.path.join(base_folder, "downloads")
     txt_folder = os.path.join(base_folder, "txt")
     os.makedirs(txt_folder, exist_ok=True)
 
-    if only_pdf:
-        files = list(Path(download_folder).glob("*.pdf"))
+    if files is not None:
+        files = [Path(download_folder) / name for name in files]
+    elif only_pdf:
+        files = glob_artifacts(download_folder, "*.pdf")
     else:
-        files = list(Path(download_folder).glob("*.*"))
+        # Downloaded pages may have been compressed by compaction (abc.html.zst)
+        files = glob_artifacts(download_folder, "*.pdf") + glob_artifacts(download_folder, "*.html")
 
     if not files:
         logger.info("ℹ️ No files found to convert.")
@@ -136,15 +161,11 @@ def convert_files_to_text(base_folder, only_pdf=False):
             if file_path.suffix.lower() == ".pdf":
                 text = extract_text(str(file_path))
             else:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    soup = BeautifulSoup(f, "html.parser")
-                    # Optional: extract main content container if exists
-                    main_div = soup.find("div", class_="main-container container-fluid")
-                    text = main_div.get_text(separator="\n", strip=True) if main_div else soup.get_text(separator="\n", strip=True)
-
-            txt_path = os.path.join(txt_folder, f"{file_path.stem}.txt")
-            with open(txt_path, "w", encoding="utf-8") as f:
-                f.write(text)
+                # Main article text only; nav, footers, banners and scripts cost analysis tokens
+                text = extract_main_text(read_artifact_text(file_path))
+
+            txt_path = os.path.join(txt_folder, f"{artifact_stem(file_path)}.txt")
+            write_artifact(txt_path, text)
 
             logger.info(f"📝 Converted {file_path.name} to text.")
         except Exception as e:
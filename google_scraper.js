@@ -23,11 +23,67 @@ puppeteer.use(
   })
 );
 
+// ⚡ Fast capture: we only keep the HTML, so skip everything a SERP doesn't need to render results
+const fastCapture = config.google?.fast_capture !== false;
+const BLOCKED_RESOURCE_TYPES = new Set(['image', 'media', 'font']);
+const BLOCKED_HOSTS = [
+  'googletagmanager.com',
+  'google-analytics.com',
+  'doubleclick.net',
+  'googlesyndication.com',
+  'googleadservices.com',
+  'adservice.google.com',
+  'play.google.com/log',
+  'ogs.google.com',
+];
+const RESULT_SELECTOR = 'div.tF2Cxc';
+// Whatever shows up first: results, a CAPTCHA, or Google's "no results" / consent page
+const READY_SELECTOR = `${RESULT_SELECTOR}, iframe[src*="recaptcha"], #topstuff, form[action*="consent"]`;
+const READY_TIMEOUT = 20000;
+
 async function delay(ms, reason = '') {
   if (reason) console.error(`⏳ Waiting ${ms / 1000}s - ${reason}`);
   return new Promise(resolve => setTimeout(resolve, ms));
 }
 
+function isBlockedRequest(request) {
+  const url = request.url();
+  // The CAPTCHA widget must load normally or the solver can't find it
+  if (url.includes('recaptcha')) return false;
+  if (BLOCKED_RESOURCE_TYPES.has(request.resourceType())) return true;
+  return BLOCKED_HOSTS.some(host => url.includes(host));
+}
+
+// Pauses between pages grow after a CAPTCHA and shrink back while pages load cleanly
+class AdaptiveDelay {
+  constructor(baseMs = 1000, maxMs = 30000) {
+    this.baseMs = baseMs;
+    this.maxMs = maxMs;
+    this.level = 0;
+  }
+
+  captchaSeen() {
+    this.level = Math.min(this.level + 2, 5);
+  }
+
+  cleanPage() {
+    this.level = Math.max(this.level - 1, 0);
+  }
+
+  nextMs() {
+    const ms = Math.min(this.baseMs * 2 ** this.level, this.maxMs);
+    return Math.round(ms * (0.75 + Math.random() * 0.5));  // jitter so requests don't look scripted
+  }
+}
+
+async function waitForResults(page) {
+  try {
+    await page.waitForSelector(READY_SELECTOR, { timeout: READY_TIMEOUT });
+  } catch (err) {
+    console.error(`⚠️ No results selector after ${READY_TIMEOUT / 1000}s, saving what loaded`);
+  }
+}
+
 function buildSearchUrl(query, start = 0, timeRange = null) {
   let baseUrl = `https://www.google.com/search?q=${encodeURIComponent(query)}&hl=en-GB`;
   
@@ -49,7 +105,8 @@ function buildSearchUrl(query, start = 0, timeRange = null) {
   return baseUrl;
 }
 
-async function scrapeGoogleResults(query, pagesLimitFromInput, folderPath, timeRange = null) {
+// onPageSaved({ page, path }) resolves to false to stop paging early
+async function scrapeGoogleResults(query, pagesLimitFromInput, folderPath, timeRange = null, onPageSaved = null) {
   // Ensure the target folder exists
   fs.mkdirSync(folderPath, { recursive: true });
 
@@ -62,7 +119,7 @@ async function scrapeGoogleResults(query, pagesLimitFromInput, folderPath, timeR
       '--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
     ],
     defaultViewport: null,
-    slowMo: 50
+    slowMo: fastCapture ? 0 : 50
   });
 
   const page = await browser.newPage();
@@ -71,7 +128,23 @@ async function scrapeGoogleResults(query, pagesLimitFromInput, folderPath, timeR
   page.setDefaultNavigationTimeout(180000);
   page.setDefaultTimeout(60000);
 
+  let blockedRequests = 0;
+  if (fastCapture) {
+    await page.setRequestInterception(true);
+    page.on('request', request => {
+      if (request.isInterceptResolutionHandled()) return;
+      if (isBlockedRequest(request)) {
+        blockedRequests++;
+        request.abort();
+      } else {
+        request.continue();
+      }
+    });
+  }
+
   const results = [];
+  const timings = [];
+  const pacing = new AdaptiveDelay();
   let currentPage = 0;
 
   // Use pagesLimitFromInput or fallback to config.maxPages or default 3
@@ -89,11 +162,24 @@ async function scrapeGoogleResults(query, pagesLimitFromInput, folderPath, timeR
       const url = buildSearchUrl(query, currentPage * 10, timeRange);
       console.error(`🌐 Navigating to page ${currentPage + 1} (time range: ${timeRange || 'any'}): ${url}`);
 
+      const timing = { page: currentPage + 1, captchas: 0 };
+      timings.push(timing);
+      const pageStart = Date.now();
+      const blockedBefore = blockedRequests;
+
       try {
-        await page.goto(url, { waitUntil: 'networkidle2', timeout: 180000 });
-        await delay(5000, 'Initial page load');
+        if (fastCapture) {
+          await page.goto(url, { waitUntil: 'domcontentloaded', timeout: 180000 });
+          await waitForResults(page);
+        } else {
+          await page.goto(url, { waitUntil: 'networkidle2', timeout: 180000 });
+          await delay(5000, 'Initial page load');
+        }
+        timing.load_ms = Date.now() - pageStart;
       } catch (err) {
         console.error(`❌ Navigation failed: ${err.message}`);
+        timing.error = 'navigation';
+        timing.total_ms = Date.now() - pageStart;
         await page.screenshot({ path: path.join(folderPath, `navigation-failure-page-${currentPage + 1}.png`) });
         currentPage++;
         continue;
@@ -102,6 +188,7 @@ async function scrapeGoogleResults(query, pagesLimitFromInput, folderPath, timeR
       // 🔁 CAPTCHA loop
       let captchaLoopCount = 0;
       const captchaMaxRetries = 5;
+      const captchaStart = Date.now();
 
       while (captchaLoopCount < captchaMaxRetries) {
         const captchaVisible = await page.$('iframe[src*="recaptcha"]') !== null;
@@ -111,14 +198,21 @@ async function scrapeGoogleResults(query, pagesLimitFromInput, folderPath, timeR
           break;
         }
 
+        timing.captchas++;
+        pacing.captchaSeen();
         console.error(`🔒 CAPTCHA detected. Solving attempt ${captchaLoopCount + 1}/${captchaMaxRetries}...`);
         const { solved, error } = await page.solveRecaptchas().catch(err => ({ solved: [], error: err }));
 
         if (solved?.length > 0) {
           console.error(`✅ Solved ${solved.length} CAPTCHA(s)`);
-          await delay(8000, 'Waiting after solving CAPTCHA');
-          // Optionally reload to re-trigger content
-          await page.reload({ waitUntil: 'networkidle2' });
+          if (fastCapture) {
+            await page.reload({ waitUntil: 'domcontentloaded' });
+            await waitForResults(page);
+          } else {
+            await delay(8000, 'Waiting after solving CAPTCHA');
+            // Optionally reload to re-trigger content
+            await page.reload({ waitUntil: 'networkidle2' });
+          }
         } else {
           console.error(`⚠️ CAPTCHA solve failed: ${error?.message || 'unknown error'}`);
           await delay(10000, 'Waiting before retry');
@@ -126,13 +220,17 @@ async function scrapeGoogleResults(query, pagesLimitFromInput, folderPath, timeR
 
         captchaLoopCount++;
       }
+      timing.captcha_ms = Date.now() - captchaStart;
 
       if (captchaLoopCount >= captchaMaxRetries) {
         console.error('❌ Too many CAPTCHA loops, skipping this page.');
+        timing.error = 'captcha';
+        timing.total_ms = Date.now() - pageStart;
         await page.screenshot({ path: path.join(folderPath, `captcha-failure-page-${currentPage + 1}.png`) });
         currentPage++;
         continue;
       }
+      if (timing.captchas === 0) pacing.cleanPage();
 
       // 🍪 Accept cookie banner if present
       try {
@@ -150,7 +248,11 @@ async function scrapeGoogleResults(query, pagesLimitFromInput, folderPath, timeR
           if (btn) {
             await btn.click();
             console.error('🍪 Clicked "Accept all" consent button');
-            await delay(3000, 'Waiting after accepting cookies');
+            if (fastCapture) {
+              await waitForResults(page);
+            } else {
+              await delay(3000, 'Waiting after accepting cookies');
+            }
             break;
           }
         }
@@ -159,24 +261,35 @@ async function scrapeGoogleResults(query, pagesLimitFromInput, folderPath, timeR
       }
 
       // 📝 Save HTML content
+      let savedPath = null;
       try {
         const safeFilename = `google-results-page-${currentPage + 1}.html`;
         const filePath = path.join(folderPath, safeFilename);
 
         const htmlContent = await page.content();
         fs.writeFileSync(filePath, htmlContent, 'utf8');
+        timing.results = (await page.$$(RESULT_SELECTOR)).length;
 
         console.error(`✅ Saved HTML to ${filePath}`);
         results.push(filePath);
+        savedPath = filePath;
       } catch (err) {
         console.error(`❌ Failed to save HTML: ${err.message}`);
       }
 
       // ⏭️ Go to next page if available
+      timing.blocked_requests = blockedRequests - blockedBefore;
+      timing.total_ms = Date.now() - pageStart;
+
+      if (savedPath && onPageSaved && !(await onPageSaved({ page: currentPage + 1, path: savedPath }))) {
+        console.error('📉 Too few new results on this page, ending pagination.');
+        break;
+      }
+
       const nextButton = await page.$('a#pnnext');
       if (nextButton) {
         currentPage++;
-        await delay(2000, 'Waiting before next page');
+        await delay(fastCapture ? pacing.nextMs() : 2000, 'Waiting before next page');
       } else {
         console.error('ℹ️ No Next button found, ending pagination.');
         keepGoing = false;
@@ -189,27 +302,41 @@ async function scrapeGoogleResults(query, pagesLimitFromInput, folderPath, timeR
     await browser.close();
   }
 
-  return results;
+  return { results, timings };
 }
 
 // 🧠 CLI entrypoint for Python integration
+// Protocol: the first stdin line is the JSON request. With "novelty_check" set, each saved
+// page is announced on stdout as {"event": "page", ...} and the next stdin line
+// ({"continue": true|false}) decides whether to keep paging. The last stdout line is the result.
 async function main() {
   const rl = readline.createInterface({
     input: process.stdin,
-    output: process.stdout,
     terminal: false
   });
+  const lines = rl[Symbol.asyncIterator]();
 
-  let inputData = '';
-  for await (const line of rl) {
-    inputData += line;
+  async function readMessage() {
+    const { value, done } = await lines.next();
+    if (done) throw new Error('stdin closed');
+    return JSON.parse(value);
   }
 
   try {
-    const { query, pages_limit, folder_path } = JSON.parse(inputData);
+    const { query, pages_limit, folder_path, novelty_check } = await readMessage();
     const timeRange = config.google?.time_range || null;
-    const results = await scrapeGoogleResults(query, pages_limit, folder_path, timeRange);
-    console.log(JSON.stringify({ success: true, results }));
+
+    const onPageSaved = novelty_check
+      ? async ({ page, path: savedPath }) => {
+          console.log(JSON.stringify({ event: 'page', page, path: savedPath }));
+          const reply = await readMessage();
+          return reply.continue !== false;
+        }
+      : null;
+
+    const { results, timings } = await scrapeGoogleResults(query, pages_limit, folder_path, timeRange, onPageSaved);
+    console.log(JSON.stringify({ success: true, results, timings }));
+    rl.close();
   } catch (err) {
     console.log(JSON.stringify({ success: false, error: err.message }));
     process.exit(1);
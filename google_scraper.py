@@ -1,11 +1,37 @@
 import asyncio
 import json
+import logging
 
-async def scrape_google_links(query: str, pages_limit: int = 1, folder_path: str = None):
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def log_page_timings(query: str, timings: list):
+    for t in timings:
+        line = f"⏱️ Page {t.get('page')}: {t.get('total_ms', 0) / 1000:.1f}s total, {t.get('load_ms', 0) / 1000:.1f}s load"
+        if t.get("captchas"):
+            line += f", {t['captchas']} CAPTCHA(s) in {t.get('captcha_ms', 0) / 1000:.1f}s"
+        if "results" in t:
+            line += f", {t['results']} result(s)"
+        if t.get("blocked_requests"):
+            line += f", {t['blocked_requests']} request(s) blocked"
+        if t.get("error"):
+            line += f" ({t['error']} failed)"
+        logger.info(line)
+    if timings:
+        total = sum(t.get("total_ms", 0) for t in timings) / 1000
+        logger.info(f"⏱️ {len(timings)} page(s) for '{query[:60]}' in {total:.1f}s")
+
+async def scrape_google_links(query: str, pages_limit: int = 1, folder_path: str = None, novelty=None):
+    """
+    Run the Node scraper and return the saved HTML paths. With a NoveltyTracker,
+    each saved page is checked as it arrives and paging stops once it yields
+    too few new results.
+    """
     input_data = {
         "query": query, 
         "pages_limit": pages_limit,
-        "folder_path": folder_path
+        "folder_path": folder_path,
+        "novelty_check": novelty is not None,
     }
     input_json = json.dumps(input_data)
 
@@ -15,16 +41,44 @@ async def scrape_google_links(query: str, pages_limit: int = 1, folder_path: str
         stdout=asyncio.subprocess.PIPE,
         stderr=asyncio.subprocess.PIPE
     )
+    # Drain stderr (progress logs) concurrently so the pipe never fills up
+    stderr_task = asyncio.create_task(proc.stderr.read())
+
+    proc.stdin.write(input_json.encode() + b"\n")
+    await proc.stdin.drain()
+
+    output = None
+    while True:
+        line = await proc.stdout.readline()
+        if not line:
+            break
+        try:
+            message = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+        if message.get("event") == "page":
+            try:
+                keep_going = await asyncio.to_thread(novelty.check_page, message["page"], message["path"])
+            except Exception as e:
+                logger.warning(f"⚠️ Novelty check failed for page {message['page']}: {e}")
+                keep_going = True
+            proc.stdin.write(json.dumps({"continue": keep_going}).encode() + b"\n")
+            await proc.stdin.drain()
+        else:
+            output = message
 
-    stdout, stderr = await proc.communicate(input_json.encode())
+    if proc.stdin.can_write_eof():
+        proc.stdin.write_eof()
+    await proc.wait()
+    stderr = await stderr_task
 
     if proc.returncode != 0:
         raise RuntimeError(f"Google scraper failed: {stderr.decode().strip()}")
 
-    try:
-        output = json.loads(stdout.decode())
-        if not output.get("success"):
-            raise RuntimeError("Scraper returned unsuccessful result")
-        return output["results"]  # list of saved file paths
-    except json.JSONDecodeError:
+    if output is None:
         raise RuntimeError("Failed to parse Google scraper output")
+    if not output.get("success"):
+        raise RuntimeError("Scraper returned unsuccessful result")
+    log_page_timings(query, output.get("timings", []))
+    return output["results"]  # list of saved file paths
@@ -1,23 +1,22 @@
 import yaml
 import os
+import sys
 import asyncio
 import json
 import logging
+import argparse
 import shutil
 import hashlib
 import random
 import string
-from datetime import datetime
+from datetime import datetime, timedelta
 from logging.handlers import RotatingFileHandler
-from telegram_sender import TelegramSender
 from pathlib import Path
-from google_scraper import scrape_google_links
-from extract_google_results import extract_all_results
-from ai_api import rate_entries_with_gpt
-from file_work import download_files_from_ready_candidates, convert_files_to_text
-from pdf_work import download_pdfs_from_ready_candidates, convert_pdfs_to_text
-from ai_api_final import analyze_txt_file
-from duplicate_checker import is_duplicate
+import records
+from profiling import PipelineProfiler, stage, get_active as get_active_profiler
+
+# Heavy dependencies (openai, tiktoken, pdfminer, bs4, aiohttp, telegram) are imported
+# inside the stages that use them, so single-stage commands start quickly.
 
 # ------------------- Logging Setup -------------------
 logger = logging.getLogger(__name__)
@@ -41,147 +40,514 @@ def load_config(path="config.yaml"):
         return yaml.safe_load(f)
 
 # ------------------- Analysis -------------------
-async def analyze_all_txts(base_folder):
-    txt_folder = os.path.join(base_folder, "txt")
-    ready_json_path = os.path.join(base_folder, "ready_candidates.json")
-
-    with open(ready_json_path, "r", encoding="utf-8") as f:
-        candidates = json.load(f)
-        hash_entry_map = {item["hash"]: item for item in candidates}
-
-    sender = TelegramSender()
-
-    for txt_file in Path(txt_folder).glob("*.txt"):
-        hash_name = txt_file.stem
-        logger.info(f"🔍 Analyzing: {hash_name}.txt")
-
-        entry = hash_entry_map.get(hash_name)
-        if not entry:
-            logger.warning(f"⚠️ No matching entry in ready_candidates.json for hash: {hash_name}")
+async def analyze_txt_files(txt_files, hash_entry_map) -> dict:
+    """
+    Analyze the given txt files and return {hash: result} for those that produced a result.
+    """
+    from ai_api_final import analyze_txt_file
+    from compact_storage import artifact_stem
+
+    new_results = {}
+
+    for txt_file in txt_files:
+        txt_file = Path(txt_file)
+        hash_name = artifact_stem(txt_file)
+        logger.info(f"🔍 Analyzing: {txt_file.name}")
+
+        if hash_name not in hash_entry_map:
+            logger.warning(f"⚠️ No matching ready candidate for hash: {hash_name}")
             continue
 
         try:
             result = await analyze_txt_file(str(txt_file))
             if result:
-                # Check for duplicates before proceeding
-                is_dup = await is_duplicate(result, entry["hash"])
-                if is_dup:
-                    logger.info(f"🚫 Skipping duplicate: {hash_name}")
-                    entry["result"] = "X"  # Mark as duplicate
-                    continue
-                    
-                entry["result"] = result
-                await sender.send_filing_result(result, entry["url"])
+                new_results[hash_name] = result
         except Exception as e:
             logger.error(f"❌ Error processing {txt_file.name}: {e}")
 
-    with open(ready_json_path, "w", encoding="utf-8") as f:
-        json.dump(list(hash_entry_map.values()), f, indent=2, ensure_ascii=False)
+    return new_results
+
+async def prescreen_txt_files(txt_files):
+    """
+    Run the local prescreen over txt files. Returns (files still to analyze,
+    {hash: reason} for documents short-circuited to "X", prescreen stats).
+    """
+    from compact_storage import artifact_stem
+    from prescreen import get_prescreen_config, prescreen_files
+
+    settings = get_prescreen_config(load_config())
+    with stage("prescreen"):
+        # The checks run in worker processes; keep the event loop free meanwhile
+        screened, stats = await asyncio.to_thread(prescreen_files, txt_files, settings)
+    remaining = [f for f in txt_files if artifact_stem(f) not in screened]
+    return remaining, screened, stats
+
+def record_analysis(base_folder, new_results: dict, cascade_stats: dict, screened: dict = None):
+    """
+    Append analysis results (and prescreen skips with their reason) to the
+    run's records and save per-tier cascade stats.
+    """
+    hash_entry_map = records.load_candidates(base_folder)
+    updates = [
+        {"hash": hash_name, "result": result}
+        for hash_name, result in new_results.items() if hash_name in hash_entry_map
+    ]
+    skipped = [
+        {"hash": hash_name, "result": "X", "prescreen": reason}
+        for hash_name, reason in (screened or {}).items() if hash_name in hash_entry_map
+    ]
+    records.record_updates(base_folder, updates + skipped)
+    logger.info(f"💾 Recorded {len(updates)} analysis result(s) and {len(skipped)} prescreen skip(s) in {records.RESULTS}")
+
+    if "prescreen" in cascade_stats:
+        from prescreen import log_prescreen
+        log_prescreen(cascade_stats["prescreen"])
+
+    for tier_name, stats in cascade_stats.items():
+        avg = stats["seconds"] / stats["documents"] if stats["documents"] else 0
+        outcomes = "".join(f", {stats[k]} {k}" for k in ("stopped", "escalated", "completed") if stats.get(k))
+        logger.info(f"📈 {tier_name}: {stats['documents']} doc(s){outcomes}, {stats['errors']} error(s), avg {avg:.1f}s")
+    with open(os.path.join(base_folder, "cascade_stats.json"), "w", encoding="utf-8") as f:
+        json.dump(cascade_stats, f, indent=2)
+
+async def send_results(base_folder, resend=False):
+    """
+    Drop duplicates among the run's unsent results and send one Telegram
+    message per distinct opportunity. Sent results are marked so a later
+    `send` only picks up what is new.
+    """
+    from duplicate_checker import group_duplicates
+    from telegram_sender import TelegramSender
+
+    hash_entry_map = records.load_candidates(base_folder)
+    pending = {
+        h: c.result for h, c in hash_entry_map.items()
+        if c.result and c.result.strip() != "X" and not c.duplicate_of and (resend or not c.get("sent_at"))
+    }
+    if not pending:
+        logger.info("ℹ️ No unsent results.")
+        return
+
+    sender = TelegramSender()
+    updates = []
+
+    # Check the whole run for duplicates at once, then send one result per group.
+    # Results already sent from this run count as history.
+    with stage("dedupe"):
+        groups = await group_duplicates(pending, exclude_hashes=set(pending), run_folder=base_folder)
+
+    representatives = []
+    for group in groups:
+        representative = group["representative"]
+        for hash_name in group["hashes"]:
+            if hash_name == representative:
+                continue
+            logger.info(f"🚫 Skipping duplicate: {hash_name}")
+            update = {"hash": hash_name, "result": "X"}  # Mark as duplicate
+            if representative:
+                update["duplicate_of"] = representative
+            updates.append(update)
+        if representative:
+            representatives.append(representative)
+
+    with stage("send"):
+        for representative in representatives:
+            entry = hash_entry_map[representative]
+            try:
+                await sender.send_filing_result(entry.result, entry.url, entry.source_urls)
+                updates.append({"hash": representative, "sent_at": datetime.now().isoformat(timespec="seconds")})
+            except Exception as e:
+                logger.error(f"❌ Error sending {representative}: {e}")
+
+    records.record_updates(base_folder, updates)
+    logger.info(f"📨 Sent {len(representatives)} result(s), {len(updates) - len(representatives)} duplicate(s) marked")
+
+async def report_results(base_folder, new_results: dict, cascade_stats: dict, screened: dict = None):
+    record_analysis(base_folder, new_results, cascade_stats, screened)
+    await send_results(base_folder)
+
+async def analyze_run(base_folder):
+    from ai_api_final import get_cascade_stats, reset_cascade_stats
+    from compact_storage import glob_artifacts
+
+    txt_folder = os.path.join(base_folder, "txt")
+    hash_entry_map = records.load_candidates(base_folder)
+
+    txt_files, screened, prescreen_stats = await prescreen_txt_files(sorted(glob_artifacts(txt_folder, "*.txt")))
+    reset_cascade_stats()
+    with stage("analyze"):
+        new_results = await analyze_txt_files(txt_files, hash_entry_map)
+    record_analysis(base_folder, new_results, {"prescreen": prescreen_stats, **get_cascade_stats()}, screened)
 
-    logger.info(f"💾 Updated ready_candidates.json with analysis results")
+async def analyze_all_txts(base_folder):
+    await analyze_run(base_folder)
+    await send_results(base_folder)
 
 # ------------------- Ready Candidates -------------------
 def save_ready_candidates(combined_results_path, ratings_path, output_path, threshold=5):
-    with open(combined_results_path, "r", encoding="utf-8") as f:
-        combined_results = json.load(f)
-    with open(ratings_path, "r", encoding="utf-8") as f:
-        ratings = json.load(f)
-    ready_candidates = [
-        entry for entry in combined_results
-        if ratings.get(entry.get("hash"), 0) >= threshold
-    ]
-    with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(ready_candidates, f, indent=2, ensure_ascii=False)
-    logger.info(f"✅ Saved {len(ready_candidates)} ready candidates with rating >= {threshold} to {output_path}")
-
-# ------------------- Main Async -------------------
-# ------------------- Main Async -------------------
-async def async_main():
-    config = load_config()
+    ratings = records.load_ratings(ratings_path)
+    ready_candidates = (
+        entry for entry in records.iter_records(combined_results_path)
+        if (ratings.get(entry.get("hash")) or 0) >= threshold
+    )
+    count = records.write_records(output_path, (
+        {**entry, "rating": ratings[entry["hash"]]} for entry in ready_candidates
+    ))
+    logger.info(f"✅ Saved {count} ready candidates with rating >= {threshold} to {output_path}")
+
+# ------------------- Pipeline Stages -------------------
+def get_queries(config):
     queries = config.get("google", {}).get("queries")
     if not queries:
         default_query = config.get("google", {}).get("query", 'site:*.com filetype:pdf investment memo')
         queries = [default_query]
+    return queries
+
+def new_run_hash():
+    random_str = "".join(random.choices(string.ascii_lowercase + string.digits, k=8))
+    return hashlib.md5(random_str.encode()).hexdigest()[:8]
+
+def new_query_folder(run_hash):
+    stamp = datetime.now()
+    while True:
+        # Queries scraped in parallel may start in the same second; bump until unique
+        query_folder = Path("pages") / f"{stamp.strftime('%Y-%m-%dT%H-%M-%S')}-{run_hash}"
+        try:
+            query_folder.mkdir(parents=True)
+            return query_folder
+        except FileExistsError:
+            stamp += timedelta(seconds=1)
+
+async def scrape_query(query, pages_limit, query_folder, raise_errors=False):
+    """
+    Scrape one query. Returns the saved HTML paths and the query's novelty stats.
+    A failed scrape is logged and counts as no pages, unless `raise_errors` is set
+    (worker mode, where the queue retries the task).
+    """
+    from google_scraper import scrape_google_links
+    from seen_urls import NoveltyTracker, get_seen_config
+
+    seen_config = get_seen_config(load_config())
+    novelty = NoveltyTracker(seen_config["seen_path"], seen_config["min_novelty_ratio"])
+
+    logger.info(f"\n🔍 Searching Google for: '{query}' -> saving to {query_folder}")
+    try:
+        html_files = await scrape_google_links(query=query, pages_limit=pages_limit, folder_path=str(query_folder),
+                                               novelty=novelty)
+        if html_files:
+            logger.info(f"✅ Saved {len(html_files)} HTML page(s) to {query_folder}")
+        else:
+            logger.info(f"❌ No pages saved for query: '{query}'")
+    except Exception as e:
+        logger.error(f"❌ Error running query '{query}': {e}")
+        if raise_errors:
+            raise
+        html_files = []
+
+    stats = {"query": query, "saved_pages": len(html_files or []), **novelty.summary()}
+    if stats["pages"]:
+        stopped = ", stopped early" if stats["stopped_early"] else ""
+        logger.info(f"🆕 {stats['new']}/{stats['results']} new result(s) over {stats['pages']} page(s){stopped}")
+    return html_files or [], stats
+
+def combine_query_folders(per_query_folders, combined_folder, run_info):
+    combined_folder = Path(combined_folder)
+    combined_folder.mkdir(parents=True, exist_ok=True)
+    with open(combined_folder / "run_info.json", "w", encoding="utf-8") as f:
+        json.dump(run_info, f, indent=2, ensure_ascii=False)
+    all_html_paths = []
+
+    for folder in per_query_folders:
+        for file_path in Path(folder).glob("*"):
+            if file_path.is_file():
+                unique_name = f"{file_path.stem}_{random.randint(0,9999)}{file_path.suffix}"
+                shutil.copy(file_path, combined_folder / unique_name)
+                all_html_paths.append(combined_folder / unique_name)
+
+    return all_html_paths
+
+def extract_results(combined_folder):
+    from extract_google_results import extract_all_results
+    from seen_urls import get_seen_config, mark_seen
+
+    combined_folder = Path(combined_folder)
+    combined_results_path = combined_folder / records.COMBINED_RESULTS
+    with stage("extract"):
+        extracted = extract_all_results(html_folder=combined_folder, output_file=combined_results_path, output_format='jsonl')
+    logger.info(f"✅ Extracted {len(extracted)} unique results into {combined_results_path}")
+
+    # Later scrapes stop paging once pages only repeat these
+    mark_seen(extracted, get_seen_config(load_config())["seen_path"])
+    return extracted
+
+async def rate_results(combined_folder, extracted=None):
+    from ai_api import get_rating_report, rate_entries_with_gpt
 
+    combined_folder = Path(combined_folder)
+    combined_results_path = combined_folder / records.COMBINED_RESULTS
+    if extracted is None:
+        extracted = [records.Candidate.from_dict(r) for r in records.iter_records(combined_results_path)]
+
+    ratings_file = combined_folder / records.RATINGS
+    ratings_file.unlink(missing_ok=True)
+
+    def save_batch(batch):
+        # Append each batch as it arrives so a crash mid-rating keeps finished batches
+        records.append_records(ratings_file, (
+            {"hash": h, "rating": rating} for h, rating in batch.items()
+        ))
+
+    logger.info("🤖 Sending results to OpenAI for investment relevance rating...")
+    with stage("rate"):
+        await rate_entries_with_gpt(extracted, on_batch=save_batch)
+    logger.info(f"📊 Saved ratings to {ratings_file}")
+
+    report = get_rating_report()
+    with open(combined_folder / "rating_report.json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"📊 Rated {report.get('rated', 0)}/{report.get('entries', 0)} result(s) "
+                f"({report.get('coverage', 1.0):.0%}) in {report.get('calls', 0)} call(s) "
+                f"+ {report.get('retry_calls', 0)} retry call(s)")
+
+    ready_candidates_file = combined_folder / records.READY_CANDIDATES
+    save_ready_candidates(combined_results_path, ratings_file, ready_candidates_file)
+    return ready_candidates_file
+
+async def extract_and_rate(combined_folder):
+    extracted = extract_results(combined_folder)
+    return await rate_results(combined_folder, extracted)
+
+def download_subfolder(download_type):
+    return "pdf" if download_type == "pdf" else "downloads"
+
+async def download_candidates(combined_folder, download_type, hashes=None, prefetch=True, **kwargs):
+    from content_dedupe import dedupe_downloaded_files
+
+    ready_candidates_file = Path(combined_folder) / records.READY_CANDIDATES
+    with stage("download"):
+        if download_type == "pdf":
+            from pdf_work import download_pdfs_from_ready_candidates
+            await download_pdfs_from_ready_candidates(str(ready_candidates_file), hashes=hashes, prefetch=prefetch, **kwargs)
+        else:  # any page
+            from file_work import download_files_from_ready_candidates
+            await download_files_from_ready_candidates(str(ready_candidates_file), hashes=hashes, prefetch=prefetch, **kwargs)
+
+    if hashes is None:
+        # Workers download shards; the coordinator dedupes once all shards are in
+        with stage("content_dedupe"):
+            dedupe_downloaded_files(combined_folder, download_subfolder(download_type))
+
+async def download_deferred(combined_folder, download_type):
+    """Download the files the prefetch deferred for their size, with a longer timeout."""
+    from compact_storage import artifact_stem
+    from content_dedupe import dedupe_downloaded_files
+    from prefetch import deferred_hashes, get_prefetch_config
+
+    download_folder = Path(combined_folder) / download_subfolder(download_type)
+    present = {artifact_stem(p) for p in download_folder.iterdir()} if download_folder.exists() else set()
+    hashes = [h for h in deferred_hashes(combined_folder) if h not in present]
+    if not hashes:
+        logger.info("ℹ️ No deferred downloads left in this run")
+        return
+
+    logger.info(f"📦 Downloading {len(hashes)} deferred file(s)")
+    await download_candidates(combined_folder, download_type, hashes=hashes, prefetch=False,
+                              timeout_secs=get_prefetch_config()["deferred_timeout"])
+    with stage("content_dedupe"):
+        dedupe_downloaded_files(combined_folder, download_subfolder(download_type))
+
+def convert_downloads(combined_folder, download_type, files=None):
+    with stage("convert"):
+        if download_type == "pdf":
+            from pdf_work import convert_pdfs_to_text
+            convert_pdfs_to_text(combined_folder, files=files)
+        else:  # any page
+            from file_work import convert_files_to_text
+            convert_files_to_text(combined_folder, files=files)
+
+def index_into_archive(config, combined_folder):
+    from archive_index import index_run
+
+    try:
+        index_run(combined_folder, db_path=config.get("archive", {}).get("db_path", "archive.db"))
+    except Exception as e:
+        logger.error(f"❌ Error indexing run into archive: {e}")
+
+async def scrape_new_run(config):
+    """Scrape all queries into a new run folder. Returns the folder, or None if nothing was saved."""
+    queries = get_queries(config)
     download_type = config.get("download_type", "pdf")  # 'pdf' or 'page'
 
     # Generate a single hash for this run
-    import hashlib
-    import random
-    import string
-
-    random_str = "".join(random.choices(string.ascii_lowercase + string.digits, k=8))
-    run_hash = hashlib.md5(random_str.encode()).hexdigest()[:8]
+    run_hash = new_run_hash()
+    started_at = datetime.now().isoformat(timespec="seconds")
 
     logger.info(f"🔍 Running Google search for queries: {queries} with download_type='{download_type}' and hash={run_hash}")
 
     pages_limit = config.get("google", {}).get("pages_limit", 1)
     per_query_folders = []
+    scrape_stats = []
 
     # ------------------- Process Each Query -------------------
-    for query in queries:
-        timestamp = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
-        query_folder = Path("pages") / f"{timestamp}-{run_hash}"
-        query_folder.mkdir(parents=True, exist_ok=True)
-        per_query_folders.append(query_folder)
-
-        logger.info(f"\n🔍 Searching Google for: '{query}' -> saving to {query_folder}")
-        try:
-            html_files = await scrape_google_links(query=query, pages_limit=pages_limit, folder_path=str(query_folder))
-            if html_files:
-                logger.info(f"✅ Saved {len(html_files)} HTML page(s) to {query_folder}")
-            else:
-                logger.info(f"❌ No pages saved for query: '{query}'")
-        except Exception as e:
-            logger.error(f"❌ Error running query '{query}': {e}")
+    with stage("scrape"):
+        for query in queries:
+            query_folder = new_query_folder(run_hash)
+            per_query_folders.append(query_folder)
+            _, stats = await scrape_query(query, pages_limit, query_folder)
+            scrape_stats.append(stats)
 
     # ------------------- Combine All Queries Into Single Run Folder -------------------
     combined_folder = Path("pages") / run_hash
-    combined_folder.mkdir(parents=True, exist_ok=True)
-    all_html_paths = []
-
-    for folder in per_query_folders:
-        for file_path in folder.glob("*"):
-            if file_path.is_file():
-                unique_name = f"{file_path.stem}_{random.randint(0,9999)}{file_path.suffix}"
-                shutil.copy(file_path, combined_folder / unique_name)
-                all_html_paths.append(combined_folder / unique_name)
+    run_info = {
+        "run_hash": run_hash,
+        "started_at": started_at,
+        "queries": queries,
+        "download_type": download_type,
+        "scrape": scrape_stats,
+    }
+    all_html_paths = combine_query_folders(per_query_folders, combined_folder, run_info)
 
     if not all_html_paths:
         logger.info("ℹ️ No new HTML files generated.")
-        return
+        return None
 
     logger.info(f"🆕 Combined {len(all_html_paths)} HTML file(s) into {combined_folder}")
+    return combined_folder
+
+def get_run_download_type(config, run_folder):
+    info_path = Path(run_folder) / "run_info.json"
+    if info_path.exists():
+        with open(info_path, "r", encoding="utf-8") as f:
+            download_type = json.load(f).get("download_type")
+        if download_type:
+            return download_type
+    return config.get("download_type", "pdf")
+
+def resolve_run_folder(run):
+    """Accept a run hash or a path to a run folder."""
+    folder = Path(run)
+    if not folder.is_dir():
+        folder = Path("pages") / run
+    if not folder.is_dir():
+        raise SystemExit(f"Run folder not found: {run}")
+    return folder
+
+def report_openai_usage(run_folder):
+    """Log and save per-priority queue waits and rate-limit retries for the OpenAI calls made."""
+    governor = sys.modules.get("rate_governor")
+    if governor is None:
+        return  # This process made no OpenAI calls
+    governor.log_stats()
+    with open(Path(run_folder) / "openai_stats.json", "w", encoding="utf-8") as f:
+        json.dump(governor.get_stats(), f, indent=2)
 
-    # ------------------- Extraction and Processing -------------------
-    combined_json_path = combined_folder / "combined_results.json"
-    extracted = extract_all_results(html_folder=combined_folder, output_file=combined_json_path, output_format='json')
-    logger.info(f"✅ Extracted {len(extracted)} unique results into {combined_json_path}")
+# ------------------- Main Async -------------------
+async def async_main():
+    profiler = get_active_profiler()
+    if profiler:
+        profiler.start_loop_monitor()
 
-    logger.info("🤖 Sending results to OpenAI for investment relevance rating...")
-    ratings = await rate_entries_with_gpt(extracted)
+    config = load_config()
+    download_type = config.get("download_type", "pdf")  # 'pdf' or 'page'
 
-    ratings_file = combined_folder / "ratings.json"
-    with open(ratings_file, "w", encoding="utf-8") as f:
-        json.dump(ratings, f, indent=2, ensure_ascii=False)
-    logger.info(f"📊 Saved ratings to {ratings_file}")
+    combined_folder = await scrape_new_run(config)
+    if combined_folder is None:
+        return
 
-    ready_candidates_file = combined_folder / "ready_candidates.json"
-    save_ready_candidates(combined_json_path, ratings_file, ready_candidates_file)
+    # ------------------- Extraction and Processing -------------------
+    await extract_and_rate(combined_folder)
 
     # Download and convert depending on type
-    if download_type == "pdf":
-        await download_pdfs_from_ready_candidates(str(ready_candidates_file))
-        convert_pdfs_to_text(combined_folder)
-    else:  # any page
-        await download_files_from_ready_candidates(str(ready_candidates_file))
-        convert_files_to_text(combined_folder)
+    await download_candidates(combined_folder, download_type)
+    convert_downloads(combined_folder, download_type)
 
     await analyze_all_txts(combined_folder)
+    index_into_archive(config, combined_folder)
+    report_openai_usage(combined_folder)
+
+async def run_stage(command, args):
+    profiler = get_active_profiler()
+    if profiler:
+        profiler.start_loop_monitor()
+
+    config = load_config()
+
+    if command == "scrape":
+        combined_folder = await scrape_new_run(config)
+        if combined_folder is not None:
+            print(combined_folder.name)
+        return
+
+    run_folder = resolve_run_folder(args.run)
+    download_type = get_run_download_type(config, run_folder)
+
+    if command == "extract":
+        extract_results(run_folder)
+    elif command == "rate":
+        await rate_results(run_folder)
+    elif command == "download":
+        if args.deferred:
+            await download_deferred(run_folder, download_type)
+        else:
+            await download_candidates(run_folder, download_type)
+    elif command == "convert":
+        convert_downloads(run_folder, download_type)
+    elif command == "analyze":
+        await analyze_run(run_folder)
+        index_into_archive(config, run_folder)
+    elif command == "send":
+        await send_results(run_folder, resend=args.resend)
+        index_into_archive(config, run_folder)
+    report_openai_usage(run_folder)
 
 # ------------------- Entry Point -------------------
-def main():
-    asyncio.run(async_main())
+STAGE_HELP = {
+    "scrape": "Scrape Google into a new run folder and print its hash",
+    "extract": "Extract search results from the run's saved HTML",
+    "rate": "Rate extracted results and select ready candidates",
+    "download": "Download ready candidates and collapse identical files",
+    "convert": "Convert downloaded files to text",
+    "analyze": "Analyze converted text and record results (no sending)",
+    "send": "Drop duplicates and send unsent results to Telegram",
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the full Atlantis Bot pipeline, or a single stage on an existing run folder")
+    parser.add_argument("--profile", nargs="?", const="profiles", default=None, metavar="DIR",
+                        help="Profile each stage and write results under DIR/<timestamp> (default: profiles)")
+    parser.add_argument("--profile-memory", action="store_true", help="With --profile, also trace memory per stage")
+    parser.add_argument("--profile-loop", action="store_true", help="With --profile, also sample event-loop lag")
+
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("run", help="Run the full pipeline (default)")
+    for name, help_text in STAGE_HELP.items():
+        p = sub.add_parser(name, help=help_text)
+        if name != "scrape":
+            p.add_argument("run", help="Run hash (pages/<hash>) or path to a run folder")
+        if name == "download":
+            p.add_argument("--deferred", action="store_true",
+                           help="Download only the files the prefetch deferred for size (then run convert and analyze)")
+        if name == "send":
+            p.add_argument("--resend", action="store_true", help="Also resend results that were already sent")
+    args = parser.parse_args(argv)
+
+    if args.command in (None, "run"):
+        coro_factory = async_main
+    else:
+        coro_factory = lambda: run_stage(args.command, args)
+
+    if not args.profile:
+        asyncio.run(coro_factory())
+        return
+
+    output_dir = Path(args.profile) / datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
+    profiler = PipelineProfiler(output_dir, memory=args.profile_memory, loop_lag=args.profile_loop)
+    profiler.start()
+    try:
+        asyncio.run(coro_factory())
+    finally:
+        profiler.stop()
 
 if __name__ == "__main__":
     main()
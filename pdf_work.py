@@ -1,5 +1,4 @@
 import os
-import json
 import logging
 import aiohttp
 import asyncio
@@ -8,6 +7,10 @@ import traceback
 import random
 from pathlib import Path
 from pdfminer.high_level import extract_text
+from compact_storage import write_artifact
+from download_scheduler import HostScheduler
+from prefetch import get_prefetch_config, prefetch_candidates
+from records import iter_candidates
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -18,7 +21,6 @@ USER_AGENTS = [
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.5735.198 Safari/537.36",
 ]
 
-SEMAPHORE_LIMIT = 5
 RETRY_ATTEMPTS = 3
 TIMEOUT_SECS = 20
 
@@ -39,8 +41,7 @@ async def download_pdf(session, url, save_path, timeout_secs=TIMEOUT_SECS):
             async with session.get(url, headers=headers, allow_redirects=True, ssl=False) as resp:
                 if resp.status == 200 and "application/pdf" in resp.content_type:
                     content = await resp.read()
-                    with open(save_path, "wb") as f:
-                        f.write(content)
+                    write_artifact(save_path, content)
                     logger.info(f"✅ Downloaded PDF: {save_path}")
                 else:
                     logger.error(f"❌ Failed to download {url}, HTTP {resp.status}, Content-Type: {resp.content_type}")
@@ -59,40 +60,64 @@ async def download_pdf(session, url, save_path, timeout_secs=TIMEOUT_SECS):
         raise
 
 
-async def download_with_retries(url, save_path, session, semaphore):
-    async with semaphore:
-        for attempt in range(RETRY_ATTEMPTS):
-            try:
-                await asyncio.sleep(random.uniform(1, 3))  # random delay between attempts
-                await download_pdf(session, url, save_path)
-                return
-            except Exception:
-                logger.warning(f"🔁 Retry {attempt + 1} for {url}")
-        logger.error(f"❌ All retries failed for {url}")
-
-
-async def download_pdfs_from_ready_candidates(ready_candidates_path, base_pages_folder="pages"):
-    with open(ready_candidates_path, "r", encoding="utf-8") as f:
-        candidates = json.load(f)
-
-    pdf_candidates = [c for c in candidates if c.get("url", "").strip().lower().endswith(".pdf")]
+async def download_with_retries(url, save_path, session, scheduler, timeout_secs=TIMEOUT_SECS):
+    error = None
+    for attempt in range(RETRY_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(random.uniform(1, 3))  # random delay between attempts
+        try:
+            async with scheduler.slot(url):
+                await download_pdf(session, url, save_path, timeout_secs=timeout_secs)
+            scheduler.record_outcome(url)
+            return
+        except Exception as e:
+            error = e
+            if not scheduler.should_retry(e):
+                break
+            logger.warning(f"🔁 Retry {attempt + 1} for {url}")
+    # One outcome per URL, so a few dead links don't get their whole host skipped
+    scheduler.record_outcome(url, error)
+    logger.error(f"❌ All retries failed for {url}")
+
+
+async def download_pdfs_from_ready_candidates(ready_candidates_path, base_pages_folder="pages", hashes=None,
+                                             prefetch=True, timeout_secs=TIMEOUT_SECS):
+    candidates = list(iter_candidates(os.path.dirname(ready_candidates_path)))
+
+    if hashes is not None:
+        # Only these hashes, in the given order (a worker shard, or deferred files)
+        by_hash = {c.hash: c for c in candidates}
+        candidates = [by_hash[h] for h in hashes if h in by_hash]
+
+    prefetch_settings = get_prefetch_config()
+    if prefetch_settings["enabled"]:
+        # Content types from the prefetch also find PDFs behind URLs without a .pdf suffix
+        pdf_candidates = [c for c in candidates if c.get("url", "").strip()]
+    else:
+        pdf_candidates = [c for c in candidates if c.get("url", "").strip().lower().endswith(".pdf")]
     if not pdf_candidates:
-        logger.info("ℹ️ No PDF URLs found in ready_candidates.json")
+        logger.info("ℹ️ No PDF URLs found in ready candidates")
         return
 
     latest_folder = os.path.dirname(ready_candidates_path)
     pdf_folder = os.path.join(latest_folder, "pdf")
     os.makedirs(pdf_folder, exist_ok=True)
 
-    semaphore = asyncio.Semaphore(SEMAPHORE_LIMIT)
+    scheduler = HostScheduler.from_config()
 
     async with aiohttp.ClientSession() as session:
+        if prefetch:
+            # Host order first (drops skipped hosts), then the prefetch screens and sorts smallest-first
+            pdf_candidates = await prefetch_candidates(
+                scheduler.order(pdf_candidates), latest_folder, session, pdf_only=True, settings=prefetch_settings
+            )
+        # Otherwise the hashes were already prefetched (coordinator) or deferred by a prefetch
         tasks = []
         for entry in pdf_candidates:
             url = entry["url"]
             filename = f"{entry['hash']}.pdf"
             save_path = os.path.join(pdf_folder, filename)
-            tasks.append(download_with_retries(url, save_path, session, semaphore))
+            tasks.append(download_with_retries(url, save_path, session, scheduler, timeout_secs=timeout_secs))
 
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
@@ -100,15 +125,20 @@ async def download_pdfs_from_ready_candidates(ready_candidates_path, base_pages_
             if isinstance(result, Exception):
                 logger.warning(f"⚠️ Download task {i} raised an exception: {repr(result)}")
 
+    scheduler.save_stats()
+
     logger.info(f"📥 Attempted to download {len(pdf_candidates)} PDFs into {pdf_folder}")
 
 
-def convert_pdfs_to_text(base_folder):
+def convert_pdfs_to_text(base_folder, files=None):
     pdf_folder = os.path.join(base_folder, "pdf")
     txt_folder = os.path.join(base_folder, "txt")
     os.makedirs(txt_folder, exist_ok=True)
 
-    pdf_files = list(Path(pdf_folder).glob("*.pdf"))
+    if files is not None:
+        pdf_files = [Path(pdf_folder) / name for name in files]
+    else:
+        pdf_files = list(Path(pdf_folder).glob("*.pdf"))
     if not pdf_files:
         logger.info("ℹ️ No PDFs found to convert.")
         return
@@ -117,8 +147,7 @@ def convert_pdfs_to_text(base_folder):
         try:
             text = extract_text(str(pdf_file))
             txt_path = os.path.join(txt_folder, f"{pdf_file.stem}.txt")
-            with open(txt_path, "w", encoding="utf-8") as f:
-                f.write(text)
+            write_artifact(txt_path, text)
             logger.info(f"📝 Converted {pdf_file.name} to text.")
         except Exception as e:
             logger.error(f"❌ Error converting {pdf_file.name} to text: {repr(e)}\n{traceback.format_exc()}")
@@ -0,0 +1,231 @@
+import re
+import time
+import asyncio
+import logging
+from pathlib import Path
+from typing import List, Optional
+
+import aiohttp
+import async_timeout
+import yaml
+
+from download_scheduler import HostScheduler, get_host
+from records import append_records, iter_candidates, iter_records, record_updates
+from url_utils import url_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PREFETCH_CONFIG = {
+    "enabled": True,
+    "concurrency": 32,  # Probes in flight across all hosts
+    "per_host_concurrency": 4,
+    "per_host_interval": 0.2,  # Seconds between probe starts on one host
+    "timeout": 10,
+    "max_bytes": 50_000_000,  # Larger files are deferred: only downloaded by `main.py download <run> --deferred`; 0 = no limit
+    "deferred_timeout": 600,  # Seconds per file for deferred downloads
+}
+
+PREFETCH_LOG = "prefetch.jsonl"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
+
+HEAD_FALLBACK_STATUSES = {400, 403, 405, 501}  # Servers that refuse HEAD but answer GET
+GONE_STATUSES = {404, 410}
+PDF_TYPES = {"application/pdf", "application/x-pdf"}
+PAGE_TYPES = PDF_TYPES | {"text/html", "application/xhtml+xml", "text/plain", "text/xml", "application/xml"}
+UNLABELLED_TYPES = {"", "application/octet-stream", "binary/octet-stream", "application/download", "application/force-download"}
+LOGIN_RE = re.compile(r"/(?:log-?in|sign-?in|signon|sso|auth|session/new)(?:[/?.]|$)", re.I)
+CONTENT_RANGE_RE = re.compile(r"bytes\s+\d+-\d+/(\d+)", re.I)
+
+def load_config(path="config.yaml"):
+    with open(path, "r") as f:
+        return yaml.safe_load(f)
+
+def get_prefetch_config(config: Optional[dict] = None) -> dict:
+    if config is None:
+        try:
+            config = load_config()
+        except FileNotFoundError:
+            config = {}
+    prefetch = ((config or {}).get("downloads") or {}).get("prefetch") or {}
+    return {**DEFAULT_PREFETCH_CONFIG, **prefetch}
+
+# ------------------- Probing -------------------
+def _content_length(status: int, headers) -> Optional[int]:
+    if status == 206:
+        match = CONTENT_RANGE_RE.search(headers.get("Content-Range", ""))
+        return int(match.group(1)) if match else None
+    try:
+        return int(headers.get("Content-Length"))
+    except (TypeError, ValueError):
+        return None
+
+async def _request(session, method: str, url: str, headers: dict, timeout: float):
+    async with async_timeout.timeout(timeout):
+        # The body is never read; leaving the block drops the connection after the headers
+        async with session.request(method, url, headers=headers, allow_redirects=True, ssl=False) as resp:
+            return resp.status, str(resp.url), resp.headers
+
+async def fetch_metadata(session, url: str, timeout: float = DEFAULT_PREFETCH_CONFIG["timeout"]) -> dict:
+    """
+    Status, final URL, content type, length and ETag of `url` without
+    transferring the body: a HEAD request, or a 1-byte Range GET when the
+    server refuses HEAD or leaves out the length.
+    """
+    headers = {"User-Agent": USER_AGENT, "Accept": "*/*", "Accept-Language": "en-US,en;q=0.9"}
+    method = "HEAD"
+    status, final_url, resp_headers = await _request(session, method, url, headers, timeout)
+    if status in HEAD_FALLBACK_STATUSES or (status == 200 and "Content-Length" not in resp_headers):
+        method = "GET"
+        status, final_url, resp_headers = await _request(session, method, url, {**headers, "Range": "bytes=0-0"}, timeout)
+
+    return {
+        "method": method,
+        "status": status,
+        "final_url": final_url,
+        "content_type": resp_headers.get("Content-Type", "").split(";")[0].strip().lower(),
+        "length": _content_length(status, resp_headers),
+        "etag": resp_headers.get("ETag"),
+    }
+
+# ------------------- Decisions -------------------
+def classify(url: str, meta: dict, pdf_only: bool, max_bytes: int) -> tuple:
+    """Return ("download" | "drop" | "defer", reason) for one probed candidate."""
+    if "error" in meta:
+        # No metadata: behave as before prefetch existed
+        if pdf_only and not url.strip().lower().endswith(".pdf"):
+            return "drop", "no metadata and not a .pdf URL"
+        return "download", "no metadata"
+
+    status = meta["status"]
+    if status in GONE_STATUSES:
+        return "drop", f"HTTP {status}"
+    if status >= 400:
+        return "download", f"HTTP {status} on probe"  # The download's own retries decide
+
+    content_type = meta["content_type"]
+    final_url = meta["final_url"]
+    if LOGIN_RE.search(final_url) and not LOGIN_RE.search(url):
+        return "drop", f"redirects to login ({get_host(final_url)})"
+    if pdf_only:
+        if content_type not in PDF_TYPES:
+            return "drop", f"not a PDF ({content_type or 'no content type'})"
+    elif content_type not in PAGE_TYPES and content_type not in UNLABELLED_TYPES:
+        return "drop", f"not a document ({content_type})"
+
+    length = meta["length"]
+    if max_bytes and length and length > max_bytes:
+        return "defer", f"{length / 1e6:.0f} MB"
+    return "download", ""
+
+def _dedupe_keys(meta: dict) -> list:
+    if "error" in meta or meta["status"] >= 400:
+        return []
+    keys = [("url", url_key(meta["final_url"]))]
+    if meta["etag"]:
+        # ETags are only unique per server; the length guards against weak, reused tags
+        keys.append(("etag", get_host(meta["final_url"]), meta["etag"], meta["length"]))
+    return keys
+
+# ------------------- Stage -------------------
+async def prefetch_candidates(candidates: List, run_folder, session, pdf_only: bool = False,
+                              settings: Optional[dict] = None) -> List:
+    """
+    Probe every candidate's metadata concurrently and return the ones worth
+    downloading, smallest first (unknown sizes last, in the given order).
+
+    Non-documents, dead links and login redirects are dropped, files over
+    max_bytes are deferred, and candidates whose final URL or ETag matches an
+    earlier one get `duplicate_of` (the kept entry collects their source
+    URLs, as content_dedupe does). Every decision is appended to prefetch.jsonl.
+    """
+    settings = settings or get_prefetch_config()
+    if not settings["enabled"] or not candidates:
+        return candidates
+
+    # Own limits and no host history: a probe is not a download
+    scheduler = HostScheduler(
+        concurrency=settings["concurrency"],
+        per_host_concurrency=settings["per_host_concurrency"],
+        per_host_interval=settings["per_host_interval"],
+        host_stats_path=None,
+    )
+
+    async def probe(entry):
+        try:
+            async with scheduler.slot(entry.url):
+                return await fetch_metadata(session, entry.url, settings["timeout"])
+        except Exception as e:
+            return {"error": repr(e)}
+
+    started = time.monotonic()
+    metas = await asyncio.gather(*(probe(entry) for entry in candidates))
+
+    keepers = {}
+    selected, log_records, updates, absorbed = [], [], [], []
+    counts = {"download": 0, "drop": 0, "defer": 0, "duplicate": 0}
+    for entry, meta in zip(candidates, metas):
+        decision, reason = classify(entry.url, meta, pdf_only, settings["max_bytes"])
+
+        if decision == "download":
+            keys = _dedupe_keys(meta)
+            matched = next((key for key in keys if key in keepers), None)
+            if matched is not None:
+                keeper = keepers[matched]
+                decision, reason = "duplicate", f"same {'ETag' if matched[0] == 'etag' else 'final URL'} as {keeper.hash}"
+                updates.append({"hash": entry.hash, "duplicate_of": keeper.hash})
+                if keeper.source_urls is None:
+                    keeper.source_urls = [keeper.url]
+                for url in [entry.url] + list(entry.source_urls or []):
+                    if url not in keeper.source_urls:
+                        keeper.source_urls.append(url)
+                if keeper not in absorbed:
+                    absorbed.append(keeper)
+            else:
+                for key in keys:
+                    keepers[key] = entry
+                selected.append((entry, meta))
+
+        counts[decision] += 1
+        log_records.append({"hash": entry.hash, "url": entry.url, **meta, "decision": decision, "reason": reason})
+        if decision in ("drop", "defer"):
+            logger.info(f"⏭️ Prefetch {decision}: {entry.url} ({reason})")
+
+    # Keepers that absorbed duplicates record every URL the document was found at
+    updates.extend({"hash": entry.hash, "source_urls": entry.source_urls} for entry in absorbed)
+    if updates:
+        record_updates(run_folder, updates)
+    append_records(Path(run_folder) / PREFETCH_LOG, log_records)
+
+    selected.sort(key=lambda item: item[1].get("length") or float("inf"))
+    logger.info(
+        f"🛰️ Prefetched {len(candidates)} candidate(s) in {time.monotonic() - started:.1f}s: "
+        f"{counts['download']} to download, {counts['drop']} dropped, {counts['defer']} deferred, "
+        f"{counts['duplicate']} duplicate(s)"
+    )
+    return [entry for entry, _ in selected]
+
+async def prefetch_run(run_folder, pdf_only: bool = False, settings: Optional[dict] = None) -> Optional[List[str]]:
+    """
+    Prefetch every candidate of a run in one pass and return the hashes worth
+    downloading, in download order (None when the prefetch is disabled). The
+    coordinator runs this before sharding, so dedupe and smallest-first
+    ordering span the whole run and no large transfer starts before all are probed.
+    """
+    settings = settings or get_prefetch_config()
+    if not settings["enabled"]:
+        return None
+
+    candidates = [c for c in iter_candidates(run_folder) if c.get("url", "").strip()]
+    scheduler = HostScheduler.from_config()
+    async with aiohttp.ClientSession() as session:
+        selected = await prefetch_candidates(scheduler.order(candidates), run_folder, session,
+                                             pdf_only=pdf_only, settings=settings)
+    return [entry.hash for entry in selected]
+
+def deferred_hashes(run_folder) -> List[str]:
+    """Hashes whose latest prefetch decision was "defer", in the order they were probed."""
+    decisions = {}
+    for record in iter_records(Path(run_folder) / PREFETCH_LOG):
+        decisions.pop(record["hash"], None)  # Keep the order of the latest decision
+        decisions[record["hash"]] = record["decision"]
+    return [h for h, decision in decisions.items() if decision == "defer"]
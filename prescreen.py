@@ -0,0 +1,152 @@
+import os
+import re
+import time
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from compact_storage import artifact_stem, read_artifact_text
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# A document failing any check is recorded as "X" without an OpenAI call
+DEFAULT_PRESCREEN = {
+    "enabled": True,
+    "min_chars": 300,  # Less than this is an empty or image-only extraction
+    "min_letter_ratio": 0.4,  # Letters among non-space characters; OCR junk and (cid:NN) runs score low
+    "min_english_ratio": 0.08,  # Share of English stopwords among words; English prose is ~0.3-0.5
+    "require_money": True,  # At least one monetary amount ($5M, EUR 2.5 million, ₹250 crore, Rs. 50 lakh)
+    "min_keyword_hits": 2,  # Funding phrases (raising capital, Series A round, convertible note, ...)
+    "workers": 4,
+}
+REASONS = ("empty", "garbled", "not_english", "no_money", "no_funding_terms")
+
+SCAN_CHARS = 500_000  # Long documents are judged on their opening
+LANGUAGE_SAMPLE_CHARS = 20_000
+MIN_WORDS_FOR_LANGUAGE = 50
+MIN_FILES_FOR_PROCESSES = 50  # Below this, starting worker processes costs more than it saves
+
+CURRENCY_SYMBOLS = "$€£¥₹₩₦₱₺₽"
+CURRENCY_CODES = r"usd|us\$|eur|gbp|chf|cad|aud|nzd|sgd|hkd|jpy|cny|rmb|inr|rs\.?|aed|sar|zar|brl|sek|nok|dkk"
+AMOUNT_WORDS = r"k|m|mm|mn|bn|b|tn|thousand|million|billion|trillion|mln|bln|crores?|cr|lakhs?|lacs?"
+MONEY_RE = re.compile(
+    rf"(?:[{CURRENCY_SYMBOLS}]|\b(?:{CURRENCY_CODES})\s?)\s?\d[\d,.]*"
+    rf"|\b\d[\d,.]*\s?(?:{AMOUNT_WORDS})?\s?(?:{CURRENCY_CODES}|dollars|euros|pounds|rupees)\b"
+    r"|\b\d[\d,.]*\s?(?:million|billion|mln|bln|crores?|lakhs?)\b",
+    re.I,
+)
+# Phrases, not single words: "round", "capital" or "revenue" alone appear in any annual report
+FUNDING_RE = re.compile(
+    r"\b(?:(?:rais|seek|secur)(?:e|es|ed|ing|s)?\s+(?:(?:a|an|the|its|new|additional|further|growth)\s+)*"
+    rf"(?:capital|funds|funding|financing|investments?|equity|debt|[{CURRENCY_SYMBOLS}]|(?:{CURRENCY_CODES})\s?\d|\d)"
+    r"|(?:funding|investment|financing|seed|bridge|angel|growth|pre-ipo|series [a-f])\s+rounds?"
+    r"|series [a-f] (?:financing|funding|investment|preferred)"
+    r"|convertible (?:notes?|loans?|bonds?|debentures?)|private placements?|term sheets?|pre-ipo"
+    r"|(?:pre|post)-money valuation|(?:equity|debt|mezzanine|project|growth) (?:financing|funding|capital)"
+    r"|capital rais(?:e|es|ing)|fundrais(?:e|es|ing)|investment opportunit(?:y|ies)|uses? of (?:funds|proceeds)"
+    r"|private equity|venture capital|mergers? (?:and|&) acquisitions?|m&a"
+    r"|(?:strategic|minority|majority|equity) (?:investors?|stakes?|partners?))",
+    re.I,
+)
+WORD_RE = re.compile(r"[^\W\d_]+")
+ENGLISH_STOPWORDS = frozenset("""
+a about after all also an and any are as at be been but by can could for from had has have he her his if in into
+is it its more not of on or our out over she so than that the their there these they this to was we were which
+who will with would you your
+""".split())
+
+def get_prescreen_config(config: dict) -> dict:
+    prescreen = (config.get("analysis", {}) or {}).get("prescreen", {}) or {}
+    return {**DEFAULT_PRESCREEN, **prescreen}
+
+# ------------------- Checks -------------------
+def screen_text(text: str, settings: dict = DEFAULT_PRESCREEN) -> Optional[Tuple[str, str]]:
+    """Return (reason, detail) when the text clearly can't hold an opportunity, else None."""
+    text = text[:SCAN_CHARS]
+    chars = len(text.strip())
+    if chars < settings["min_chars"]:
+        return "empty", f"{chars} characters of text"
+
+    non_space = sum(1 for c in text if not c.isspace())
+    letters = sum(1 for c in text if c.isalpha())
+    letter_ratio = letters / non_space if non_space else 0
+    if letter_ratio < settings["min_letter_ratio"]:
+        return "garbled", f"{letter_ratio:.0%} letters"
+
+    words = WORD_RE.findall(text[:LANGUAGE_SAMPLE_CHARS].lower())
+    if settings["min_english_ratio"] and len(words) >= MIN_WORDS_FOR_LANGUAGE:
+        english = sum(1 for w in words if w in ENGLISH_STOPWORDS) / len(words)
+        if english < settings["min_english_ratio"]:
+            return "not_english", f"{english:.0%} English stopwords"
+
+    if settings["require_money"] and not MONEY_RE.search(text):
+        return "no_money", "no monetary amounts"
+
+    if settings["min_keyword_hits"]:
+        hits = 0
+        for _ in FUNDING_RE.finditer(text):
+            hits += 1
+            if hits >= settings["min_keyword_hits"]:
+                break
+        else:
+            return "no_funding_terms", f"{hits} funding term(s)"
+    return None
+
+def screen_file(path: str, settings: dict = DEFAULT_PRESCREEN) -> Optional[Tuple[str, str]]:
+    try:
+        text = read_artifact_text(path)  # txt/ may have been compressed by compaction
+    except Exception as e:
+        logger.warning(f"⚠️ Could not read {path} for prescreen: {e}")
+        return None  # Let the full analysis deal with it
+    return screen_text(text, settings)
+
+def _screen_batch(paths: List[str], settings: dict) -> List[Optional[Tuple[str, str]]]:
+    return [screen_file(path, settings) for path in paths]
+
+# ------------------- Stage -------------------
+def prescreen_files(txt_files, settings: dict = DEFAULT_PRESCREEN) -> Tuple[Dict[str, str], dict]:
+    """
+    Screen txt files in parallel. Returns ({hash: reason} for documents to mark
+    "X", stats shaped like a cascade tier plus a count per reason).
+    """
+    paths = [str(p) for p in txt_files]
+    stats = {"documents": len(paths), "stopped": 0, "escalated": 0, "errors": 0, "seconds": 0.0,
+             **{reason: 0 for reason in REASONS}}
+    if not paths or not settings["enabled"]:
+        stats["escalated"] = len(paths)
+        return {}, stats
+
+    started = time.perf_counter()
+    workers = max(1, min(settings["workers"] or 1, os.cpu_count() or 1, len(paths)))
+    if workers == 1 or len(paths) < MIN_FILES_FOR_PROCESSES:
+        verdicts = _screen_batch(paths, settings)
+    else:
+        # Batches keep per-task pickling small; spawn avoids forking a process that runs threads
+        size = max(1, len(paths) // (workers * 4))
+        batches = [paths[i:i + size] for i in range(0, len(paths), size)]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            verdicts = [v for batch in pool.map(_screen_batch, batches, [settings] * len(batches)) for v in batch]
+
+    screened = {}
+    for path, verdict in zip(paths, verdicts):
+        if verdict is None:
+            continue
+        reason, detail = verdict
+        screened[artifact_stem(path)] = f"{reason}: {detail}"
+        stats[reason] += 1
+
+    stats["stopped"] = len(screened)
+    stats["escalated"] = len(paths) - len(screened)
+    stats["seconds"] = time.perf_counter() - started
+    return screened, stats
+
+def log_prescreen(stats: dict):
+    """Skip rate and reasons for a run (stats merged across workers)."""
+    if not stats.get("documents"):
+        return
+    reasons = ", ".join(f"{reason} {stats[reason]}" for reason in REASONS if stats.get(reason))
+    logger.info(f"🧹 Prescreen skipped {stats['stopped']}/{stats['documents']} document(s) "
+                f"({stats['stopped'] / stats['documents']:.0%}){f' — {reasons}' if reasons else ''} "
+                f"in {stats['seconds']:.1f}s")
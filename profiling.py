@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import cProfile
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL = 0.005  # Seconds between stack samples for the flame graph
+LOOP_LAG_INTERVAL = 0.05  # Seconds between event-loop lag probes
+LOOP_LAG_WARN = 0.1  # Lag above this is counted as a blocking call
+TOP_ALLOCATIONS = 10
+
+_active: Optional["PipelineProfiler"] = None
+
+def stage(name: str):
+    """Profile a pipeline stage if profiling is on; a no-op otherwise."""
+    return _active.stage(name) if _active else nullcontext()
+
+def get_active():
+    return _active
+
+class _StackSampler(threading.Thread):
+    """Samples the main thread's stack into folded lines (flamegraph.pl / speedscope format)."""
+
+    def __init__(self, profiler: "PipelineProfiler", interval: float):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.profiler = profiler
+        self.interval = interval
+        self.target_id = threading.main_thread().ident
+        self.samples = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            current = self.profiler.current_stage
+            if current is None:
+                continue
+            frame = sys._current_frames().get(self.target_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            stack.append(current)
+            self.samples[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+class PipelineProfiler:
+    """
+    Per-stage CPU profiles (cProfile .prof files), a folded-stack file for
+    flame graphs, optional tracemalloc peaks/snapshots and optional
+    event-loop lag sampling to spot blocking calls inside async code.
+    """
+
+    def __init__(self, output_dir, memory=False, loop_lag=False, sample_interval=SAMPLE_INTERVAL):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.memory = memory
+        self.loop_lag = loop_lag
+        self.sample_interval = sample_interval
+        self.current_stage: Optional[str] = None
+        self.summary = {}
+        self._sampler: Optional[_StackSampler] = None
+        self._lag_task: Optional[asyncio.Task] = None
+        self._stage_count = 0
+
+    # ------------------- Lifecycle -------------------
+    def start(self):
+        global _active
+        _active = self
+        if self.memory:
+            tracemalloc.start(25)
+        self._sampler = _StackSampler(self, self.sample_interval)
+        self._sampler.start()
+
+    def start_loop_monitor(self):
+        """Must be called from inside the running event loop."""
+        if self.loop_lag and self._lag_task is None:
+            self._lag_task = asyncio.get_running_loop().create_task(self._watch_loop_lag())
+
+    def stop(self):
+        global _active
+        if self._lag_task:
+            self._lag_task.cancel()
+        if self._sampler:
+            self._sampler.stop()
+            self._write_folded()
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        _active = None
+        self._write_summary()
+
+    # ------------------- Stages -------------------
+    @contextmanager
+    def stage(self, name: str):
+        if self.current_stage is not None:
+            # Nested stage (e.g. a helper reused inside another stage): attribute to the outer one
+            yield
+            return
+
+        self._stage_count += 1
+        label = f"{self._stage_count:02d}-{name}"
+        stats = self.summary.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "calls": 0})
+        stats["calls"] += 1
+
+        profile = cProfile.Profile()
+        if self.memory:
+            tracemalloc.reset_peak()
+            mem_before = tracemalloc.get_traced_memory()[0]
+
+        self.current_stage = name
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            stats["wall_seconds"] += time.perf_counter() - wall_start
+            stats["cpu_seconds"] += time.process_time() - cpu_start
+            self.current_stage = None
+            profile.dump_stats(self.output_dir / f"{label}.prof")
+
+            if self.memory:
+                current, peak = tracemalloc.get_traced_memory()
+                stats["peak_mb"] = max(stats.get("peak_mb", 0), round(peak / 1e6, 2))
+                stats["retained_mb"] = round((current - mem_before) / 1e6, 2)
+                snapshot = tracemalloc.take_snapshot()
+                snapshot.dump(str(self.output_dir / f"{label}.tracemalloc"))
+                stats["top_allocations"] = [
+                    str(s) for s in snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+                ]
+
+    # ------------------- Event Loop Lag -------------------
+    async def _watch_loop_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + LOOP_LAG_INTERVAL
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            lag = loop.time() - expected
+            name = self.current_stage
+            if name is None:
+                continue
+            stats = self.summary.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "calls": 0})
+            lag_stats = stats.setdefault("loop_lag", {"samples": 0, "max_ms": 0.0, "total_ms": 0.0, "blocked": 0})
+            lag_stats["samples"] += 1
+            lag_stats["total_ms"] += lag * 1000
+            lag_stats["max_ms"] = max(lag_stats["max_ms"], round(lag * 1000, 1))
+            if lag > LOOP_LAG_WARN:
+                lag_stats["blocked"] += 1
+
+    # ------------------- Output -------------------
+    def _write_folded(self):
+        path = self.output_dir / "profile.folded"
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self._sampler.samples.items()):
+                f.write(f"{stack} {count}\n")
+
+    def _write_summary(self):
+        with open(self.output_dir / "summary.json", "w", encoding="utf-8") as f:
+            json.dump(self.summary, f, indent=2)
+
+        for name, stats in self.summary.items():
+            line = f"⏱️ {name}: {stats['wall_seconds']:.1f}s wall, {stats['cpu_seconds']:.1f}s CPU"
+            if "peak_mb" in stats:
+                line += f", peak {stats['peak_mb']} MB"
+            lag = stats.get("loop_lag")
+            if lag and lag["samples"]:
+                line += f", loop lag max {lag['max_ms']:.0f} ms ({lag['blocked']} blocked)"
+            logger.info(line)
+        logger.info(f"🧪 Profile written to {self.output_dir} (view *.prof with snakeviz, profile.folded with flamegraph.pl or speedscope)")
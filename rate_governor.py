@@ -0,0 +1,285 @@
+import re
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from typing import Dict, Optional
+
+import yaml
+import openai
+import tiktoken
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first. Final analysis is what a run waits on; rating is bulk work.
+# Priority orders calls that draw on the same budget: one model, or the models
+# grouped under openai.shared_limits. Calls to models with separate limits
+# (gpt-4.1 final analysis, gpt-4o rating by default) never wait on each other.
+PRIORITIES = {
+    "final": 0,
+    "summary": 1,
+    "screen": 1,
+    "dedupe": 1,
+    "rating": 2,
+}
+
+# Used until the first response's x-ratelimit-* headers report the account's real limits
+DEFAULT_RATE_LIMITS = {
+    "gpt-4.1": {"rpm": 500, "tpm": 30000},
+    "gpt-4o": {"rpm": 500, "tpm": 30000},
+    "gpt-4o-mini": {"rpm": 500, "tpm": 200000},
+}
+FALLBACK_RATE_LIMIT = {"rpm": 500, "tpm": 30000}
+
+DEFAULT_COMPLETION_TOKENS = 1000  # Counted against TPM when a call sets no max_tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+MAX_RETRIES = 5
+RETRYABLE_ERRORS = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+STATS = {"waits": {}, "rate_limited": 0, "retries": 0, "tokens_estimated": 0, "tokens_used": 0}
+
+def get_stats() -> dict:
+    stats = dict(STATS)
+    stats["waits"] = {name: dict(w) for name, w in STATS["waits"].items()}
+    return stats
+
+def reset_stats():
+    STATS.update({"waits": {}, "rate_limited": 0, "retries": 0, "tokens_estimated": 0, "tokens_used": 0})
+
+def log_stats():
+    for name, w in sorted(STATS["waits"].items(), key=lambda item: PRIORITIES.get(item[0], 9)):
+        avg = w["seconds"] / w["requests"] if w["requests"] else 0
+        logger.info(f"🚦 {name}: {w['requests']} request(s), queue wait avg {avg:.2f}s, max {w['max_seconds']:.2f}s")
+    if STATS["rate_limited"] or STATS["retries"]:
+        logger.info(f"🚦 {STATS['rate_limited']} rate-limited response(s), {STATS['retries']} retr(ies)")
+
+def _record_wait(priority: str, seconds: float):
+    w = STATS["waits"].setdefault(priority, {"requests": 0, "seconds": 0.0, "max_seconds": 0.0})
+    w["requests"] += 1
+    w["seconds"] += seconds
+    w["max_seconds"] = max(w["max_seconds"], seconds)
+
+def load_config(path="config.yaml"):
+    with open(path, "r") as f:
+        return yaml.safe_load(f)
+
+# ------------------- Token Estimates -------------------
+_encodings = {}
+
+def _encoding(model: str):
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("o200k_base")
+    return _encodings[model]
+
+def count_tokens(text: str, model: str) -> int:
+    return len(_encoding(model).encode(text or ""))
+
+def estimate_tokens(messages, model: str, max_tokens: Optional[int] = None) -> int:
+    """Prompt tokens plus the completion allowance, which OpenAI counts against TPM up front."""
+    prompt = sum(count_tokens(m.get("content"), model) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+    return prompt + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+# ------------------- Header Parsing -------------------
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_UNIT_SECONDS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parse durations such as '20ms', '1s' or '6m0s' into seconds."""
+    if not value:
+        return None
+    parts = _DURATION_RE.findall(value)
+    if not parts:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(amount) * _UNIT_SECONDS[unit] for amount, unit in parts)
+
+def retry_delay(headers, attempt: int) -> float:
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+    return parse_duration(headers.get("retry-after")) or min(2 ** attempt, 30)
+
+def _header_int(headers, name: str) -> Optional[int]:
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+# ------------------- Budgets -------------------
+class _Bucket:
+    """Token bucket refilled continuously at `capacity` per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        amount = min(amount, self.capacity)  # An oversized request still runs once the bucket is full
+        return 0.0 if self.level >= amount else (amount - self.level) * 60 / self.capacity
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, limit: Optional[int], remaining: Optional[int], now: float):
+        # The server's view includes other processes sharing the key
+        self._refill(now)
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.level = min(self.level, float(remaining))
+
+class _ModelState:
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = _Bucket(rpm)
+        self.tokens = _Bucket(tpm)
+        self.queue = []
+        self.paused_until = 0.0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+class RateGovernor:
+    """
+    Shared RPM/TPM budget for every OpenAI call in the process. Callers wait in
+    one priority queue per budget (a model, or a group of models sharing a
+    limit); the head of the queue is released as soon as both budgets allow it.
+    Budgets follow the x-ratelimit-* response headers, and 429s pause the
+    budget for the time the server asks for.
+    """
+
+    def __init__(self, api_key: str, rate_limits: Optional[Dict[str, dict]] = None,
+                 shared_limits: Optional[Dict[str, list]] = None):
+        self.client = openai.AsyncOpenAI(api_key=api_key, max_retries=0)  # Retries are handled here
+        self.rate_limits = {**DEFAULT_RATE_LIMITS, **(rate_limits or {})}
+        # {group: [model, ...]}: the models draw on the group's rate_limits entry and share its queue
+        self.budget_keys = {model: group for group, models in (shared_limits or {}).items() for model in models}
+        self.models: Dict[str, _ModelState] = {}
+        self._seq = itertools.count()
+
+    def _state(self, model: str) -> _ModelState:
+        key = self.budget_keys.get(model, model)
+        if key not in self.models:
+            limits = self.rate_limits.get(key, FALLBACK_RATE_LIMIT)
+            self.models[key] = _ModelState(limits.get("rpm", FALLBACK_RATE_LIMIT["rpm"]),
+                                           limits.get("tpm", FALLBACK_RATE_LIMIT["tpm"]))
+        return self.models[key]
+
+    async def acquire(self, model: str, tokens: int, priority: str) -> float:
+        """Wait for budget. Returns the seconds spent queued."""
+        state = self._state(model)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(state.queue, (PRIORITIES.get(priority, 2), next(self._seq), tokens, future))
+        started = time.monotonic()
+        self._pump(state)
+        await future
+        return time.monotonic() - started
+
+    def _pump(self, state: _ModelState):
+        if state.timer:
+            state.timer.cancel()
+            state.timer = None
+
+        while state.queue:
+            _, _, tokens, future = state.queue[0]
+            if future.done():  # Caller was cancelled
+                heapq.heappop(state.queue)
+                continue
+            now = time.monotonic()
+            wait = max(state.paused_until - now, state.requests.wait_time(1, now), state.tokens.wait_time(tokens, now))
+            if wait > 0:
+                state.timer = asyncio.get_running_loop().call_later(wait, self._pump, state)
+                return
+            heapq.heappop(state.queue)
+            state.requests.take(1, now)
+            state.tokens.take(tokens, now)
+            future.set_result(None)
+
+    def observe(self, model: str, headers, estimated: int, used: Optional[int]):
+        state = self._state(model)
+        now = time.monotonic()
+        state.requests.sync(_header_int(headers, "x-ratelimit-limit-requests"),
+                            _header_int(headers, "x-ratelimit-remaining-requests"), now)
+        state.tokens.sync(_header_int(headers, "x-ratelimit-limit-tokens"),
+                          _header_int(headers, "x-ratelimit-remaining-tokens"), now)
+        if used is not None and used < estimated:
+            state.tokens.give_back(estimated - used)
+
+    def refund(self, model: str, tokens: int):
+        """Return the tokens reserved for a call that failed before the server counted it."""
+        self._state(model).tokens.give_back(tokens)
+
+    def pause(self, model: str, seconds: float):
+        state = self._state(model)
+        state.paused_until = max(state.paused_until, time.monotonic() + seconds)
+
+    async def chat_completion(self, priority: str = "rating", **kwargs):
+        """`chat.completions.create` with shared budgets and retries on 429s and transient errors."""
+        model = kwargs["model"]
+        estimated = estimate_tokens(kwargs.get("messages", []), model, kwargs.get("max_tokens"))
+        STATS["tokens_estimated"] += estimated
+
+        for attempt in range(MAX_RETRIES + 1):
+            _record_wait(priority, await self.acquire(model, estimated, priority))
+            try:
+                raw = await self.client.chat.completions.with_raw_response.create(**kwargs)
+            except RETRYABLE_ERRORS as e:
+                response = getattr(e, "response", None)
+                headers = response.headers if response is not None else {}
+                # The retry reserves again; a 429's headers then re-sync the budget with the server
+                self.refund(model, estimated)
+                if isinstance(e, openai.RateLimitError):
+                    if getattr(e, "code", None) == "insufficient_quota":
+                        raise  # Billing problem; waiting won't help
+                    STATS["rate_limited"] += 1
+                    self.observe(model, headers, estimated, None)
+                if attempt == MAX_RETRIES:
+                    raise
+                delay = retry_delay(headers, attempt)
+                STATS["retries"] += 1
+                logger.warning(f"🚦 {model} {type(e).__name__}, retrying in {delay:.1f}s ({attempt + 1}/{MAX_RETRIES})")
+                self.pause(model, delay)
+                continue
+
+            completion = raw.parse()
+            used = completion.usage.total_tokens if completion.usage else None
+            if used:
+                STATS["tokens_used"] += used
+            self.observe(model, raw.headers, estimated, used)
+            return completion
+
+# ------------------- Shared Instance -------------------
+_governor: Optional[RateGovernor] = None
+_governor_loop = None
+
+def get_governor() -> RateGovernor:
+    """One governor per event loop (asyncio primitives can't cross loops)."""
+    global _governor, _governor_loop
+    loop = asyncio.get_running_loop()
+    if _governor is None or _governor_loop is not loop:
+        openai_config = load_config().get("openai", {}) or {}
+        api_key = openai_config.get("api_key")
+        if not api_key:
+            raise ValueError("Missing OpenAI API key in config.yaml")
+        _governor = RateGovernor(api_key, openai_config.get("rate_limits"), openai_config.get("shared_limits"))
+        _governor_loop = loop
+    return _governor
+
+async def chat_completion(priority: str = "rating", **kwargs):
+    return await get_governor().chat_completion(priority, **kwargs)
@@ -0,0 +1,186 @@
+import os
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, the stdlib codec is used instead
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Per-run record files (one JSON object per line)
+COMBINED_RESULTS = "combined_results.jsonl"
+RATINGS = "ratings.jsonl"
+READY_CANDIDATES = "ready_candidates.jsonl"
+RESULTS = "results.jsonl"  # Append-only updates to ready candidates (result, duplicate_of, ...)
+
+LEGACY_READY_CANDIDATES = "ready_candidates.json"
+
+# ------------------- Codec -------------------
+if orjson is not None:
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(data):
+        return orjson.loads(data)
+else:
+    def dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def loads(data):
+        return json.loads(data)
+
+# ------------------- Candidate -------------------
+class Candidate:
+    """
+    Compact in-memory record of one search result as it moves between stages.
+    Supports read access like a dict (entry["url"], entry.get("result")).
+    """
+    __slots__ = ("hash", "name", "url", "description", "source_urls", "rating", "result", "duplicate_of", "extra")
+
+    FIELDS = ("hash", "name", "url", "description", "source_urls", "rating", "result", "duplicate_of")
+
+    def __init__(self, hash, name="", url="", description="", source_urls=None, rating=None,
+                 result=None, duplicate_of=None, extra=None):
+        self.hash = hash
+        self.name = name
+        self.url = url
+        self.description = description
+        self.source_urls = source_urls
+        self.rating = rating
+        self.result = result
+        self.duplicate_of = duplicate_of
+        self.extra = extra  # Fields added by later stages that have no slot of their own
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Candidate":
+        known = {k: data[k] for k in cls.FIELDS if k in data}
+        extra = {k: v for k, v in data.items() if k not in cls.FIELDS} or None
+        return cls(extra=extra, **known)
+
+    def to_dict(self) -> dict:
+        data = {k: getattr(self, k) for k in self.FIELDS if getattr(self, k) is not None}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def update(self, patch: dict):
+        for key, value in patch.items():
+            if key == "hash":
+                continue
+            if key in self.FIELDS:
+                setattr(self, key, value)
+            else:
+                if self.extra is None:
+                    self.extra = {}
+                self.extra[key] = value
+
+    def get(self, key, default=None):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            return default if value is None else value
+        return (self.extra or {}).get(key, default)
+
+    def __getitem__(self, key):
+        value = self.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __repr__(self):
+        return f"Candidate(hash={self.hash!r}, url={self.url!r})"
+
+# ------------------- Reading and Writing -------------------
+def _as_dict(record) -> dict:
+    return record.to_dict() if isinstance(record, Candidate) else record
+
+def append_records(path, records: Iterable) -> int:
+    """Append records to a JSONL file and return how many were written."""
+    count = 0
+    with open(path, "ab+") as f:
+        # Start on a fresh line if a previous append was cut short
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        for record in records:
+            f.write(dumps(_as_dict(record)) + b"\n")
+            count += 1
+    return count
+
+def write_records(path, records: Iterable) -> int:
+    """Write a JSONL file from a stream of records, replacing it atomically."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    count = append_records(tmp, records)
+    os.replace(tmp, path)
+    return count
+
+def iter_records(path) -> Iterator[dict]:
+    """Yield records one at a time. A torn last line (crash mid-append) is skipped."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield loads(line)
+            except ValueError:
+                logger.warning(f"⚠️ Skipping unreadable line {line_no} in {path}")
+
+# ------------------- Run Candidates -------------------
+def iter_candidates(folder) -> Iterator[Candidate]:
+    """
+    Yield the run's ready candidates with all later updates from results.jsonl
+    applied. Falls back to ready_candidates.json for runs made before JSONL.
+    """
+    folder = Path(folder)
+    jsonl_path = folder / READY_CANDIDATES
+    if jsonl_path.exists():
+        patches: Dict[str, dict] = {}
+        for patch in iter_records(folder / RESULTS):
+            patches.setdefault(patch.get("hash"), {}).update(patch)
+        for data in iter_records(jsonl_path):
+            candidate = Candidate.from_dict(data)
+            if candidate.hash in patches:
+                candidate.update(patches[candidate.hash])
+            yield candidate
+        return
+
+    legacy_path = folder / LEGACY_READY_CANDIDATES
+    if legacy_path.exists():
+        with open(legacy_path, "r", encoding="utf-8") as f:
+            for data in json.load(f):
+                yield Candidate.from_dict(data)
+
+def load_candidates(folder) -> Dict[str, Candidate]:
+    return {c.hash: c for c in iter_candidates(folder)}
+
+def has_candidates(folder) -> bool:
+    folder = Path(folder)
+    return (folder / READY_CANDIDATES).exists() or (folder / LEGACY_READY_CANDIDATES).exists()
+
+def candidate_files(folder) -> List[Path]:
+    """Files whose changes mean the run's candidates changed."""
+    folder = Path(folder)
+    if (folder / READY_CANDIDATES).exists():
+        return [p for p in (folder / READY_CANDIDATES, folder / RESULTS) if p.exists()]
+    legacy_path = folder / LEGACY_READY_CANDIDATES
+    return [legacy_path] if legacy_path.exists() else []
+
+def record_updates(folder, updates: Iterable[dict]) -> int:
+    """Append {"hash": ..., field: value} updates to the run's results.jsonl."""
+    return append_records(Path(folder) / RESULTS, updates)
+
+def load_ratings(path) -> Dict[str, int]:
+    ratings = {}
+    for record in iter_records(path):
+        ratings[record["hash"]] = record["rating"]
+    return ratings
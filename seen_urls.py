@@ -0,0 +1,117 @@
+import time
+import sqlite3
+import logging
+from typing import Iterable, Set
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SEEN_PATH = "seen_urls.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen (
+    hash TEXT PRIMARY KEY,
+    url TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+"""
+
+def get_seen_config(config: dict) -> dict:
+    google = config.get("google", {}) or {}
+    return {
+        "seen_path": google.get("seen_urls_path", DEFAULT_SEEN_PATH),
+        "min_novelty_ratio": google.get("min_novelty_ratio", 0) or 0,
+    }
+
+class SeenUrls:
+    """
+    Every search result already extracted by an earlier run, keyed by the
+    candidate hash (which is derived from the canonical URL).
+    """
+
+    def __init__(self, path: str = DEFAULT_SEEN_PATH):
+        self.path = path
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def known(self, hashes: Iterable[str]) -> Set[str]:
+        hashes = list(hashes)
+        found = set()
+        # Stay well under SQLite's bound-parameter limit
+        for i in range(0, len(hashes), 500):
+            chunk = hashes[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT hash FROM seen WHERE hash IN ({','.join('?' for _ in chunk)})", chunk
+            ).fetchall()
+            found.update(row[0] for row in rows)
+        return found
+
+    def add(self, entries: Iterable) -> int:
+        now = time.time()
+        rows = [(e.hash, e.url, now, now) for e in entries]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO seen (hash, url, first_seen, last_seen) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(hash) DO UPDATE SET last_seen = excluded.last_seen",
+                rows,
+            )
+        return len(rows)
+
+def mark_seen(entries, path: str = DEFAULT_SEEN_PATH) -> int:
+    store = SeenUrls(path)
+    try:
+        count = store.add(entries)
+    finally:
+        store.close()
+    logger.info(f"👁️ Marked {count} result(s) as seen in {path}")
+    return count
+
+class NoveltyTracker:
+    """
+    Decides after each saved SERP page whether paging is still worth it:
+    stops once the share of results not seen before (in earlier runs or on
+    earlier pages of this query) drops below min_ratio.
+    """
+
+    def __init__(self, seen_path: str = DEFAULT_SEEN_PATH, min_ratio: float = 0):
+        self.seen_path = seen_path
+        self.min_ratio = min_ratio
+        self.pages = []
+        self.stopped_early = False
+        self._query_hashes = set()
+
+    def check_page(self, page: int, html_path: str) -> bool:
+        from extract_google_results import extract_results_from_html
+
+        with open(html_path, "r", encoding="utf-8") as f:
+            hashes = {entry.hash for entry in extract_results_from_html(f.read())}
+
+        store = SeenUrls(self.seen_path)
+        try:
+            known = store.known(hashes)
+        finally:
+            store.close()
+
+        new = hashes - known - self._query_hashes
+        self._query_hashes |= hashes
+        ratio = len(new) / len(hashes) if hashes else 0.0
+        self.pages.append({"page": page, "results": len(hashes), "new": len(new), "novelty": round(ratio, 2)})
+        logger.info(f"🆕 Page {page}: {len(new)}/{len(hashes)} new result(s) ({ratio:.0%})")
+
+        if self.min_ratio and ratio < self.min_ratio:
+            self.stopped_early = True
+            return False
+        return True
+
+    def summary(self) -> dict:
+        return {
+            "pages": len(self.pages),
+            "results": sum(p["results"] for p in self.pages),
+            "new": sum(p["new"] for p in self.pages),
+            "stopped_early": self.stopped_early,
+            "per_page": self.pages,
+        }
@@ -4,6 +4,7 @@ import sys
 import os
 import yaml
 from datetime import datetime, timedelta
+from compact_storage import compact_pages
 
 # Paths
 SCRIPT_PATH = os.path.join(os.path.dirname(__file__), "main.py")
@@ -43,6 +44,13 @@ async def run_daily_at(hour: int, minute: int):
         if stderr:
             print("📥 Logs from stderr (may include warnings/errors):\n", stderr.decode())
 
+        # 🧹 Compact older runs (dedupe, compress, apply retention)
+        try:
+            stats = await asyncio.to_thread(compact_pages, "pages", load_config())
+            print(f"🧹 Compaction finished: {stats}")
+        except Exception as e:
+            print(f"❌ Compaction failed: {e}")
+
         # 💤 Sleep until the next day’s run
         print("📆 Scheduling next run...")
         # Loop will calculate next day's delay
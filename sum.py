@@ -22,27 +22,34 @@ def merge_files_from_multiple_dirs():
         print("No files selected.")
         return
 
-    output_lines = []
-    for file_path in all_file_paths:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            file_name = os.path.basename(file_path)
-            output_lines.append(f"{file_name}:\n{content}\n")
-        except Exception as e:
-            print(f"Could not read {file_path}: {e}")
-
     output_path = filedialog.asksaveasfilename(
         title="Save merged file as",
         defaultextension=".txt",
         filetypes=[("Text Files", "*.txt")]
     )
 
-    if output_path:
-        with open(output_path, 'w', encoding='utf-8') as out_file:
-            out_file.write('\n'.join(output_lines))
-        print(f"Files merged into {output_path}")
-    else:
+    if not output_path:
         print("No output file selected.")
+        return
 
-merge_files_from_multiple_dirs()
\ No newline at end of file
+    # Write each file as it is read instead of joining everything in memory.
+    # For headless servers use export_corpus.py instead.
+    with open(output_path, 'w', encoding='utf-8') as out_file:
+        first = True
+        for file_path in all_file_paths:
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    file_name = os.path.basename(file_path)
+                    if not first:
+                        out_file.write('\n')
+                    out_file.write(f"{file_name}:\n")
+                    for chunk in iter(lambda: f.read(1 << 20), ''):
+                        out_file.write(chunk)
+                    out_file.write('\n')
+                    first = False
+            except Exception as e:
+                print(f"Could not read {file_path}: {e}")
+    print(f"Files merged into {output_path}")
+
+if __name__ == "__main__":
+    merge_files_from_multiple_dirs()
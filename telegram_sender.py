@@ -3,6 +3,7 @@ import logging
 import asyncio
 import yaml
 from telegram import Bot
+from url_utils import canonicalize_url, url_key
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -21,9 +22,10 @@ class TelegramSender:
             raise ValueError("Telegram bot token and chat ID must be provided")
         self.bot = Bot(token=self.token)
 
-    async def send_filing_result(self, result: str, url: str):
+    async def send_filing_result(self, result: str, url: str, source_urls=None):
         """
         Sends the summarized investment opportunity to Telegram with the original source URL.
+        Other URLs the same document was found at are listed below it.
         Skips sending if result is empty or just 'X'.
         """
         if not result or result.strip() == 'X':
@@ -31,6 +33,15 @@ class TelegramSender:
             return
 
         message = f"✨\n\n{result}\n\n🔗 URL\n{url}"
+        # Only list genuinely different locations, not tracking or redirect variants
+        seen = {url_key(url)}
+        also_at = []
+        for source in source_urls or []:
+            if url_key(source) not in seen:
+                seen.add(url_key(source))
+                also_at.append(canonicalize_url(source))
+        if also_at:
+            message += "\n\n🔁 Also found at\n" + "\n".join(also_at[:5])
 
         try:
             await self.bot.send_message(chat_id=self.chat_id, text=message)
@@ -0,0 +1,20 @@
+import json
+
+import pytest
+
+from ai_api import parse_ratings
+
+BATCH = [{"hash": f"{i:016x}"} for i in range(6)]
+
+def test_truncated_reply_keeps_ratings_before_the_cut():
+    full = json.dumps({entry["hash"]: 7 for entry in BATCH}, indent=2)
+    truncated = full[: full.index(BATCH[4]["hash"]) + 5]
+    assert parse_ratings(truncated, BATCH) == {entry["hash"]: 7 for entry in BATCH[:4]}
+
+def test_unknown_hashes_and_bad_values_are_dropped():
+    reply = json.dumps({"ratings": {BATCH[0]["hash"]: "8", BATCH[1]["hash"]: 11, "other": 5}})
+    assert parse_ratings(reply, BATCH) == {BATCH[0]["hash"]: 8}
+
+def test_reply_without_ratings_raises():
+    with pytest.raises(ValueError):
+        parse_ratings("Sorry, I can't", BATCH)
@@ -0,0 +1,47 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import ai_api_final
+
+class WordEncoding:
+    def encode(self, text):
+        return text.split()
+
+    def decode(self, tokens):
+        return " ".join(tokens)
+
+def reply(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+def run_analysis(monkeypatch, tmp_path, words, possible):
+    calls = []
+
+    async def fake_chat_completion(priority, **kwargs):
+        calls.append(priority)
+        if priority == "screen":
+            return reply(json.dumps({"possible_opportunity": possible, "confidence": 0.95}))
+        return reply("Company: Helios Grid")
+
+    monkeypatch.setattr(ai_api_final, "tiktoken", SimpleNamespace(encoding_for_model=lambda model: WordEncoding()))
+    monkeypatch.setattr(ai_api_final, "chat_completion", fake_chat_completion)
+    monkeypatch.setattr(ai_api_final, "load_config", lambda: {"openai": {"api_key": "x"}, "prompt": "Analyze"})
+    path = tmp_path / "abc.txt"
+    path.write_text("funding " * words)
+
+    ai_api_final.reset_cascade_stats()
+    result = asyncio.run(ai_api_final.analyze_txt_file(str(path)))
+    return result, calls, ai_api_final.get_cascade_stats()
+
+def test_large_document_is_screened_before_summaries(monkeypatch, tmp_path):
+    result, calls, _ = run_analysis(monkeypatch, tmp_path, ai_api_final.MAX_INPUT_TOKENS * 2, possible=False)
+    assert result == "X"
+    assert calls == ["screen"]
+
+def test_final_tier_is_recorded_as_completed(monkeypatch, tmp_path):
+    result, calls, stats = run_analysis(monkeypatch, tmp_path, 100, possible=True)
+    assert result == "Company: Helios Grid"
+    assert calls == ["screen", "final"]
+    assert stats["final (gpt-4.1)"]["completed"] == 1
+    assert stats["final (gpt-4.1)"]["stopped"] == 0
+    assert stats["gpt-4o-mini"]["escalated"] == 1
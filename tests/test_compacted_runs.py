@@ -0,0 +1,114 @@
+import os
+import time
+import asyncio
+import types
+
+import pytest
+
+import records
+from compact_storage import compact_pages, glob_artifacts, read_artifact_text
+
+ARTICLE = "<html><body><article>" + "<p>Acme Corp is raising $5 million in a Series A round, led by Example Ventures.</p>" * 8 + "</article></body></html>"
+TEXT = "Acme Corp is raising a $5 million Series A round to expand, and existing investors will follow on. " * 5
+
+@pytest.fixture
+def compacted_run(tmp_path):
+    pages = tmp_path / "pages"
+    run = pages / "2026-01-01T00-00-00-aaaa"
+    (run / "txt").mkdir(parents=True)
+    (run / "downloads").mkdir()
+    (run / "txt" / "abc.txt").write_text(TEXT, encoding="utf-8")
+    (run / "downloads" / "def.html").write_text(ARTICLE, encoding="utf-8")
+    records.write_records(run / records.READY_CANDIDATES, [
+        {"hash": "abc", "url": "https://example.com/a.pdf"},
+        {"hash": "def", "url": "https://example.com/d"},
+    ])
+
+    old = time.time() - 3 * 86400
+    for path in [run, run / "txt", run / "downloads", *run.rglob("*")]:
+        os.utime(path, (old, old))
+    stats = compact_pages(pages, config={"storage": {"min_age_hours": 1}})
+    assert stats["compressed"] == 2
+    assert not (run / "txt" / "abc.txt").exists()
+    return run
+
+def test_convert_reads_compressed_pages(compacted_run):
+    from file_work import convert_files_to_text
+
+    convert_files_to_text(compacted_run)
+    converted = compacted_run / "txt" / "def.txt"
+    assert converted.exists()
+    assert "raising $5 million" in converted.read_text(encoding="utf-8")
+    assert not list((compacted_run / "txt").glob("*.html.txt"))
+
+def test_plain_file_wins_over_compressed_copy(compacted_run):
+    (compacted_run / "txt" / "abc.txt").write_text("fresh", encoding="utf-8")
+    found = glob_artifacts(compacted_run / "txt", "*.txt")
+    assert [p.name for p in found] == ["abc.txt"]
+    assert read_artifact_text(found[0]) == "fresh"
+
+def test_analyze_finds_compressed_txt(compacted_run, monkeypatch, tmp_path):
+    import main
+
+    analyzed = []
+
+    async def analyze_txt_file(path):
+        analyzed.append(read_artifact_text(path))
+        return "Company: Acme"
+
+    fake = types.SimpleNamespace(
+        analyze_txt_file=analyze_txt_file, get_cascade_stats=lambda: {}, reset_cascade_stats=lambda: None,
+    )
+    monkeypatch.setitem(__import__("sys").modules, "ai_api_final", fake)
+    monkeypatch.setattr(main, "load_config", lambda path="config.yaml": {})
+
+    asyncio.run(main.analyze_run(compacted_run))
+    assert analyzed == [TEXT]
+    assert records.load_candidates(compacted_run)["abc"].result == "Company: Acme"
+
+class FakeResponse:
+    status = 200
+    content_type = "application/pdf"
+
+    def __init__(self, body):
+        self.body = body
+
+    async def read(self):
+        return self.body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+class FakeSession:
+    def __init__(self, body):
+        self.body = body
+
+    def get(self, url, **kwargs):
+        return FakeResponse(self.body)
+
+def test_redownload_does_not_rewrite_linked_copies(tmp_path):
+    from pdf_work import download_pdf
+
+    pages = tmp_path / "pages"
+    copies = []
+    for name in ("2026-01-01T00-00-00-aaaa", "2026-01-02T00-00-00-bbbb"):
+        (pages / name / "pdf").mkdir(parents=True)
+        copies.append(pages / name / "pdf" / "abc.pdf")
+        copies[-1].write_bytes(b"%PDF-1.4 original")
+    old = time.time() - 3 * 86400
+    for path in pages.rglob("*"):
+        os.utime(path, (old, old))
+
+    stats = compact_pages(pages, config={"storage": {"min_age_hours": 1}})
+    assert stats["deduplicated"] == 1
+    assert os.path.samefile(copies[0], copies[1])
+
+    asyncio.run(download_pdf(FakeSession(b"%PDF-1.4 changed"), "https://example.com/a.pdf", str(copies[0])))
+    assert copies[0].read_bytes() == b"%PDF-1.4 changed"
+    assert copies[1].read_bytes() == b"%PDF-1.4 original"
+    blob = next((pages / "_blobs").glob("*/*"))
+    assert blob.read_bytes() == b"%PDF-1.4 original"
+    assert not list(copies[0].parent.glob("*.tmp"))
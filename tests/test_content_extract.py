@@ -0,0 +1,41 @@
+from content_extract import extract_main_text
+
+PARAGRAPH = ("Helios Grid is raising $25M in a Series B round to build a 400MW solar pipeline "
+             "across Spain and Portugal, with first projects reaching financial close next year. ")
+
+WEBFORMS_PAGE = f"""
+<html><head><title>Helios Grid raises Series B</title></head>
+<body>
+<form method="post" action="./news.aspx?id=42" id="form1">
+  <input type="hidden" name="__VIEWSTATE" value="abc" />
+  <input type="hidden" name="__EVENTVALIDATION" value="def" />
+  <header class="site-header"><a href="/">Home</a> <a href="/news">News</a></header>
+  <form id="search"><input type="text" name="q" /><button>Search</button></form>
+  <div id="content">
+    <article>
+      <header><h1>Helios Grid opens Series B</h1><p class="byline">By Ana Ruiz</p></header>
+      <p>{PARAGRAPH * 2}</p>
+      <p>{PARAGRAPH}</p>
+      <p>{PARAGRAPH}</p>
+    </article>
+  </div>
+</form>
+</body></html>
+"""
+
+NEWSLETTER = """
+<form class="signup"><label>Email</label><input type="email" name="email" /><button>Subscribe</button></form>
+"""
+
+def test_form_wrapped_page_keeps_article():
+    text = extract_main_text(WEBFORMS_PAGE)
+    assert "raising $25M in a Series B round" in text
+    assert "Helios Grid opens Series B" in text
+    assert "By Ana Ruiz" in text
+    assert "Search" not in text
+
+def test_small_forms_are_dropped():
+    page = WEBFORMS_PAGE.replace('<div id="content">', f'<div id="content">{NEWSLETTER}')
+    text = extract_main_text(page)
+    assert "Subscribe" not in text
+    assert "raising $25M in a Series B round" in text
@@ -0,0 +1,76 @@
+import asyncio
+
+import aiohttp
+
+from download_scheduler import HostScheduler
+
+class HttpError(Exception):
+    def __init__(self, status):
+        self.status = status
+
+def download(scheduler, url, errors):
+    """Mimic download_with_retries: one slot per attempt, one outcome per URL."""
+    async def run():
+        error = None
+        for attempt_error in errors:
+            try:
+                async with scheduler.slot(url):
+                    if attempt_error:
+                        raise attempt_error
+                scheduler.record_outcome(url)
+                return
+            except Exception as e:
+                error = e
+                if not scheduler.should_retry(e):
+                    break
+        scheduler.record_outcome(url, error)
+    asyncio.run(run())
+
+def make_scheduler():
+    return HostScheduler(per_host_interval=0, skip_host_after_failures=5, host_stats_path=None)
+
+def test_dead_links_do_not_skip_host():
+    scheduler = make_scheduler()
+    for i in range(6):
+        download(scheduler, f"https://cdn.example.com/missing-{i}.pdf", [HttpError(404)] * 3)
+    assert not scheduler.is_skipped("cdn.example.com")
+    assert scheduler.stats["cdn.example.com"]["attempts"] == 6
+    assert scheduler.order([{"url": "https://cdn.example.com/deck.pdf"}])
+
+def test_gone_documents_are_not_retried():
+    assert not HostScheduler.should_retry(HttpError(404))
+    assert not HostScheduler.should_retry(HttpError(410))
+    assert HostScheduler.should_retry(HttpError(503))
+    assert HostScheduler.is_host_error(HttpError(429))
+    assert not HostScheduler.is_host_error(HttpError(403))
+
+def test_host_errors_skip_host_after_enough_urls():
+    scheduler = make_scheduler()
+    errors = [asyncio.TimeoutError(), aiohttp.ClientConnectionError(), HttpError(500), HttpError(502)]
+    for i in range(4):
+        download(scheduler, f"https://down.example.com/{i}.pdf", [errors[i]] * 3)
+    assert not scheduler.is_skipped("down.example.com")  # Four URLs, however many attempts
+    download(scheduler, "https://down.example.com/4.pdf", [HttpError(504)] * 3)
+    assert scheduler.is_skipped("down.example.com")
+
+def test_answer_resets_failure_run():
+    scheduler = make_scheduler()
+    for i in range(4):
+        download(scheduler, f"https://flaky.example.com/{i}.pdf", [HttpError(500)] * 3)
+    download(scheduler, "https://flaky.example.com/missing.pdf", [HttpError(404)])
+    assert scheduler.stats["flaky.example.com"]["consecutive_failures"] == 0
+
+def test_workers_merge_host_stats(tmp_path):
+    path = str(tmp_path / "host_stats.json")
+    first = HostScheduler(per_host_interval=0, host_stats_path=path)
+    second = HostScheduler(per_host_interval=0, host_stats_path=path)
+
+    download(first, "https://a.example.com/1.pdf", [None])
+    download(second, "https://b.example.com/1.pdf", [HttpError(500)] * 3)
+    first.save_stats()
+    second.save_stats()
+
+    saved = HostScheduler(host_stats_path=path).stats
+    assert saved["a.example.com"]["attempts"] == 1
+    assert saved["b.example.com"]["failures"] == 1
+    assert [p.name for p in tmp_path.iterdir()] == ["host_stats.json"]
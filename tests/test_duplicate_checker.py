@@ -0,0 +1,36 @@
+import asyncio
+
+import records
+from duplicate_checker import get_recent_results, group_duplicates
+
+SUMMARY = "Company: Helios Grid\nRaising $25M Series B for a 400MW solar pipeline in Spain and Portugal"
+
+def make_run(pages, name, result=None, sent=False):
+    folder = pages / name
+    folder.mkdir(parents=True)
+    records.write_records(folder / records.READY_CANDIDATES, [{"hash": "abc123", "url": "https://example.com/deck.pdf"}])
+    update = {"hash": "abc123", "result": result or SUMMARY}
+    if sent:
+        update["sent_at"] = "2026-01-01T00:00:00"
+    records.record_updates(folder, [update])
+    return folder
+
+def test_url_found_in_two_runs_is_compared_with_earlier_result(tmp_path):
+    pages = tmp_path / "pages"
+    make_run(pages, "2026-01-01T00-00-00-aaaa", sent=True)
+    current = make_run(pages, "2026-01-02T00-00-00-bbbb")
+
+    history = get_recent_results(pages, exclude_hashes={"abc123"}, run_folder=current)
+    assert history == [SUMMARY]
+
+    groups = asyncio.run(group_duplicates({"abc123": SUMMARY}, exclude_hashes={"abc123"},
+                                          run_folder=current, base_folder=pages))
+    assert groups == [{"hashes": ["abc123"], "representative": None, "history": True}]
+
+def test_current_run_results_are_not_history(tmp_path):
+    pages = tmp_path / "pages"
+    current = make_run(pages, "2026-01-02T00-00-00-bbbb")
+
+    assert get_recent_results(pages, exclude_hashes={"abc123"}, run_folder=current) == []
+    groups = asyncio.run(group_duplicates({"abc123": SUMMARY}, run_folder=current, base_folder=pages))
+    assert groups == [{"hashes": ["abc123"], "representative": "abc123", "history": False}]
@@ -0,0 +1,45 @@
+import asyncio
+
+from aiohttp import web
+
+import records
+from prefetch import DEFAULT_PREFETCH_CONFIG, deferred_hashes, prefetch_run
+
+SIZES = {"big.pdf": 9000, "small.pdf": 100, "mid.pdf": 2000, "huge.pdf": 90_000}
+
+async def serve_pdf(request):
+    name = request.match_info["name"]
+    headers = {"Content-Type": "application/pdf", "Content-Length": str(SIZES[name]), "ETag": f'"{name}"'}
+    return web.Response(headers=headers)
+
+async def run_prefetch(folder, candidates, settings):
+    app = web.Application()
+    app.router.add_route("HEAD", "/{name}", serve_pdf)
+    app.router.add_route("HEAD", "/mirror/{name}", serve_pdf)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        records.write_records(folder / records.READY_CANDIDATES, [
+            {"hash": h, "url": f"http://127.0.0.1:{port}/{path}"} for h, path in candidates
+        ])
+        return await prefetch_run(folder, pdf_only=True, settings=settings)
+    finally:
+        await runner.cleanup()
+
+def test_prefetch_run_orders_and_dedupes_whole_run(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    settings = {**DEFAULT_PREFETCH_CONFIG, "per_host_interval": 0, "max_bytes": 50_000}
+    # The mirror of big.pdf is probed in the same pass, whichever shard it would land in
+    candidates = [("h1", "big.pdf"), ("h2", "huge.pdf"), ("h3", "mid.pdf"), ("x0", "mirror/big.pdf"), ("h4", "small.pdf")]
+    hashes = asyncio.run(run_prefetch(tmp_path, candidates, settings))
+
+    assert hashes == ["h4", "h3", "h1"]
+    assert deferred_hashes(tmp_path) == ["h2"]
+    assert records.load_candidates(tmp_path)["x0"].get("duplicate_of") == "h1"
+
+def test_prefetch_run_disabled(tmp_path):
+    settings = {**DEFAULT_PREFETCH_CONFIG, "enabled": False}
+    assert asyncio.run(prefetch_run(tmp_path, settings=settings)) is None
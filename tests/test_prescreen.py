@@ -0,0 +1,21 @@
+import pytest
+
+from prescreen import FUNDING_RE, MONEY_RE, screen_text
+
+FILLER = ("The company was founded in 2015 and operates in three markets with a team of engineers. "
+          "We work with partners across the region and the board meets each quarter. ") * 3
+
+@pytest.mark.parametrize("amount", ["₹250 crore", "Rs. 50 lakh", "INR 100 crore", "$2.3M", "€15M",
+                                    "EUR 2.5 million", "10 million dollars", "AED 40m", "HK$ 12m"])
+def test_money_formats(amount):
+    assert MONEY_RE.search(f"The raise is {amount} in total.")
+
+def test_generic_business_words_are_not_funding_terms():
+    text = FILLER + "Revenue grew this round of results; capital expenditure rose and a pipe stake was sold for $3M."
+    assert len(FUNDING_RE.findall(text)) < 2
+    assert screen_text(text)[0] == "no_funding_terms"
+
+def test_indian_raise_reaches_analysis():
+    text = FILLER + ("The company is raising ₹250 crore in a pre-IPO round through a private placement "
+                     "to fund two new plants.")
+    assert screen_text(text) is None
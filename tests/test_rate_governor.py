@@ -0,0 +1,55 @@
+import asyncio
+from types import SimpleNamespace
+
+import rate_governor
+from rate_governor import RateGovernor
+
+class FlakyError(Exception):
+    pass
+
+class FakeCompletions:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs["model"])
+        if self.failures:
+            self.failures -= 1
+            raise FlakyError()
+        completion = SimpleNamespace(usage=None)
+        return SimpleNamespace(headers={}, parse=lambda: completion)
+
+def make_governor(monkeypatch, completions, **kwargs):
+    monkeypatch.setattr(rate_governor, "estimate_tokens", lambda messages, model, max_tokens=None: 1000)
+    governor = RateGovernor("test-key", **kwargs)
+    governor.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(with_raw_response=completions)))
+    return governor
+
+def test_shared_budget_serves_final_before_rating(monkeypatch):
+    completions = FakeCompletions()
+    governor = make_governor(monkeypatch, completions, rate_limits={"gpt-4": {"rpm": 600, "tpm": 60000}},
+                             shared_limits={"gpt-4": ["gpt-4.1", "gpt-4o"]})
+
+    async def run():
+        state = governor._state("gpt-4o")
+        assert state is governor._state("gpt-4.1")
+        state.requests.level = 0  # Budget spent: both calls queue until it refills
+        rating = asyncio.create_task(governor.chat_completion("rating", model="gpt-4o", messages=[]))
+        await asyncio.sleep(0)
+        final = asyncio.create_task(governor.chat_completion("final", model="gpt-4.1", messages=[]))
+        await asyncio.gather(rating, final)
+
+    asyncio.run(run())
+    assert completions.calls == ["gpt-4.1", "gpt-4o"]
+
+def test_retry_refunds_reserved_tokens(monkeypatch):
+    monkeypatch.setattr(rate_governor, "RETRYABLE_ERRORS", (FlakyError,))
+    monkeypatch.setattr(rate_governor, "retry_delay", lambda headers, attempt: 0)
+    completions = FakeCompletions(failures=2)
+    governor = make_governor(monkeypatch, completions, rate_limits={"gpt-4o": {"rpm": 600, "tpm": 10000}})
+
+    asyncio.run(governor.chat_completion("rating", model="gpt-4o", messages=[]))
+    # Only the successful attempt's reservation is held (usage unknown, so not given back)
+    assert len(completions.calls) == 3
+    assert 8900 < governor._state("gpt-4o").tokens.level <= 9100
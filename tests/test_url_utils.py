@@ -0,0 +1,19 @@
+from url_utils import canonicalize_url, url_key
+
+def test_encoded_slash_stays_encoded():
+    assert canonicalize_url("https://example.com/files/a%2Fb.pdf") == "https://example.com/files/a%2Fb.pdf"
+    assert url_key("https://example.com/files/a%2Fb.pdf") != url_key("https://example.com/files/a/b.pdf")
+
+def test_unreserved_escapes_are_decoded():
+    assert canonicalize_url("https://Example.com:443/%7Euser/deck%2epdf") == "https://example.com/~user/deck.pdf"
+    assert canonicalize_url("https://example.com/a%2fb") == "https://example.com/a%2Fb"
+    assert canonicalize_url("https://example.com/pitch deck.pdf") == "https://example.com/pitch%20deck.pdf"
+
+def test_query_order_is_kept_and_tracking_dropped():
+    url = "https://example.com/view?id=7&utm_source=x&page=2&gclid=abc&q=a%26b"
+    assert canonicalize_url(url) == "https://example.com/view?id=7&page=2&q=a%26b"
+    assert url_key("https://example.com/view?page=2&id=7") != url_key("https://example.com/view?id=7&page=2")
+
+def test_google_redirect_and_www_variants_share_key():
+    wrapped = "https://www.google.com/url?q=https://www.example.com/deck.pdf%3Futm_medium%3Demail&sa=U"
+    assert url_key(wrapped) == url_key("http://example.com/deck.pdf/")
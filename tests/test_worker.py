@@ -0,0 +1,32 @@
+import asyncio
+import sys
+import types
+
+import main
+import worker
+from work_queue import WorkQueue
+
+def test_failed_scrape_is_retried(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, "load_config", lambda: {})
+    calls = []
+
+    async def scrape_google_links(query, pages_limit, folder_path, novelty=None):
+        calls.append(folder_path)
+        if len(calls) == 1:
+            raise RuntimeError("Google scraper failed: CAPTCHA not solved")
+        return [f"{folder_path}/google-results-page-1.html"]
+
+    monkeypatch.setitem(sys.modules, "google_scraper", types.SimpleNamespace(scrape_google_links=scrape_google_links))
+
+    queue_path = str(tmp_path / "queue.db")
+    queue = WorkQueue(queue_path, max_attempts=3)
+    queue.enqueue("run1", "scrape", [{"run_hash": "run1", "query": "series a", "pages_limit": 1}])
+    asyncio.run(worker.run_worker(queue_path, lease_seconds=30, max_attempts=3, idle_exit=0))
+
+    [task] = queue.results("run1", "scrape")
+    assert task["status"] == "done"
+    assert len(calls) == 2
+    assert task["result"]["html_files"] == [f"{calls[1]}/google-results-page-1.html"]
+    assert len(list((tmp_path / "pages").iterdir())) == 1  # The failed attempt's folder is removed
+    queue.close()
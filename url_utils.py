@@ -0,0 +1,75 @@
+import re
+import string
+from urllib.parse import parse_qsl, quote, unquote_plus, urlsplit, urlunsplit
+
+# Query parameters that only track the visit and never change the document
+TRACKING_PARAMS = {
+    "gclid", "dclid", "fbclid", "msclkid", "yclid", "igshid", "mc_cid", "mc_eid",
+    "_hsenc", "_hsmi", "ref", "ref_src", "spm", "trk", "srsltid",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_")
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+GOOGLE_HOST_RE = re.compile(r"(^|\.)google\.[a-z.]+$")
+SAFE_PATH_CHARS = "/%:@!$&'()*+,;=-._~"
+PERCENT_ESCAPE_RE = re.compile(r"%([0-9A-Fa-f]{2})")
+UNRESERVED_CHARS = frozenset(string.ascii_letters + string.digits + "-._~")
+
+def _normalize_escapes(value: str) -> str:
+    """Decode escapes of unreserved characters only; reserved ones such as %2F keep their meaning."""
+    def fix(match):
+        char = chr(int(match.group(1), 16))
+        return char if char in UNRESERVED_CHARS else f"%{match.group(1).upper()}"
+    return PERCENT_ESCAPE_RE.sub(fix, value)
+
+def _is_tracking_param(pair: str) -> bool:
+    name = unquote_plus(pair.split("=", 1)[0]).lower()
+    return name in TRACKING_PARAMS or name.startswith(TRACKING_PREFIXES)
+
+def unwrap_redirect(url: str) -> str:
+    """Return the target of a Google redirect link (/url?q=... or /url?url=...)."""
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.path == "/url" and (not host or GOOGLE_HOST_RE.search(host)):
+        params = dict(parse_qsl(parts.query))
+        target = params.get("q") or params.get("url")
+        if target and target.startswith(("http://", "https://")):
+            return target
+    return url
+
+def canonicalize_url(url: str) -> str:
+    """
+    Normalize a result URL for fetching: unwrap Google redirects, lowercase the
+    host, drop default ports, fragments and tracking parameters, and normalize
+    percent-escapes. The remaining query parameters keep their order and the
+    scheme is kept, since servers may answer differently to either.
+    """
+    url = unwrap_redirect(url.strip())
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme not in DEFAULT_PORTS:
+        return url
+
+    host = (parts.hostname or "").lower().rstrip(".")
+    try:
+        port = parts.port
+    except ValueError:
+        return url
+    netloc = host if port in (None, DEFAULT_PORTS[scheme]) else f"{host}:{port}"
+
+    path = quote(_normalize_escapes(parts.path), safe=SAFE_PATH_CHARS) or "/"
+    query = "&".join(
+        _normalize_escapes(pair) for pair in parts.query.split("&")
+        if pair and not _is_tracking_param(pair)
+    )
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+def url_key(url: str) -> str:
+    """
+    Identity of a URL for deduplication: canonical form without the scheme,
+    a leading 'www.' or a trailing slash, so variants of one document match.
+    """
+    parts = urlsplit(canonicalize_url(url))
+    host = parts.netloc[4:] if parts.netloc.startswith("www.") else parts.netloc
+    path = parts.path.rstrip("/") or "/"
+    return f"{host}{path}" + (f"?{parts.query}" if parts.query else "")
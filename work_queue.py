@@ -0,0 +1,165 @@
+import json
+import time
+import sqlite3
+import logging
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_PATH = "work_queue.db"
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_hash TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (status, lease_expires);
+CREATE INDEX IF NOT EXISTS tasks_run ON tasks (run_hash, kind, status);
+"""
+
+class WorkQueue:
+    """
+    Durable task queue in a local SQLite file. Workers claim tasks with a
+    time-limited lease and must renew it while working; tasks whose lease
+    expires (crashed worker) are handed out again until max_attempts.
+
+    Several machines can share the queue only through a filesystem with
+    working SQLite locking, alongside a shared pages/ folder.
+    """
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH, max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def enqueue(self, run_hash: str, kind: str, payloads: Iterable[dict]) -> List[int]:
+        now = time.time()
+        ids = []
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for payload in payloads:
+                cur = self.conn.execute(
+                    "INSERT INTO tasks (run_hash, kind, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                    (run_hash, kind, json.dumps(payload), now, now),
+                )
+                ids.append(cur.lastrowid)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        return ids
+
+    def claim(self, worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS,
+              kinds: Optional[List[str]] = None) -> Optional[dict]:
+        """
+        Atomically take the oldest pending task, or a leased task whose lease has expired.
+        """
+        now = time.time()
+        kind_filter = ""
+        params: list = [now, self.max_attempts]
+        if kinds:
+            kind_filter = f"AND kind IN ({','.join('?' for _ in kinds)}) "
+            params.extend(kinds)
+
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                "SELECT id, run_hash, kind, payload, attempts FROM tasks "
+                "WHERE (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) AND attempts < ? "
+                + kind_filter + "ORDER BY id LIMIT 1",
+                params,
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+
+            task_id, run_hash, kind, payload, attempts = row
+            self.conn.execute(
+                "UPDATE tasks SET status = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (worker_id, now + lease_seconds, now, task_id),
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        if attempts:
+            logger.warning(f"♻️ Reassigning task {task_id} ({kind}) to {worker_id}, attempt {attempts + 1}")
+        return {"id": task_id, "run_hash": run_hash, "kind": kind, "payload": json.loads(payload), "attempt": attempts + 1}
+
+    def heartbeat(self, task_id: int, worker_id: str, lease_seconds: int = DEFAULT_LEASE_SECONDS) -> bool:
+        """Extend the lease. Returns False if the task was reassigned to another worker."""
+        now = time.time()
+        cur = self.conn.execute(
+            "UPDATE tasks SET lease_expires = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+            (now + lease_seconds, now, task_id, worker_id),
+        )
+        return cur.rowcount == 1
+
+    def complete(self, task_id: int, worker_id: str, result=None) -> bool:
+        cur = self.conn.execute(
+            "UPDATE tasks SET status = 'done', result = ?, lease_expires = NULL, updated_at = ? "
+            "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+            (json.dumps(result), time.time(), task_id, worker_id),
+        )
+        return cur.rowcount == 1
+
+    def fail(self, task_id: int, worker_id: str, error: str) -> bool:
+        """Record an error; the task goes back to pending unless it is out of attempts."""
+        cur = self.conn.execute(
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+            (self.max_attempts, error, time.time(), task_id, worker_id),
+        )
+        return cur.rowcount == 1
+
+    def expire_exhausted(self):
+        # Expired leases on tasks without attempts left can never be claimed again
+        self.conn.execute(
+            "UPDATE tasks SET status = 'failed', error = COALESCE(error, 'lease expired'), updated_at = ? "
+            "WHERE status = 'leased' AND lease_expires < ? AND attempts >= ?",
+            (time.time(), time.time(), self.max_attempts),
+        )
+
+    def counts(self, run_hash: Optional[str] = None, kind: Optional[str] = None) -> dict:
+        sql = "SELECT status, COUNT(*) FROM tasks WHERE 1 = 1 "
+        params = []
+        if run_hash:
+            sql += "AND run_hash = ? "
+            params.append(run_hash)
+        if kind:
+            sql += "AND kind = ? "
+            params.append(kind)
+        rows = self.conn.execute(sql + "GROUP BY status", params).fetchall()
+        return {status: count for status, count in rows}
+
+    def results(self, run_hash: str, kind: str) -> List[dict]:
+        rows = self.conn.execute(
+            "SELECT id, payload, status, result, error FROM tasks WHERE run_hash = ? AND kind = ? ORDER BY id",
+            (run_hash, kind),
+        ).fetchall()
+        return [
+            {"id": task_id, "payload": json.loads(payload), "status": status,
+             "result": json.loads(result) if result else None, "error": error}
+            for task_id, payload, status, result, error in rows
+        ]
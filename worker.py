@@ -0,0 +1,286 @@
+import os
+import sys
+import time
+import shutil
+import socket
+import asyncio
+import argparse
+import traceback
+from datetime import datetime
+from pathlib import Path
+
+import main as pipeline
+from work_queue import WorkQueue, DEFAULT_QUEUE_PATH, DEFAULT_LEASE_SECONDS, DEFAULT_MAX_ATTEMPTS
+from compact_storage import glob_artifacts
+from content_dedupe import dedupe_downloaded_files
+from prefetch import prefetch_run
+import records
+
+logger = pipeline.logger
+
+POLL_SECONDS = 2
+
+def get_worker_config(config: dict) -> dict:
+    workers = config.get("workers", {}) or {}
+    return {
+        "queue_path": workers.get("queue_path", DEFAULT_QUEUE_PATH),
+        "lease_seconds": workers.get("lease_seconds", DEFAULT_LEASE_SECONDS),
+        "max_attempts": workers.get("max_attempts", DEFAULT_MAX_ATTEMPTS),
+        "shard_size": workers.get("shard_size", 10),
+    }
+
+def shard(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+# ------------------- Task Handlers -------------------
+async def handle_scrape(payload):
+    query_folder = pipeline.new_query_folder(payload["run_hash"])
+    try:
+        # A failed scrape fails the task, so the queue retries it instead of dropping the query
+        html_files, stats = await pipeline.scrape_query(payload["query"], payload["pages_limit"], query_folder,
+                                                        raise_errors=True)
+    except Exception:
+        shutil.rmtree(query_folder, ignore_errors=True)  # The retry scrapes into a fresh folder
+        raise
+    return {"folder": str(query_folder), "html_files": html_files, "novelty": stats}
+
+async def handle_download(payload):
+    # Shards from a coordinator that already prefetched the whole run skip the per-shard prefetch
+    await pipeline.download_candidates(payload["folder"], payload["download_type"], hashes=payload["hashes"],
+                                       prefetch=not payload.get("prefetched"))
+    return {"hashes": len(payload["hashes"])}
+
+async def handle_convert(payload):
+    # Conversion is CPU-bound; a thread keeps the lease heartbeat running
+    await asyncio.to_thread(pipeline.convert_downloads, payload["folder"], payload["download_type"], payload["files"])
+    return {"files": len(payload["files"])}
+
+async def handle_analyze(payload):
+    from ai_api_final import get_cascade_stats, reset_cascade_stats
+    from rate_governor import log_stats
+
+    folder = Path(payload["folder"])
+    hash_entry_map = records.load_candidates(folder)
+
+    txt_files = [folder / "txt" / name for name in payload["files"]]
+    txt_files, screened, prescreen_stats = await pipeline.prescreen_txt_files(txt_files)
+    reset_cascade_stats()
+    results = await pipeline.analyze_txt_files(txt_files, hash_entry_map)
+    log_stats()  # Queue waits and rate-limit retries seen by this worker so far
+    return {"results": results, "screened": screened,
+            "cascade_stats": {"prescreen": prescreen_stats, **get_cascade_stats()}}
+
+HANDLERS = {
+    "scrape": handle_scrape,
+    "download": handle_download,
+    "convert": handle_convert,
+    "analyze": handle_analyze,
+}
+
+# ------------------- Worker -------------------
+async def _keep_lease(queue, task, worker_id, lease_seconds):
+    while True:
+        await asyncio.sleep(lease_seconds / 3)
+        if not queue.heartbeat(task["id"], worker_id, lease_seconds):
+            logger.warning(f"⚠️ Lost lease on task {task['id']}")
+            return
+
+async def run_worker(queue_path, lease_seconds, max_attempts, idle_exit=None, worker_id=None):
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    queue = WorkQueue(queue_path, max_attempts=max_attempts)
+    idle_since = time.monotonic()
+    logger.info(f"👷 Worker {worker_id} polling {queue_path}")
+
+    try:
+        while True:
+            task = queue.claim(worker_id, lease_seconds, kinds=list(HANDLERS))
+            if task is None:
+                if idle_exit is not None and time.monotonic() - idle_since > idle_exit:
+                    logger.info(f"👋 Worker {worker_id} idle for {idle_exit}s, exiting")
+                    return
+                await asyncio.sleep(POLL_SECONDS)
+                continue
+
+            logger.info(f"🛠️ {worker_id} running task {task['id']} ({task['kind']}, attempt {task['attempt']})")
+            keeper = asyncio.create_task(_keep_lease(queue, task, worker_id, lease_seconds))
+            try:
+                result = await HANDLERS[task["kind"]](task["payload"])
+                if not queue.complete(task["id"], worker_id, result):
+                    logger.warning(f"⚠️ Task {task['id']} was reassigned before it finished; result dropped")
+            except Exception as e:
+                logger.error(f"❌ Task {task['id']} ({task['kind']}) failed: {e}")
+                queue.fail(task["id"], worker_id, f"{e}\n{traceback.format_exc()}")
+            finally:
+                keeper.cancel()
+            idle_since = time.monotonic()
+    finally:
+        queue.close()
+
+# ------------------- Coordinator -------------------
+async def wait_for_stage(queue, run_hash, kind):
+    last = None
+    while True:
+        queue.expire_exhausted()
+        counts = queue.counts(run_hash, kind)
+        if counts != last:
+            logger.info(f"⏳ {kind}: {counts}")
+            last = counts
+        if not counts.get("pending") and not counts.get("leased"):
+            break
+        await asyncio.sleep(POLL_SECONDS)
+
+    results = queue.results(run_hash, kind)
+    for task in results:
+        if task["status"] == "failed":
+            first_line = (task["error"] or "unknown error").splitlines()[0]
+            logger.error(f"❌ {kind} task {task['id']} failed for good: {first_line}")
+    return [task["result"] for task in results if task["status"] == "done"]
+
+def merge_cascade_stats(parts):
+    merged = {}
+    for stats in parts:
+        for tier_name, tier in stats.items():
+            target = merged.setdefault(tier_name, {k: 0 for k in tier})
+            for key, value in tier.items():
+                target[key] = target.get(key, 0) + value
+    return merged
+
+async def spawn_local_workers(count, queue_args):
+    procs = []
+    for _ in range(count):
+        procs.append(await asyncio.create_subprocess_exec(
+            sys.executable, os.path.abspath(__file__), "work", *queue_args,
+        ))
+    return procs
+
+async def coordinate(config, settings, local_workers=0):
+    queue = WorkQueue(settings["queue_path"], max_attempts=settings["max_attempts"])
+    procs = await spawn_local_workers(local_workers, ["--queue", settings["queue_path"]]) if local_workers else []
+    size = settings["shard_size"]
+
+    try:
+        queries = pipeline.get_queries(config)
+        download_type = config.get("download_type", "pdf")  # 'pdf' or 'page'
+        pages_limit = config.get("google", {}).get("pages_limit", 1)
+        run_hash = pipeline.new_run_hash()
+        started_at = datetime.now().isoformat(timespec="seconds")
+        combined_folder = Path("pages") / run_hash
+
+        logger.info(f"🧭 Coordinating run {run_hash}: {len(queries)} queries, download_type='{download_type}'")
+
+        # ------------------- Scrape (one task per query) -------------------
+        queue.enqueue(run_hash, "scrape", [
+            {"run_hash": run_hash, "query": q, "pages_limit": pages_limit} for q in queries
+        ])
+        scraped = await wait_for_stage(queue, run_hash, "scrape")
+
+        run_info = {
+            "run_hash": run_hash,
+            "started_at": started_at,
+            "queries": queries,
+            "download_type": download_type,
+            "scrape": [r.get("novelty") for r in scraped],
+        }
+        all_html_paths = pipeline.combine_query_folders([r["folder"] for r in scraped], combined_folder, run_info)
+        if not all_html_paths:
+            logger.info("ℹ️ No new HTML files generated.")
+            return
+
+        # ------------------- Extract and rate (coordinator) -------------------
+        await pipeline.extract_and_rate(combined_folder)
+
+        # ------------------- Prefetch (coordinator) -------------------
+        # One pass over the whole run, so dedupe and smallest-first ordering span all shards
+        hashes = await prefetch_run(combined_folder, pdf_only=download_type == "pdf")
+        prefetched = hashes is not None
+        if not prefetched:
+            hashes = [c.hash for c in records.iter_candidates(combined_folder)]
+
+        # ------------------- Download -------------------
+        queue.enqueue(run_hash, "download", [
+            {"folder": str(combined_folder), "download_type": download_type, "hashes": part, "prefetched": prefetched}
+            for part in shard(hashes, size)
+        ])
+        await wait_for_stage(queue, run_hash, "download")
+
+        subfolder = pipeline.download_subfolder(download_type)
+        dedupe_downloaded_files(combined_folder, subfolder)
+
+        # ------------------- Convert -------------------
+        patterns = ["*.pdf"] if download_type == "pdf" else ["*.pdf", "*.html"]
+        files = sorted(p.name for pattern in patterns for p in glob_artifacts(combined_folder / subfolder, pattern))
+        queue.enqueue(run_hash, "convert", [
+            {"folder": str(combined_folder), "download_type": download_type, "files": part}
+            for part in shard(files, size)
+        ])
+        await wait_for_stage(queue, run_hash, "convert")
+
+        # ------------------- Analyze -------------------
+        txt_files = sorted(p.name for p in glob_artifacts(combined_folder / "txt", "*.txt"))
+        queue.enqueue(run_hash, "analyze", [
+            {"folder": str(combined_folder), "files": part} for part in shard(txt_files, size)
+        ])
+        analyzed = await wait_for_stage(queue, run_hash, "analyze")
+
+        new_results, screened = {}, {}
+        for part in analyzed:
+            new_results.update(part["results"])
+            screened.update(part.get("screened") or {})
+        cascade_stats = merge_cascade_stats(part["cascade_stats"] for part in analyzed)
+
+        # ------------------- Report (coordinator) -------------------
+        await pipeline.report_results(combined_folder, new_results, cascade_stats, screened)
+        pipeline.index_into_archive(config, combined_folder)
+        pipeline.report_openai_usage(combined_folder)
+        logger.info(f"🏁 Run {run_hash} finished")
+    finally:
+        queue.close()
+        # Local workers loop forever; stop them once the run is over
+        for proc in procs:
+            if proc.returncode is None:
+                proc.terminate()
+            await proc.wait()
+
+def show_status(settings):
+    queue = WorkQueue(settings["queue_path"], max_attempts=settings["max_attempts"])
+    try:
+        rows = queue.conn.execute(
+            "SELECT run_hash, kind, status, COUNT(*) FROM tasks GROUP BY run_hash, kind, status ORDER BY MAX(id)"
+        ).fetchall()
+    finally:
+        queue.close()
+    for run_hash, kind, status, count in rows:
+        print(f"{run_hash}  {kind:<9} {status:<8} {count}")
+
+# ------------------- Entry Point -------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the pipeline as a coordinator and workers over a local task queue")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_coord = sub.add_parser("coordinate", help="Split a run into tasks and wait for workers to finish them")
+    p_coord.add_argument("--workers", type=int, default=0, help="Also start this many local worker processes")
+
+    p_work = sub.add_parser("work", help="Claim and process tasks until stopped")
+    p_work.add_argument("--idle-exit", type=float, default=None, help="Exit after this many idle seconds")
+
+    sub.add_parser("status", help="Show task counts per run and stage")
+
+    for p in (p_coord, p_work, sub.choices["status"]):
+        p.add_argument("--queue", default=None, help="Path to the queue database")
+
+    args = parser.parse_args(argv)
+    config = pipeline.load_config()
+    settings = get_worker_config(config)
+    if args.queue:
+        settings["queue_path"] = args.queue
+
+    if args.command == "coordinate":
+        asyncio.run(coordinate(config, settings, local_workers=args.workers))
+    elif args.command == "work":
+        asyncio.run(run_worker(settings["queue_path"], settings["lease_seconds"], settings["max_attempts"],
+                               idle_exit=args.idle_exit))
+    else:
+        show_status(settings)
+
+if __name__ == "__main__":
+    main()